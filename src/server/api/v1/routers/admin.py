@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+
+from src.server.config import Settings
+from src.server.dependencies.admin import require_admin
+from src.server.dependencies.settings import get_settings
+from src.server.logger import logger
+from src.server.utils.profiling import profiler
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin(get_settings))],
+)
+
+
+@router.post("/profile")
+async def profile(
+        mode: Literal["sampling", "cprofile", "tracemalloc"] = Query("sampling"),
+        seconds: float = Query(10.0, gt=0),
+        requests: int = Query(0, ge=0, description="Stop after this many upscale requests (0: time only)"),
+        interval: float = Query(0.01, ge=0.001, le=1.0, description="Sampling interval, seconds"),
+        frames: int = Query(1, ge=1, le=64, description="Traceback depth for tracemalloc"),
+        settings: Settings = Depends(get_settings),
+) -> Response:
+    """
+    Profile the upscale and request history code paths of this worker process for `seconds`
+    or until `requests` upscale requests have completed, whichever comes first.
+
+    - sampling: collapsed stacks (flamegraph.pl, speedscope) sampled every `interval` seconds
+    - cprofile: a pstats file (python -m pstats, snakeviz); one request is profiled at a time
+    - tracemalloc: JSON with per-request allocation snapshots of the Upscaler and history code
+
+    Requires the X-Admin-Token header. Profiling is off outside of a session.
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must not exceed {settings.PROFILE_MAX_SECONDS}",
+        )
+
+    options = {}
+    if mode == "sampling":
+        options["interval"] = interval
+    elif mode == "tracemalloc":
+        options["frames"] = frames
+
+    try:
+        session = profiler.start(mode, max_requests=requests, **options)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    loop = asyncio.get_event_loop()
+    try:
+        await loop.run_in_executor(None, session.done.wait, seconds)
+    finally:
+        await loop.run_in_executor(None, profiler.stop)
+
+    content = session.result()
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    filename = f"profile_{mode}_{timestamp}.{session.extension}"
+    logger.info(f"Profile {filename}: {session.requests} requests in {session.seconds:.1f}s, {len(content)} bytes")
+
+    return Response(
+        content=content,
+        media_type=session.media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Profile-Requests": str(session.requests),
+            "X-Profile-Seconds": f"{session.seconds:.3f}",
+        },
+    )
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+
+from src.server.broker.base import JobBroker
+from src.server.dependencies.broker import get_broker
+from src.server.dependencies.settings import get_settings
+
+router = APIRouter(
+    prefix="/broker",
+    tags=["Broker"],
+)
+
+
+@router.get("/")
+async def get_broker_stats(
+        broker: Optional[JobBroker] = Depends(get_broker(get_settings)),
+) -> JSONResponse:
+    """
+    Job broker state: number of tasks by status and per-worker statistics (tasks completed
+    and failed, busy time, throughput in tasks per second and slot utilization).
+    """
+    if broker is None:
+        return JSONResponse(content={"enabled": False}, status_code=status.HTTP_200_OK)
+
+    loop = asyncio.get_event_loop()
+    queue = await loop.run_in_executor(None, broker.queue_stats)
+    workers = await loop.run_in_executor(None, broker.worker_stats)
+    return JSONResponse(
+        content={"enabled": True, "queue": queue, "workers": workers},
+        status_code=status.HTTP_200_OK,
+    )
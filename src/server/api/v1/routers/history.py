@@ -1,11 +1,14 @@
 from datetime import datetime
+from typing import List, Literal, Optional
 
-from fastapi import Depends, APIRouter, status
+from fastapi import Depends, APIRouter, HTTPException, Query, status
 from fastapi.responses import Response, JSONResponse
 
-from src.server.dependencies.history import get_pdf_reports_generator, get_statistics_processor
+from src.server.dependencies.history import get_history_columns, get_pdf_reports_generator, get_statistics_processor
 from src.server.dependencies.settings import get_settings
 from src.server.logger import logger
+from src.server.utils.columns import HistoryColumns
+from src.server.utils.rollups import local_time
 from src.server.utils.reports import PDFReportGenerator
 from src.server.utils.statistics import RequestStatistics
 
@@ -54,3 +57,47 @@ async def get_statistics(
         content=statistics_processor.get_all_stats(),
         status_code=status.HTTP_200_OK,
     )
+
+
+@router.get("/query")
+async def query_history(
+        group_by: List[Literal["model", "scale", "status", "tenant", "priority", "time"]] = Query(
+            [],
+            description="Fields to group by, in order",
+        ),
+        metric: Literal["duration", "size", "skipped_ratio", "queue_wait", "compute_share"] = Query("duration"),
+        aggregations: List[str] = Query(
+            ["count", "mean", "p50", "p95"],
+            alias="agg",
+            description="count, sum, mean, min, max or a percentile such as p99",
+        ),
+        bucket: Literal["hour", "day"] = Query("hour", description="Time bucket used when grouping by time"),
+        since: Optional[datetime] = Query(None, description="Start of the window (inclusive)"),
+        until: Optional[datetime] = Query(None, description="End of the window (exclusive)"),
+        columns: HistoryColumns = Depends(
+            get_history_columns(
+                history_file="request_history.json",
+                settings_injector=get_settings,
+            )
+        ),
+) -> JSONResponse:
+    """
+    Ad-hoc aggregation over raw request history records (kept for HISTORY_RETENTION_DAYS),
+    e.g. `?group_by=model&group_by=time&bucket=day&metric=duration&agg=count&agg=p95`.
+    """
+    try:
+        rows = columns.query(
+            group_by=group_by,
+            metric=metric,
+            aggregations=aggregations,
+            bucket=bucket,
+            since=local_time(since),
+            until=local_time(until),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return JSONResponse(
+        content={"records": len(columns), "groups": rows},
+        status_code=status.HTTP_200_OK,
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import cv2
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
+
+from src.server.dependencies.jobs import get_job_manager
+from src.server.dependencies.scheduler import Tenant, get_tenant
+from src.server.dependencies.settings import get_settings
+from src.server.utils.jobs import JobManager, Job
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+)
+
+
+def _get_job_or_404(job_manager: JobManager, job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("/{job_id}")
+async def get_job(
+        job_id: str,
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+) -> JSONResponse:
+    """Get status and progress of a background job."""
+    job = _get_job_or_404(job_manager, job_id)
+    return JSONResponse(content=job.to_dict(), status_code=status.HTTP_200_OK)
+
+
+@router.delete("/{job_id}")
+async def delete_job(
+        job_id: str,
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+        tenant: Tenant = Depends(get_tenant(get_settings)),
+) -> Response:
+    """
+    Cancel a running job (202, it stops at the next tile or frame and its status becomes
+    "cancelled") or delete a finished one with its files (204). Only the tenant that started
+    the job can delete it.
+    """
+    job = _get_job_or_404(job_manager, job_id)
+    if job.tenant is not None and job.tenant != tenant.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+
+    if job.finished:
+        job_manager.remove(job_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    job_manager.cancel(job)
+    return JSONResponse(content=job.to_dict(), status_code=status.HTTP_202_ACCEPTED)
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+        job_id: str,
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+) -> FileResponse:
+    """Download the result of a completed background job."""
+    job = _get_job_or_404(job_manager, job_id)
+    if job.status != "done" or job.result_path is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} is {job.status}")
+
+    return FileResponse(job.result_path, media_type=job.media_type, filename=job.result_path.name)
+
+
+@router.get("/{job_id}/events")
+async def get_job_events(
+        job_id: str,
+        request: Request,
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+) -> StreamingResponse:
+    """Stream job progress as server-sent events until the job finishes."""
+    job = _get_job_or_404(job_manager, job_id)
+
+    async def event_stream():
+        async for event in job.subscribe():
+            if await request.is_disconnected():
+                break
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/{job_id}/snapshot")
+async def get_job_snapshot(
+        job_id: str,
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+) -> Response:
+    """Get the current, progressively refined image of a running job (or the final result)."""
+    job = _get_job_or_404(job_manager, job_id)
+    if job.status == "done" and job.result_path is not None:
+        return FileResponse(job.result_path, media_type=job.media_type)
+
+    canvas = job.canvas
+    if canvas is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} has no snapshot")
+
+    success, encoded = await asyncio.get_event_loop().run_in_executor(
+        None, cv2.imencode, ".jpg", canvas, [int(cv2.IMWRITE_JPEG_QUALITY), 85],
+    )
+    if not success:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to encode snapshot")
+
+    return Response(content=encoded.tobytes(), media_type="image/jpeg", headers={"Cache-Control": "no-store"})
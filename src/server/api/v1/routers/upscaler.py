@@ -1,13 +1,33 @@
+import asyncio
+import os
+import shutil
 from io import BytesIO
+from pathlib import Path
+from typing import Optional, BinaryIO
 
-from fastapi import APIRouter, File, Depends, UploadFile
-from fastapi.responses import StreamingResponse
+import numpy as np
+from fastapi import APIRouter, File, Form, Depends, UploadFile, Header, Request, HTTPException, status
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse
+from starlette.background import BackgroundTask
 
+from src.server.broker.base import JobBroker
+from src.server.broker.client import upscale_remote
+from src.server.config import Settings
+from src.server.dependencies.broker import get_broker
+from src.server.dependencies.jobs import get_job_manager
+from src.server.dependencies.scheduler import Tenant, get_tenant
 from src.server.dependencies.settings import get_settings
-from src.server.dependencies.upscaler import get_upscaler
+from src.server.enums.models import ModelEnum
+from src.server.dependencies.storage import get_result_storage
+from src.server.dependencies.upscaler import get_upscaler, get_model, get_local_upscaler
 from src.server.logger import logger
-from src.server.upscaler.opencv import Upscaler
+from src.server.upscaler.opencv import Upscaler, result_params
+from src.server.upscaler.tiles import Tile
+from src.server.upscaler.video import VideoUpscaler
+from src.server.utils.cancellation import CancelToken, cancel_on_disconnect
 from src.server.utils.history import RequestHistory
+from src.server.utils.jobs import JobManager, Job, JobLimitExceeded
+from src.server.utils.storage import ResultStorage
 
 router = APIRouter(
     prefix="/upscaler",
@@ -15,18 +35,263 @@ router = APIRouter(
 )
 
 
+def _result_headers(request: Request, settings: Settings, digest: str) -> dict:
+    """Caching headers for a stored result: results are content-addressed and never change."""
+    visibility = "public" if settings.RESULTS_CACHE_PUBLIC else "private"
+    return {
+        "ETag": f'"{digest}"',
+        "Cache-Control": f"{visibility}, max-age=31536000, immutable",
+        "Content-Location": str(request.url_for("get_result", digest=digest)),
+    }
+
+
 @router.post("/upscale/")
 @RequestHistory()
 async def upscale(
+        request: Request,
         image: UploadFile = File(...),
-        upscaler: Upscaler = Depends(get_upscaler(get_settings)),
-) -> StreamingResponse:
-    """Upscale image with given settings and defined model."""
+        model: ModelEnum = Depends(get_model),
+        upscaler: Optional[Upscaler] = Depends(get_local_upscaler(get_settings)),
+        settings: Settings = Depends(get_settings),
+        width: Optional[int] = Form(None, gt=0, le=16384),
+        height: Optional[int] = Form(None, gt=0, le=16384),
+        deadline: Optional[float] = Header(None, alias="X-Request-Deadline", gt=0),
+        storage: ResultStorage = Depends(get_result_storage(get_settings)),
+        broker: Optional[JobBroker] = Depends(get_broker(get_settings)),
+        tenant: Tenant = Depends(get_tenant(get_settings)),
+) -> Response:
+    """
+    Upscale image with given settings and defined model.
+
+    If width and/or height are given, the image is produced at exactly that size (a missing
+    side keeps the aspect ratio). The server then picks the cheapest way to reach it: the
+    smallest sufficient model scale, pre-shrinking the input and resizing the remainder.
+
+    Processing stops at the next tile boundary if the client disconnects or the
+    deadline expires: the X-Request-Deadline header (seconds), capped by REQUEST_DEADLINE_SECONDS.
+
+    Results are stored by content hash: a repeated request for the same image and
+    parameters is served from storage, and the Content-Location header points to a
+    cacheable GET URL of the result.
+
+    With BROKER_URL set, the image is upscaled by a broker worker instead of this process,
+    and the models don't have to be available here.
+
+    Local inference is shared fairly between clients, identified by a configured X-API-Key
+    or the client IP. X-Priority (interactive, batch or background) can lower the priority
+    class allowed for the client.
+    """
     logger.info(f"Upscaling image {image.filename}")
     file = await image.read()
-    upscaled_image = await upscaler.upscale(file, output_format="png")
+    output_size = (width, height) if width or height else None
+
+    if upscaler is not None:
+        params = upscaler.result_params(output_size, "png")
+    else:
+        params = result_params(model, settings, output_size, "png")
+        # The broker workers load the model; record the configured one
+        RequestHistory.annotate(upscaler={
+            "model": model.name,
+            "model_name": params["model_name"],
+            "scale": params["scale"],
+            "precision": params["precision"],
+        })
+
+    # Hashing a large upload and reading the index are blocking, keep them off the event loop
+    loop = asyncio.get_event_loop()
+    cache_key = await loop.run_in_executor(None, storage.request_key, file, params)
+    digest = await loop.run_in_executor(None, storage.lookup, cache_key)
+    # The result may have been removed since the lookup; then it is computed again
+    stored = await loop.run_in_executor(None, storage.open, digest) if digest is not None else None
+    if stored is not None:
+        logger.info(f"Serving stored result {digest} for {image.filename}")
+        RequestHistory.annotate(cache_hit=True, result=digest)
+        return _stored_result_response(stored, _result_headers(request, settings, digest))
+
+    # The client may shorten the server deadline, but not extend it
+    deadlines = [value for value in (deadline, settings.REQUEST_DEADLINE_SECONDS) if value]
+    cancel_token = CancelToken(deadline_seconds=min(deadlines, default=None))
+    async with cancel_on_disconnect(request, cancel_token):
+        if upscaler is not None:
+            upscaled_image = await upscaler.upscale(
+                file,
+                output_size=output_size,
+                output_format="png",
+                cancel_token=cancel_token,
+                tenant=tenant.id,
+                priority=tenant.priority,
+            )
+            skipped_ratio = upscaler.tile_stats["skipped_ratio"]
+        else:
+            upscaled_image, details = await upscale_remote(
+                broker,
+                model,
+                settings,
+                file,
+                output_size=output_size,
+                output_format="png",
+                cancel_token=cancel_token,
+            )
+            skipped_ratio = details.get("tiles", {}).get("skipped_ratio", 0.0)
     logger.info(f"Upscaling complete for {image.filename}")
+
+    digest = await loop.run_in_executor(None, storage.put, cache_key, upscaled_image)
+    RequestHistory.annotate(cache_hit=False, result=digest)
     return StreamingResponse(
         BytesIO(upscaled_image),
         media_type="image/png",
+        headers={
+            "X-Tiles-Skipped-Ratio": f"{skipped_ratio:.4f}",
+            **_result_headers(request, settings, digest),
+        },
+    )
+
+
+@router.api_route("/results/{digest}", methods=["GET", "HEAD"])
+async def get_result(
+        digest: str,
+        request: Request,
+        if_none_match: Optional[str] = Header(None),
+        storage: ResultStorage = Depends(get_result_storage(get_settings)),
+        settings: Settings = Depends(get_settings),
+) -> Response:
+    """
+    Download a stored upscaling result. Supports ETag/If-None-Match (304 Not Modified)
+    and HTTP Range requests. Results are cacheable by the client, and by shared caches
+    (CDNs) with RESULTS_CACHE_PUBLIC.
+    """
+    headers = _result_headers(request, settings, digest)
+    loop = asyncio.get_event_loop()
+    # Serving a result counts as an access and extends its retention
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or headers["ETag"] in tags:
+            if await loop.run_in_executor(None, storage.get, digest, True) is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Result {digest} not found")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    stored = await loop.run_in_executor(None, storage.open, digest, True)
+    if stored is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Result {digest} not found")
+    return _stored_result_response(stored, headers)
+
+
+@router.post("/upscale/preview/")
+async def upscale_preview(
+        image: UploadFile = File(...),
+        upscaler: Upscaler = Depends(get_upscaler(get_settings)),
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+        tenant: Tenant = Depends(get_tenant(get_settings)),
+) -> Response:
+    """
+    Return a fast interpolated preview at the target scale immediately and start the full
+    upscale as a background job. The job id is returned in the X-Job-Id header: follow
+    /jobs/{job_id}/events for tile-by-tile progress, /jobs/{job_id}/snapshot for the
+    progressively refined image and /jobs/{job_id}/result for the final PNG.
+    DELETE /jobs/{job_id} cancels the job. The upscale waits for an inference slot with the
+    client's priority, like a synchronous request.
+    """
+    logger.info(f"Preview upscaling image {image.filename}")
+    file = await image.read()
+    loop = asyncio.get_event_loop()
+
+    decoded = await loop.run_in_executor(None, upscaler.decode_image, file)
+    preview = await loop.run_in_executor(None, upscaler.interpolate, decoded)
+    preview_bytes = await loop.run_in_executor(None, upscaler.encode_image, preview, "jpg", 85)
+
+    job = _create_job(job_manager, "upscale", tenant)
+    job.canvas = preview
+    destination = job.job_dir / "result.png"
+    tile_size = upscaler.settings.TILE_SIZE or upscaler.settings.PREVIEW_TILE_SIZE
+
+    def on_tile(tile: Tile, upscaled: np.ndarray, done: int, total: int) -> None:
+        x0, y0, x1, y1 = tile.scaled(upscaler.scale)
+        if job.canvas is not None:
+            job.canvas[y0:y1, x0:x1] = upscaled
+        job.progress = done / total
+        job.publish({"type": "tile", "box": [x0, y0, x1 - x0, y1 - y0], "done": done, "total": total})
+
+    def run(current_job: Job) -> None:
+        height, width = decoded.shape[:2]
+        with current_job.inference_slot(width * height * upscaler.scale ** 2 / 1e6):
+            result = upscaler.upscale_array(
+                decoded, tile_size=tile_size, on_tile=on_tile, cancel_token=current_job.cancel_token
+            )
+        destination.write_bytes(upscaler.encode_image(result, "png"))
+        current_job.details.update(upscaler.tile_stats)
+        current_job.result_path = destination
+        current_job.media_type = "image/png"
+
+    job_manager.submit(job, run)
+    logger.info(f"Preview for {image.filename} returned, full upscale queued as job {job.id}")
+
+    return Response(
+        content=preview_bytes,
+        media_type="image/jpeg",
+        headers={"X-Job-Id": job.id},
+    )
+
+
+def _create_job(job_manager: JobManager, kind: str, tenant: Tenant) -> Job:
+    """Create a background job for the tenant, or reject the request if it has too many running."""
+    try:
+        return job_manager.create(kind, tenant=tenant.id, priority=tenant.priority)
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+
+
+def _stored_result_response(file: BinaryIO, headers: dict) -> FileResponse:
+    """
+    Respond with a stored result from its open file: the file is served through its descriptor,
+    so the storage janitor removing the result meanwhile doesn't break the response.
+    """
+    return FileResponse(
+        f"/dev/fd/{file.fileno()}",
+        stat_result=os.fstat(file.fileno()),
+        media_type="image/png",
+        headers=headers,
+        background=BackgroundTask(file.close),
     )
+
+
+def _save_upload(upload: UploadFile, path: Path) -> None:
+    """Copy an upload (already spooled to a temporary file) to path; blocking, run it in a thread."""
+    upload.file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f, 1 << 20)
+
+
+@router.post("/video/")
+async def upscale_video(
+        video: UploadFile = File(...),
+        upscaler: Upscaler = Depends(get_upscaler(get_settings)),
+        job_manager: JobManager = Depends(get_job_manager(get_settings)),
+        tenant: Tenant = Depends(get_tenant(get_settings)),
+) -> JSONResponse:
+    """
+    Start a background job upscaling a video clip. Poll /jobs/{job_id} for progress and
+    cancel it with DELETE /jobs/{job_id}. Every frame takes an inference slot with the client's
+    priority, so a long video doesn't hold back other clients.
+    """
+    job = _create_job(job_manager, "video", tenant)
+    source = job.job_dir / f"source{Path(video.filename or '').suffix or '.mp4'}"
+    destination = job.job_dir / "result.mp4"
+
+    await asyncio.get_event_loop().run_in_executor(None, _save_upload, video, source)
+
+    logger.info(f"Video {video.filename} queued for upscaling as job {job.id}")
+
+    def run(current_job: Job) -> None:
+        stats = VideoUpscaler(upscaler).process(
+            str(source),
+            str(destination),
+            on_progress=current_job.set_progress,
+            cancel_token=current_job.cancel_token,
+            inference_slot=current_job.inference_slot,
+        )
+        current_job.details.update(stats)
+        current_job.result_path = destination
+        current_job.media_type = "video/mp4"
+
+    job_manager.submit(job, run)
+    return JSONResponse(content=job.to_dict(), status_code=status.HTTP_202_ACCEPTED)
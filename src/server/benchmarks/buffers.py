@@ -0,0 +1,104 @@
+"""
+Memory benchmark for the image buffer pool.
+
+Runs the same stream of concurrent upscale requests with buffer reuse enabled and disabled
+(each in a fresh process) and reports throughput, steady-state RSS, peak RSS and the allocation
+rate, measured as fresh memory pages touched (minor page faults) per request.
+
+Usage:
+    python -m src.server.benchmarks.buffers ./images --model EDSR_x4 --requests 40 --concurrency 4
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List
+
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum, ModelsList
+from src.server.prefork import memory_usage
+from src.server.upscaler.buffers import get_buffer_pool
+from src.server.upscaler.opencv import Upscaler
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp"}
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _measure(images: List[bytes], model_name: str, requests: int, concurrency: int, pool_bytes: int) -> Dict[str, Any]:
+    """Run in a separate process: upscale `requests` images with `concurrency` threads."""
+    settings = Settings(BUFFER_POOL_MAX_BYTES=pool_bytes)  # type: ignore[call-arg]
+    pool = get_buffer_pool(settings)
+    upscaler = Upscaler(model=ModelEnum[model_name], settings=settings)
+    upscaler.warmup(copies=concurrency)
+
+    def run_one(index: int) -> None:
+        upscaler.upscale_sync(images[index % len(images)])
+
+    # The first round fills the model pool, the buffer pool and the allocator arenas
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run_one, range(concurrency)))
+
+    rss_samples = []
+    faults_before = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch_start in range(0, requests, concurrency):
+            list(executor.map(run_one, range(batch_start, min(batch_start + concurrency, requests))))
+            usage = memory_usage(os.getpid())
+            if usage is not None:
+                rss_samples.append(usage["rss"])
+    elapsed = time.perf_counter() - started_at
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults_before
+
+    return {
+        "throughput": requests / elapsed,
+        "steady_rss": rss_samples[-1] if rss_samples else 0,
+        "peak_rss": max(rss_samples) if rss_samples else 0,
+        "fresh_bytes_per_request": faults * PAGE_SIZE / requests,
+        "fresh_bytes_per_second": faults * PAGE_SIZE / elapsed,
+        "pool": pool.stats(),
+    }
+
+
+def run(images_dir: Path, model_name: str, requests: int, concurrency: int, pool_bytes: int) -> None:
+    images = [
+        path.read_bytes()
+        for path in sorted(images_dir.iterdir())
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    if not images:
+        raise SystemExit(f"No images found in {images_dir}")
+
+    print(f"{len(images)} images, model {model_name}, {requests} requests, concurrency {concurrency}")
+    print(f"{'buffers':>8} {'req/s':>7} {'steady RSS, MiB':>16} {'peak RSS, MiB':>14} "
+          f"{'fresh MiB/req':>14} {'fresh MiB/s':>12} {'pool hits':>10}")
+
+    # A fresh process per mode, so that RSS and allocator state are not shared between runs
+    context = multiprocessing.get_context("spawn")
+    for label, limit in (("off", 0), ("pooled", pool_bytes)):
+        with context.Pool(1) as process:
+            result = process.apply(_measure, (images, model_name, requests, concurrency, limit))
+        print(
+            f"{label:>8} {result['throughput']:>7.2f} {result['steady_rss'] / 2 ** 20:>16.1f} "
+            f"{result['peak_rss'] / 2 ** 20:>14.1f} {result['fresh_bytes_per_request'] / 2 ** 20:>14.1f} "
+            f"{result['fresh_bytes_per_second'] / 2 ** 20:>12.1f} {result['pool']['hits']:>10}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images_dir", type=Path)
+    parser.add_argument("--model", choices=list(ModelsList), default="EDSR_x4")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-bytes", type=int, default=1024 ** 3)
+    args = parser.parse_args()
+
+    run(args.images_dir, args.model, args.requests, args.concurrency, args.pool_bytes)
+
+
+if __name__ == "__main__":
+    main()
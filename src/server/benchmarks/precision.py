@@ -0,0 +1,104 @@
+"""
+Quality/speed benchmark for reduced-precision inference.
+
+Runs every image of a directory through each model at FP32 and at each candidate precision
+(fp16, int8), then reports the speedup and the PSNR/SSIM loss against the FP32 result,
+so per-model INFERENCE_PRECISION_OVERRIDES can be chosen. The int8 variant needs calibration
+data (python -m src.server.cli quantize) and is skipped for models without it.
+
+Usage:
+    python -m src.server.benchmarks.precision ./images --models EDSR_x2 EDSR_x4 --precisions fp16 int8
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum, ModelsList
+from src.server.upscaler.opencv import Upscaler
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp"}
+
+
+def ssim(reference: np.ndarray, image: np.ndarray) -> float:
+    """Mean SSIM over the channels (Gaussian window 11x11, sigma 1.5, as in Wang et al.)"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    x = reference.astype(np.float64)
+    y = image.astype(np.float64)
+
+    def blur(value: np.ndarray) -> np.ndarray:
+        return cv2.GaussianBlur(value, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    sigma_x = blur(x * x) - mu_x ** 2
+    sigma_y = blur(y * y) - mu_y ** 2
+    sigma_xy = blur(x * y) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (sigma_x + sigma_y + c2))
+    return float(ssim_map.mean())
+
+
+def _timed_run(upscaler: Upscaler, images: List[np.ndarray], rounds: int):
+    """Upscale every image (whole image, no tile skipping); returns results and the median total time"""
+    upscaler.upscale_array(images[0], tile_size=0, skip_threshold=0)  # warm up
+    timings = []
+    results: List[np.ndarray] = []
+    for _ in range(rounds):
+        started_at = time.perf_counter()
+        results = [upscaler.upscale_array(image, tile_size=0, skip_threshold=0) for image in images]
+        timings.append(time.perf_counter() - started_at)
+    return results, statistics.median(timings)
+
+
+def run(images_dir: Path, model_names: List[str], precisions: List[str], rounds: int) -> None:
+    settings = Settings()  # type: ignore[call-arg]
+    images = [
+        cv2.imread(str(path), cv2.IMREAD_COLOR)
+        for path in sorted(images_dir.iterdir())
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No images found in {images_dir}")
+
+    print(f"{len(images)} images, {rounds} rounds, OpenCV {cv2.__version__}")
+    print(f"{'model':>8} {'precision':>9} {'time, s':>8} {'speedup':>8} {'PSNR, dB':>9} {'min PSNR':>9} {'SSIM':>7}")
+
+    for model_name in model_names:
+        fp32 = Upscaler(model=ModelEnum[model_name], settings=settings, precision="fp32")
+        references, reference_time = _timed_run(fp32, images, rounds)
+        print(f"{model_name:>8} {'fp32':>9} {reference_time:>8.2f} {1.0:>8.2f} {'inf':>9} {'inf':>9} {1.0:>7.4f}")
+
+        for precision in precisions:
+            upscaler = Upscaler(model=ModelEnum[model_name], settings=settings, precision=precision)
+            try:
+                results, elapsed = _timed_run(upscaler, images, rounds)
+            except (FileNotFoundError, cv2.error) as e:
+                print(f"{model_name:>8} {precision:>9} skipped: {e}")
+                continue
+
+            psnrs = [cv2.PSNR(reference, result) for reference, result in zip(references, results)]
+            ssims = [ssim(reference, result) for reference, result in zip(references, results)]
+            print(
+                f"{model_name:>8} {precision:>9} {elapsed:>8.2f} {reference_time / elapsed:>8.2f} "
+                f"{sum(psnrs) / len(psnrs):>9.2f} {min(psnrs):>9.2f} {sum(ssims) / len(ssims):>7.4f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images_dir", type=Path)
+    parser.add_argument("--models", choices=list(ModelsList), nargs="+", default=list(ModelsList))
+    parser.add_argument("--precisions", choices=["fp16", "int8"], nargs="+", default=["fp16", "int8"])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.images_dir, args.models, args.precisions, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
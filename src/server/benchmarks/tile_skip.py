@@ -0,0 +1,76 @@
+"""
+Quality/speed benchmark for content-aware tile skipping.
+
+Runs every image of a directory through the tiled path with full EDSR and with each
+candidate TILE_SKIP_THRESHOLD, then reports the fraction of skipped tiles, the speedup
+and PSNR against the full EDSR result, so the threshold can be tuned.
+
+Usage:
+    python -m src.server.benchmarks.tile_skip ./images --model EDSR_x2 --thresholds 5 10 25 50
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+import cv2
+
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum, ModelsList
+from src.server.upscaler.opencv import Upscaler
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp"}
+
+
+def run(images_dir: Path, model_name: str, thresholds: List[float], tile_size: int) -> None:
+    upscaler = Upscaler(model=ModelEnum[model_name], settings=Settings())  # type: ignore[call-arg]
+    upscaler.initialize_sync()
+
+    images = [
+        cv2.imread(str(path), cv2.IMREAD_COLOR)
+        for path in sorted(images_dir.iterdir())
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No images found in {images_dir}")
+
+    print(f"{len(images)} images, model {model_name}, tile {tile_size}px, method {upscaler.settings.TILE_SKIP_METHOD}")
+
+    started_at = time.perf_counter()
+    references = [upscaler.upscale_array(image, tile_size=tile_size, skip_threshold=0) for image in images]
+    reference_time = time.perf_counter() - started_at
+    print(f"{'threshold':>10} {'skipped %':>10} {'time, s':>10} {'speedup':>8} {'PSNR, dB':>9} {'min PSNR':>9}")
+    print(f"{'full':>10} {0.0:>10.1f} {reference_time:>10.2f} {1.0:>8.2f} {'inf':>9} {'inf':>9}")
+
+    for threshold in thresholds:
+        skipped = tiles = 0
+        psnrs = []
+        started_at = time.perf_counter()
+        for image, reference in zip(images, references):
+            result = upscaler.upscale_array(image, tile_size=tile_size, skip_threshold=threshold)
+            stats = upscaler.tile_stats
+            skipped += stats["skipped_tiles"]
+            tiles += stats["tiles"]
+            psnrs.append(cv2.PSNR(reference, result))
+        elapsed = time.perf_counter() - started_at
+
+        print(
+            f"{threshold:>10g} {skipped * 100.0 / max(tiles, 1):>10.1f} {elapsed:>10.2f} "
+            f"{reference_time / elapsed:>8.2f} {sum(psnrs) / len(psnrs):>9.2f} {min(psnrs):>9.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images_dir", type=Path)
+    parser.add_argument("--model", choices=list(ModelsList), default="EDSR_x2")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[5, 10, 25, 50, 100])
+    parser.add_argument("--tile-size", type=int, default=128)
+    args = parser.parse_args()
+
+    run(args.images_dir, args.model, args.thresholds, args.tile_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Optional, Dict, Callable
+
+from src.server.broker.base import JobBroker
+from src.server.broker.sqlite import SQLiteBroker
+from src.server.config import Settings
+from src.server.logger import logger
+
+# Реализации брокера по схеме BROKER_URL; каждая получает путь/адрес после '://' и настройки
+BACKENDS: Dict[str, Callable[[str, Settings], JobBroker]] = {
+    "sqlite": lambda location, settings: SQLiteBroker(
+        # Как в SQLAlchemy: sqlite:///relative.db и sqlite:////absolute.db
+        location[1:] if location.startswith("/") else location,
+        max_attempts=settings.BROKER_MAX_ATTEMPTS,
+    ),
+}
+
+
+def create_broker(settings: Settings) -> Optional[JobBroker]:
+    """
+    Создаёт брокер задач по BROKER_URL.
+
+    :return: Брокер или None, если BROKER_URL не задан (инференс в процессе API)
+    """
+    if not settings.BROKER_URL:
+        return None
+
+    scheme, separator, location = settings.BROKER_URL.partition("://")
+    if not separator or scheme not in BACKENDS:
+        raise ValueError(f"Unsupported BROKER_URL: {settings.BROKER_URL}; supported schemes: {', '.join(BACKENDS)}")
+    return BACKENDS[scheme](location, settings)
+
+
+async def run_cleanup(broker: JobBroker, max_age_seconds: float, interval_seconds: float):
+    """Фоновая задача: периодически удаляет завершённые задачи, которые никто не забрал"""
+    while True:
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, broker.cleanup, max_age_seconds)
+        except Exception as e:
+            logger.error(f"Broker cleanup failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,86 @@
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional, Dict, Any, List
+
+# Статусы задачи брокера
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class BrokerTask(NamedTuple):
+    """
+    Задача увеличения в брокере.
+
+    params - параметры Upscaler ('model', 'output_size', 'output_format'),
+    details - сведения от воркера о выполнении (статистика тайлов, план ресайза).
+    """
+    id: str
+    status: str
+    params: Dict[str, Any]
+    payload: Optional[bytes] = None
+    result: Optional[bytes] = None
+    details: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    worker_id: Optional[str] = None
+
+
+class JobBroker(ABC):
+    """
+    Очередь задач увеличения между фронтендом API и воркерами (python -m src.server.cli worker).
+
+    Взятая воркером задача невидима для других воркеров на время аренды (visibility timeout);
+    воркер продлевает аренду, пока работает. Если воркер упал и аренда истекла, задачу
+    берёт другой воркер, пока число попыток не превысит max_attempts.
+    """
+
+    @abstractmethod
+    def enqueue(self, payload: bytes, params: Dict[str, Any]) -> str:
+        """Ставит задачу в очередь и возвращает её id"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, visibility_timeout: float) -> Optional[BrokerTask]:
+        """Берёт самую старую доступную задачу (новую или с истёкшей арендой) или возвращает None"""
+
+    @abstractmethod
+    def register_worker(self, worker_id: str, concurrency: int) -> None:
+        """Регистрирует воркер или отмечает, что он жив (вызывается периодически)"""
+
+    @abstractmethod
+    def heartbeat(self, task_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        """Продлевает аренду задачи; False - задача отменена или передана другому воркеру"""
+
+    @abstractmethod
+    def complete(self, task_id: str, worker_id: str, result: bytes, details: Dict[str, Any]) -> bool:
+        """Сохраняет результат задачи; False - аренда уже потеряна и результат отброшен"""
+
+    @abstractmethod
+    def fail(self, task_id: str, worker_id: str, error: str) -> None:
+        """Сообщает об ошибке: задача возвращается в очередь или, если попытки исчерпаны, завершается"""
+
+    @abstractmethod
+    def cancel(self, task_id: str) -> None:
+        """Отменяет незавершённую задачу (клиент отключился или истёк срок)"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[BrokerTask]:
+        """Текущее состояние задачи без входных данных (с результатом, если она выполнена)"""
+
+    @abstractmethod
+    def remove(self, task_id: str) -> None:
+        """Удаляет задачу (после того как фронтенд забрал результат)"""
+
+    @abstractmethod
+    def cleanup(self, max_age_seconds: float) -> int:
+        """Удаляет задачи старше max_age_seconds, которые никто не забрал; возвращает их количество"""
+
+    @abstractmethod
+    def queue_stats(self) -> Dict[str, int]:
+        """Количество задач по статусам"""
+
+    @abstractmethod
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        """Статистика воркеров: выполнено, ошибок, занятое время, пропускная способность"""
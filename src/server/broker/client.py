@@ -0,0 +1,69 @@
+import asyncio
+from typing import Optional, Tuple, Dict, Any
+
+from src.server.broker.base import JobBroker, DONE, CANCELLED, FINISHED
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum
+from src.server.logger import logger
+from src.server.utils.cancellation import CancelToken, UpscaleCancelled
+from src.server.utils.history import RequestHistory
+
+
+async def upscale_remote(
+        broker: JobBroker,
+        model: ModelEnum,
+        settings: Settings,
+        image_bytes: bytes,
+        output_size: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        output_format: str = 'png',
+        cancel_token: Optional[CancelToken] = None,
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Увеличение через брокер: задача ставится в очередь и выполняется воркером
+    (python -m src.server.cli worker), фронтенд только ждёт результат.
+
+    Если токен отменён (клиент отключился, истёк дедлайн), задача отменяется в брокере,
+    и воркер прерывает её на ближайшей границе тайла.
+
+    Модель на фронтенде не загружается; точность инференса выбирает воркер по своим настройкам.
+
+    :return: Байты результата и сведения воркера о выполнении ('tiles', 'resize_plan', 'worker_id')
+    """
+    loop = asyncio.get_event_loop()
+    params = {
+        "model": model.name,
+        "output_size": list(output_size) if output_size else None,
+        "output_format": output_format,
+    }
+    task_id = await loop.run_in_executor(None, broker.enqueue, image_bytes, params)
+    RequestHistory.annotate(broker_task=task_id)
+
+    try:
+        while True:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            task = await loop.run_in_executor(None, broker.get, task_id)
+            if task is None:
+                raise RuntimeError(f"Broker task {task_id} disappeared")
+            if task.status in FINISHED:
+                break
+            await asyncio.sleep(settings.BROKER_POLL_INTERVAL_SECONDS)
+    except UpscaleCancelled:
+        await loop.run_in_executor(None, broker.cancel, task_id)
+        raise
+
+    await loop.run_in_executor(None, broker.remove, task_id)
+    details = task.details or {}
+    RequestHistory.annotate(worker=task.worker_id, attempts=task.attempts)
+    if "tiles" in details:
+        RequestHistory.annotate(tiles=details["tiles"])
+    if details.get("resize_plan") is not None:
+        RequestHistory.annotate(resize_plan=details["resize_plan"])
+
+    if task.status == CANCELLED:
+        raise UpscaleCancelled("cancelled by the broker")
+    if task.status != DONE:
+        raise RuntimeError(f"Remote upscaling failed after {task.attempts} attempts: {task.error}")
+
+    logger.info(f"Broker task {task_id} completed by {task.worker_id}")
+    return task.result, details
@@ -0,0 +1,279 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Iterator
+
+from src.server.broker.base import JobBroker, BrokerTask, PENDING, RUNNING, DONE, FAILED, CANCELLED, FINISHED
+from src.server.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    result BLOB,
+    details TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_until REAL,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status_created ON tasks (status, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    concurrency INTEGER NOT NULL DEFAULT 1,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    busy_seconds REAL NOT NULL DEFAULT 0
+);
+"""
+
+# Колонки задачи без входных данных (их читает только claim)
+_TASK_COLUMNS = "id, status, params, result, details, error, attempts, worker_id"
+
+
+class SQLiteBroker(JobBroker):
+    """
+    Брокер задач в файле SQLite: общий для процессов одной машины, без отдельного сервера
+    очередей. Только для одного хоста: WAL использует общую память и не работает на сетевых
+    файловых системах (NFS, SMB), поэтому API и воркеры должны быть на одной машине.
+
+    Каждая операция открывает своё соединение, поэтому брокер можно использовать из любых
+    потоков; взятие задачи выполняется в транзакции BEGIN IMMEDIATE, так что одну задачу
+    не могут взять два воркера. Входные данные и результат хранятся в BLOB и удаляются,
+    как только становятся не нужны.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        :param path: Путь к файлу базы данных
+        :param max_attempts: Сколько раз задача выдаётся воркерам, прежде чем считается неудачной
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        logger.info(f"SQLite job broker at {path}")
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция с блокировкой записи с самого начала (BEGIN IMMEDIATE)"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _task(row: tuple, payload: Optional[bytes] = None) -> BrokerTask:
+        task_id, status, params, result, details, error, attempts, worker_id = row
+        return BrokerTask(
+            id=task_id,
+            status=status,
+            params=json.loads(params),
+            payload=payload,
+            result=result,
+            details=json.loads(details) if details else None,
+            error=error,
+            attempts=attempts,
+            worker_id=worker_id,
+        )
+
+    def enqueue(self, payload: bytes, params: Dict[str, Any]) -> str:
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO tasks (id, status, params, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (task_id, PENDING, json.dumps(params), payload, now, now),
+            )
+        logger.debug(f"Enqueued broker task {task_id} ({len(payload)} bytes)")
+        return task_id
+
+    def claim(self, worker_id: str, visibility_timeout: float) -> Optional[BrokerTask]:
+        now = time.time()
+        with self._transaction() as conn:
+            # Задачи упавших воркеров, исчерпавшие попытки, больше не выдаются
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, payload = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Worker lease expired too many times", now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM tasks WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (PENDING, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE tasks SET status = ?, worker_id = ?, lease_until = ?, claimed_at = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, worker_id, now + visibility_timeout, now, now, row[0]),
+            )
+            task_row = conn.execute(
+                f"SELECT {_TASK_COLUMNS}, payload FROM tasks WHERE id = ?", (row[0],)
+            ).fetchone()
+
+        task = self._task(task_row[:-1], payload=task_row[-1])
+        if task.attempts > 1:
+            logger.warning(f"Broker task {task.id} reclaimed by {worker_id}, attempt {task.attempts}")
+        return task
+
+    def register_worker(self, worker_id: str, concurrency: int) -> None:
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, concurrency, started_at, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET concurrency = excluded.concurrency, last_seen = excluded.last_seen",
+                (worker_id, concurrency, now, now),
+            )
+
+    def heartbeat(self, task_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        now = time.time()
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (now + visibility_timeout, now, task_id, worker_id, RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def _finish_attempt(self, conn: sqlite3.Connection, worker_id: str, claimed_at: float, succeeded: bool):
+        """Учитывает попытку в статистике воркера"""
+        now = time.time()
+        conn.execute(
+            "UPDATE workers SET completed = completed + ?, failed = failed + ?, "
+            "busy_seconds = busy_seconds + ?, last_seen = ? WHERE id = ?",
+            (int(succeeded), int(not succeeded), max(0.0, now - claimed_at), now, worker_id),
+        )
+
+    def complete(self, task_id: str, worker_id: str, result: bytes, details: Dict[str, Any]) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT claimed_at FROM tasks WHERE id = ? AND worker_id = ? AND status = ?",
+                (task_id, worker_id, RUNNING),
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Broker task {task_id} is no longer leased by {worker_id}, result dropped")
+                return False
+            conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, details = ?, payload = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (DONE, result, json.dumps(details), time.time(), task_id),
+            )
+            self._finish_attempt(conn, worker_id, row[0], succeeded=True)
+        return True
+
+    def fail(self, task_id: str, worker_id: str, error: str) -> None:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT claimed_at, attempts FROM tasks WHERE id = ? AND worker_id = ? AND status = ?",
+                (task_id, worker_id, RUNNING),
+            ).fetchone()
+            if row is None:
+                return
+            claimed_at, attempts = row
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, payload = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (FAILED, error, time.time(), task_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, worker_id = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (PENDING, error, time.time(), task_id),
+                )
+            self._finish_attempt(conn, worker_id, claimed_at, succeeded=False)
+
+    def cancel(self, task_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, payload = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), task_id, PENDING, RUNNING),
+            )
+
+    def get(self, task_id: str) -> Optional[BrokerTask]:
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._task(row) if row is not None else None
+
+    def remove(self, task_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def cleanup(self, max_age_seconds: float) -> int:
+        cutoff = time.time() - max_age_seconds
+        with self._connection() as conn:
+            # Незавершённые задачи не трогаем: их держат воркеры или ждёт фронтенд
+            removed = conn.execute(
+                f"DELETE FROM tasks WHERE updated_at < ? AND status IN ({', '.join('?' * len(FINISHED))})",
+                (cutoff, *FINISHED),
+            ).rowcount
+            conn.execute("DELETE FROM workers WHERE last_seen < ?", (cutoff,))
+        if removed:
+            logger.info(f"Broker cleanup removed {removed} finished tasks")
+        return removed
+
+    def queue_stats(self) -> Dict[str, int]:
+        with self._connection() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        stats = {status: 0 for status in (PENDING, RUNNING, DONE, FAILED, CANCELLED)}
+        stats.update(dict(rows))
+        return stats
+
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT w.id, w.concurrency, w.started_at, w.last_seen, w.completed, w.failed, w.busy_seconds, "
+                "(SELECT COUNT(*) FROM tasks t WHERE t.worker_id = w.id AND t.status = ?) "
+                "FROM workers w ORDER BY w.id",
+                (RUNNING,),
+            ).fetchall()
+
+        stats = []
+        for worker_id, concurrency, started_at, last_seen, completed, failed, busy_seconds, running in rows:
+            uptime = max(last_seen - started_at, 1e-9)
+            stats.append({
+                "worker_id": worker_id,
+                "concurrency": concurrency,
+                "running": running,
+                "completed": completed,
+                "failed": failed,
+                "busy_seconds": round(busy_seconds, 3),
+                "uptime_seconds": round(uptime, 3),
+                "seconds_since_seen": round(now - last_seen, 3),
+                # Выполненных задач в секунду за время жизни воркера и доля занятых слотов
+                "throughput": round(completed / uptime, 4),
+                "utilization": round(min(1.0, busy_seconds / (uptime * max(concurrency, 1))), 4),
+            })
+        return stats
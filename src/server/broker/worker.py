@@ -0,0 +1,143 @@
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from src.server.broker.base import JobBroker, BrokerTask
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum
+from src.server.logger import logger
+from src.server.upscaler.opencv import Upscaler
+from src.server.utils.cancellation import CancelToken, UpscaleCancelled
+
+
+class BrokerWorker:
+    """
+    Воркер, выполняющий задачи брокера на Upscaler.
+
+    Запускает concurrency потоков, каждый берёт задачи из брокера и увеличивает их
+    (модели берутся из общего пула процесса). Отдельный поток продлевает аренду взятых
+    задач; если продлить не удалось (задачу отменил фронтенд или её забрал другой воркер
+    после истечения аренды), обработка прерывается на ближайшей границе тайла.
+    """
+
+    def __init__(
+            self,
+            broker: JobBroker,
+            settings: Settings,
+            worker_id: Optional[str] = None,
+            concurrency: int = 1,
+    ):
+        self.broker = broker
+        self.settings = settings
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        self.stop_event = threading.Event()
+        # Задачи в работе: id -> токен отмены
+        self._active: Dict[str, CancelToken] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def _lease_interval(self) -> float:
+        """Период продления аренды: с запасом, чтобы пропуск одного продления не терял задачу"""
+        return self.settings.BROKER_VISIBILITY_TIMEOUT_SECONDS / 3
+
+    def run(self):
+        """Обрабатывает задачи, пока не установлен stop_event; текущие задачи дорабатываются"""
+        self.broker.register_worker(self.worker_id, self.concurrency)
+        logger.info(f"Broker worker {self.worker_id} started with {self.concurrency} threads")
+
+        workers_done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(workers_done,), name="broker-heartbeat", daemon=True,
+        )
+        heartbeat.start()
+        threads = [
+            threading.Thread(target=self._work_loop, name=f"broker-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        workers_done.set()
+        heartbeat.join()
+        logger.info(f"Broker worker {self.worker_id} stopped")
+
+    def _work_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                task = self.broker.claim(self.worker_id, self.settings.BROKER_VISIBILITY_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to claim a broker task: {str(e)}")
+                task = None
+            if task is None:
+                self.stop_event.wait(self.settings.BROKER_POLL_INTERVAL_SECONDS)
+                continue
+            self._process(task)
+
+    def _heartbeat_loop(self, done: threading.Event):
+        # Работает, пока рабочие потоки не завершатся (в том числе дорабатывая задачи после stop)
+        while not done.wait(self._lease_interval):
+            self._heartbeat()
+
+    def _heartbeat(self):
+        try:
+            self.broker.register_worker(self.worker_id, self.concurrency)
+            with self._lock:
+                active = list(self._active.items())
+            for task_id, token in active:
+                if not self.broker.heartbeat(task_id, self.worker_id, self.settings.BROKER_VISIBILITY_TIMEOUT_SECONDS):
+                    logger.info(f"Lost the lease of broker task {task_id}, cancelling")
+                    token.cancel("task cancelled or reassigned")
+        except Exception as e:
+            logger.error(f"Broker heartbeat failed: {str(e)}")
+
+    def _process(self, task: BrokerTask):
+        token = CancelToken()
+        with self._lock:
+            self._active[task.id] = token
+
+        started_at = time.perf_counter()
+        try:
+            # Upscaler хранит состояние вызова (статистика тайлов, план ресайза), поэтому
+            # создаётся на задачу; сами сети переиспользуются через пул моделей
+            upscaler = Upscaler(
+                model=ModelEnum[task.params["model"]],
+                settings=self.settings,
+                precision=task.params.get("precision"),
+            )
+            output_size = task.params.get("output_size")
+            result = upscaler.upscale_sync(
+                task.payload,
+                output_size=tuple(output_size) if output_size else None,
+                output_format=task.params.get("output_format", "png"),
+                cancel_token=token,
+            )
+        except UpscaleCancelled as e:
+            # Задача уже отменена или передана другому воркеру: сообщать нечего
+            logger.info(f"Broker task {task.id} interrupted: {e.reason}")
+        except Exception as e:
+            logger.error(f"Broker task {task.id} failed: {str(e)}")
+            try:
+                self.broker.fail(task.id, self.worker_id, str(e))
+            except Exception as report_error:
+                # Задача останется за воркером до истечения аренды и будет выдана повторно
+                logger.error(f"Failed to report broker task {task.id} as failed: {str(report_error)}")
+        else:
+            details = {
+                "tiles": upscaler.tile_stats,
+                "resize_plan": upscaler.resize_plan.to_dict() if upscaler.resize_plan is not None else None,
+                "worker_id": self.worker_id,
+                "seconds": round(time.perf_counter() - started_at, 4),
+            }
+            try:
+                if self.broker.complete(task.id, self.worker_id, result, details):
+                    logger.info(f"Broker task {task.id} done in {details['seconds']:.2f}s")
+            except Exception as e:
+                logger.error(f"Failed to report broker task {task.id} as done: {str(e)}")
+        finally:
+            with self._lock:
+                self._active.pop(task.id, None)
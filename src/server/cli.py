@@ -0,0 +1,337 @@
+import argparse
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Iterator
+
+import cv2
+
+from src.server.broker.backends import create_broker
+from src.server.broker.worker import BrokerWorker
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum, ModelsList
+from src.server.logger import logger
+from src.server.upscaler.executor import resolve_thread_counts
+from src.server.upscaler.opencv import Upscaler
+from src.server.upscaler.quantization import (
+    QuantizedSuperRes,
+    calibration_patches,
+    calibration_path,
+    save_calibration,
+)
+from src.server.upscaler.video import VideoUpscaler
+from src.server.utils.manifest import UpscaleManifest, SourceFingerprint
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff"}
+MANIFEST_FILE = ".upscale_manifest.json"
+
+# Upscaler of the current pool worker process, loaded once by _init_worker
+_worker_upscaler: Optional[Upscaler] = None
+
+
+def _init_worker(model_name: str, workers: int) -> None:
+    """Load the model once per worker process and give it its share of the CPUs."""
+    global _worker_upscaler
+    settings = Settings()  # type: ignore[call-arg]
+    # Every process runs one image at a time: split the cores between the processes instead
+    # of letting each OpenCV use all of them
+    _, threads = resolve_thread_counts(settings.model_copy(update={"INFERENCE_WORKERS": workers}))
+    cv2.setNumThreads(threads)
+    _worker_upscaler = Upscaler(model=ModelEnum[model_name], settings=settings)
+    _worker_upscaler.initialize_sync()
+
+
+def _process_file(source: str, destination: str, output_format: str) -> Tuple[str, float]:
+    """Upscale one file inside a worker process and write the result atomically."""
+    if _worker_upscaler is None:
+        raise RuntimeError("Worker process was not initialized")
+
+    start_time = time.perf_counter()
+    with open(source, "rb") as f:
+        result = _worker_upscaler.upscale_sync(f.read(), output_format=output_format)
+
+    destination_path = Path(destination)
+    destination_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = destination_path.with_name(f".{destination_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(result)
+    os.replace(tmp_path, destination_path)
+
+    return source, time.perf_counter() - start_time
+
+
+def _iter_images(input_dir: Path) -> Iterator[Path]:
+    """Walk the input tree in a stable order and yield image files."""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = Path(root) / name
+            if path.suffix.lower() in IMAGE_EXTENSIONS:
+                yield path
+
+
+def _format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+def _print_progress(done: int, total: int, failed: int, started_at: float, unit: str = "img") -> None:
+    elapsed = time.perf_counter() - started_at
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = _format_eta((total - done) / rate) if rate > 0 else "--:--:--"
+    sys.stderr.write(
+        f"\r[{done}/{total}] {rate:.2f} {unit}/s, failed: {failed}, elapsed: {_format_eta(elapsed)}, ETA: {eta}"
+    )
+    sys.stderr.flush()
+
+
+def upscale_directory(
+        input_dir: Path,
+        output_dir: Path,
+        model_name: str,
+        workers: int,
+        output_format: str = "png",
+        force: bool = False,
+        save_every: int = 10,
+) -> int:
+    """
+    Upscale every image under input_dir into output_dir using a pool of worker processes.
+
+    Already processed files (same content hash, model, format, precision and tile settings)
+    are skipped using a manifest stored in output_dir, so an interrupted run can simply be
+    restarted. Outputs keep the source extension (a.jpg -> a.jpg.png), so a.jpg and a.png
+    in the same directory do not overwrite each other.
+
+    Returns:
+        int: number of files that failed
+    """
+    manifest = UpscaleManifest(output_dir / MANIFEST_FILE)
+    # Everything the result depends on besides the source: precision, tile and skip settings
+    params = Upscaler(model=ModelEnum[model_name], settings=Settings()).result_params(  # type: ignore[call-arg]
+        None, output_format,
+    )
+
+    pending: List[Tuple[str, Path, Path, SourceFingerprint]] = []
+    skipped = 0
+    for source in _iter_images(input_dir):
+        key = source.relative_to(input_dir).as_posix()
+        destination = output_dir / f"{key}.{output_format}"
+        fingerprint = manifest.fingerprint(source) if force else manifest.is_up_to_date(
+            key, source, model_name, output_format, params,
+        )
+        if fingerprint is None:
+            skipped += 1
+            continue
+        pending.append((key, source, destination, fingerprint))
+
+    total = len(pending)
+    logger.info(f"Bulk upscale: {total} files to process, {skipped} up to date, {workers} workers")
+    if not total:
+        manifest.save()
+        return 0
+
+    queue = iter(pending)
+    done = failed = 0
+    started_at = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name, workers)) as executor:
+        # Keep a bounded number of tasks in flight so memory doesn't grow with the tree size
+        in_flight: Dict[Future, Tuple[str, Path, Path, SourceFingerprint]] = {}
+
+        def submit_next() -> None:
+            item = next(queue, None)
+            if item is not None:
+                _, item_source, item_destination, _ = item
+                future = executor.submit(_process_file, str(item_source), str(item_destination), output_format)
+                in_flight[future] = item
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        try:
+            while in_flight:
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    key, source, destination, fingerprint = in_flight.pop(future)
+                    try:
+                        _, seconds = future.result()
+                        manifest.mark_done(key, fingerprint, model_name, output_format, params, destination)
+                        logger.debug(f"Upscaled {key} in {seconds:.2f}s")
+                    except Exception as exc:
+                        failed += 1
+                        logger.error(f"Bulk upscale failed for {key}: {exc}")
+                    done += 1
+
+                    if done % save_every == 0:
+                        manifest.save()
+
+                    submit_next()
+
+                _print_progress(done, total, failed, started_at)
+        finally:
+            manifest.save()
+            sys.stderr.write("\n")
+
+    logger.info(f"Bulk upscale finished: {done - failed} done, {failed} failed, {skipped} skipped")
+    return failed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.server.cli", description="AI Upscaler command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    upscale_dir = subparsers.add_parser("upscale-dir", help="Upscale all images in a directory tree")
+    upscale_dir.add_argument("input_dir", type=Path)
+    upscale_dir.add_argument("output_dir", type=Path)
+    upscale_dir.add_argument("--model", choices=list(ModelsList), default="EDSR_x2")
+    upscale_dir.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    upscale_dir.add_argument("--format", dest="output_format", choices=["png", "jpg"], default="png")
+    upscale_dir.add_argument("--force", action="store_true", help="Reprocess files even if they are up to date")
+
+    upscale_video = subparsers.add_parser("upscale-video", help="Upscale a video file or an image sequence")
+    upscale_video.add_argument("source", help="Video file or frame pattern such as 'frames/%%05d.png'")
+    upscale_video.add_argument("destination", help="Output .mp4 file or frame pattern")
+    upscale_video.add_argument("--model", choices=list(ModelsList), default="EDSR_x2")
+
+    quantize = subparsers.add_parser("quantize", help="Prepare the int8 variant of a model from calibration images")
+    quantize.add_argument("calibration_dir", type=Path, help="Directory with representative images")
+    quantize.add_argument("--model", choices=list(ModelsList), default="EDSR_x2")
+    quantize.add_argument("--patch-size", type=int, default=64)
+    quantize.add_argument("--patches-per-image", type=int, default=4)
+
+    worker = subparsers.add_parser("worker", help="Process upscaling tasks from the job broker (BROKER_URL)")
+    worker.add_argument("--concurrency", type=int, default=1, help="Number of tasks processed in parallel")
+    worker.add_argument("--worker-id", default=None, help="Worker name in broker statistics (default: host-pid)")
+
+    serve = subparsers.add_parser("serve", help="Run the API with pre-forked workers sharing loaded models")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    serve.add_argument("--memory-report-interval", type=float, default=60.0,
+                       help="Seconds between per-worker USS/PSS memory reports")
+
+    return parser
+
+
+def upscale_video(source: str, destination: str, model_name: str) -> None:
+    """Upscale a video or an image sequence, printing progress to stderr."""
+    upscaler = Upscaler(model=ModelEnum[model_name], settings=Settings())  # type: ignore[call-arg]
+    started_at = time.perf_counter()
+
+    def on_progress(done: int, total: int) -> None:
+        _print_progress(done, max(total, done), 0, started_at, unit="frames")
+
+    try:
+        stats = VideoUpscaler(upscaler).process(source, destination, on_progress=on_progress)
+    finally:
+        sys.stderr.write("\n")
+    logger.info(f"Video upscale finished: {stats}")
+
+
+def quantize_model(model_name: str, calibration_dir: Path, patch_size: int, patches_per_image: int) -> None:
+    """
+    Write calibration data for the int8 variant of a model next to its .pb and check
+    the quantized network against FP32 on the calibration patches.
+    """
+    upscaler = Upscaler(model=ModelEnum[model_name], settings=Settings(), precision="fp32")  # type: ignore[call-arg]
+    images = [cv2.imread(str(path), cv2.IMREAD_COLOR) for path in _iter_images(calibration_dir)]
+    patches = calibration_patches(
+        (image for image in images if image is not None),
+        patch_size=patch_size,
+        patches_per_image=patches_per_image,
+    )
+
+    path = calibration_path(upscaler.model_path)
+    save_calibration(path, patches)
+    logger.info(f"Saved {len(patches)} calibration patches to {path}")
+
+    # The int8 network bypasses DnnSuperResImpl, so check that the FP32 network run the same way
+    # matches it before reporting the quantization loss
+    net = QuantizedSuperRes.load_net(upscaler.model_path)
+    quantized = QuantizedSuperRes(upscaler.model_path, path)
+    reference_psnrs, int8_psnrs = [], []
+    for patch in patches:
+        reference = upscaler.upscale_array(patch, tile_size=0, skip_threshold=0)
+        reference_psnrs.append(cv2.PSNR(reference, QuantizedSuperRes.run(net, patch)))
+        int8_psnrs.append(cv2.PSNR(reference, quantized.upsample(patch)))
+
+    print(f"FP32 direct run vs DnnSuperResImpl: min PSNR {min(reference_psnrs):.2f} dB")
+    print(f"int8 vs FP32: mean PSNR {sum(int8_psnrs) / len(int8_psnrs):.2f} dB, min {min(int8_psnrs):.2f} dB")
+    if min(reference_psnrs) < 50:
+        logger.warning("The direct FP32 run differs from DnnSuperResImpl, int8 results will be off")
+
+
+def run_worker(concurrency: int, worker_id: Optional[str]) -> int:
+    """Pull tasks from the broker until SIGTERM/SIGINT, then finish the tasks in progress."""
+    settings = Settings()  # type: ignore[call-arg]
+    broker = create_broker(settings)
+    if broker is None:
+        logger.error("BROKER_URL is not set, nothing to work on")
+        return 2
+
+    worker = BrokerWorker(broker, settings, worker_id=worker_id, concurrency=concurrency)
+
+    def stop(signum, frame) -> None:
+        logger.info(f"Received signal {signum}, finishing tasks in progress")
+        worker.stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    worker.run()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "upscale-dir":
+        failed = upscale_directory(
+            input_dir=args.input_dir,
+            output_dir=args.output_dir,
+            model_name=args.model,
+            workers=max(1, args.workers),
+            output_format=args.output_format,
+            force=args.force,
+        )
+        return 1 if failed else 0
+
+    if args.command == "upscale-video":
+        upscale_video(args.source, args.destination, args.model)
+        return 0
+
+    if args.command == "quantize":
+        quantize_model(args.model, args.calibration_dir, args.patch_size, args.patches_per_image)
+        return 0
+
+    if args.command == "worker":
+        return run_worker(max(1, args.concurrency), args.worker_id)
+
+    if args.command == "serve":
+        # Imported lazily: the supervisor pulls in the whole web application
+        from src.server.prefork import PreforkSupervisor
+
+        settings = Settings()  # type: ignore[call-arg]
+        if args.workers > 1 and settings.JOBS_ENABLED:
+            # Background jobs live in the memory of the worker that created them, so a poll
+            # served by another worker would not find the job
+            logger.error("Background jobs are kept per process: set JOBS_ENABLED=false to serve with --workers > 1")
+            return 2
+
+        PreforkSupervisor(
+            host=args.host,
+            port=args.port,
+            workers=max(1, args.workers),
+            settings=settings,
+            memory_report_interval=args.memory_report_interval,
+        ).run()
+        return 0
+
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
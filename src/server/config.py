@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal
 
 from dotenv import load_dotenv
 from pydantic import field_validator
@@ -34,6 +34,180 @@ class Settings(BaseSettings):
     USE_CUDA: bool = False
     """Whether to use CUDA for AI model operations."""
 
+    INFERENCE_PRECISION: Literal["fp32", "fp16", "int8"] = "fp32"
+    """Inference precision: fp32, fp16 (DNN_TARGET_CPU_FP16 / DNN_TARGET_CUDA_FP16 where OpenCV
+    supports it, fp32 otherwise) or int8 (requires calibration data, see `cli quantize`; models
+    without it run in fp32 with a warning)."""
+
+    INFERENCE_PRECISION_OVERRIDES: Dict[str, Literal["fp32", "fp16", "int8"]] = {}
+    """Per-model precision overrides, e.g. {"EDSR_x4": "fp16"} (parsed from JSON string)."""
+
+    # Inference executor settings
+    INFERENCE_WORKERS: int = 0
+    """Number of concurrent inference jobs (size of the dedicated inference thread pool).
+    0 selects automatically from the CPU count."""
+
+    INFERENCE_THREADS: int = 0
+    """Number of OpenCV threads per inference job (cv2.setNumThreads). 0 divides the CPUs
+    evenly between inference workers."""
+
+    INFERENCE_AUTOTUNE: bool = False
+    """Whether to benchmark worker/thread combinations on startup and apply the best one."""
+
+    INFERENCE_AUTOTUNE_IMAGE_SIZE: int = 128
+    """Side in pixels of the synthetic image used by the autotuner."""
+
+    INFERENCE_AUTOTUNE_ROUNDS: int = 3
+    """Number of requests per worker measured for each autotuner candidate."""
+
+    INFERENCE_AUTOTUNE_MAX_LATENCY_FACTOR: float = 2.0
+    """The autotuner maximizes throughput among candidates whose median latency is at most
+    this many times the best one."""
+
+    BUFFER_POOL_MAX_BYTES: int = 512 * 1024 ** 2
+    """Maximum total size of idle image buffers kept for reuse between requests
+    (result canvases, tile scratch). 0 disables reuse."""
+
+    TILE_SIZE: int = 0
+    """Tile size in pixels for tiled inference. 0 runs the whole image at once, unless some cells
+    of the TILE_GRID_SIZE grid are flat enough to be skipped (see TILE_SKIP_THRESHOLD) or the
+    upscale can be cancelled (HTTP requests and jobs), which is only checked between tiles."""
+
+    TILE_GRID_SIZE: int = 256
+    """Tile size used when TILE_SIZE is 0 but the image has to be tiled anyway: for cancellable
+    upscales, and when the image has flat tiles on this grid. It bounds how long a cancelled
+    or expired request keeps running."""
+
+    TILE_PAD: int = 8
+    """Overlap in pixels added around each tile to avoid seams between tiles."""
+
+    TILE_SKIP_METHOD: Literal["variance", "edges"] = "variance"
+    """Flatness measure for tiles: luminance variance or Canny edge density (percent of edge pixels)."""
+
+    TILE_SKIP_THRESHOLD: float = 4.0
+    """Tiles whose flatness measure is below this value are interpolated instead of run through
+    the network. 0 disables skipping. The default only skips near-uniform tiles (luminance
+    standard deviation below 2); tune it with the tile-skip benchmark."""
+
+    TILE_SKIP_INTERPOLATION: Literal["cubic", "lanczos"] = "cubic"
+    """Interpolation used for skipped tiles."""
+
+    REQUEST_DEADLINE_SECONDS: float = 0.0
+    """Default per-request deadline for upscaling; 0 disables it. Clients may set a shorter
+    one with the X-Request-Deadline header (seconds). The deadline and client disconnects are
+    checked between tiles (TILE_SIZE, or TILE_GRID_SIZE when it is 0), so a request may overrun
+    it by the time of one tile."""
+
+    PREVIEW_TILE_SIZE: int = 128
+    """Tile size used for progressive refinement of preview jobs when TILE_SIZE is 0."""
+
+    # Scheduler settings
+    SCHEDULER_DEFAULT_PRIORITY: Literal["interactive", "batch", "background"] = "batch"
+    """Priority class of clients without a configured API key. Higher classes always run first;
+    the X-Priority header can only lower a client's class."""
+
+    SCHEDULER_API_KEYS: Dict[str, Literal["interactive", "batch", "background"]] = {}
+    """API keys accepted in the X-API-Key header, mapped to the highest priority class the key
+    may use, e.g. {"<key>": "interactive"} (parsed from JSON string). Requests with other keys
+    are scheduled by client IP."""
+
+    SCHEDULER_TENANT_WEIGHTS: Dict[str, float] = {}
+    """Fair-share weights by tenant id, e.g. {"ip:10.0.0.5": 0.5, "key:<id>": 4} (parsed from JSON
+    string). Tenants are identified by a configured X-API-Key ("key:" + first 16 hex digits of
+    its SHA-256) or by client IP ("ip:<address>"). The default weight is 1."""
+
+    SCHEDULER_TENANT_MAX_CONCURRENCY: int = 0
+    """Maximum number of concurrent inference jobs per tenant; 0 disables the cap."""
+
+    SCHEDULER_TENANT_LIMITS: Dict[str, int] = {}
+    """Per-tenant overrides of SCHEDULER_TENANT_MAX_CONCURRENCY (parsed from JSON string)."""
+
+    SCHEDULER_AGING_SECONDS: float = 30.0
+    """Cheaper jobs of a tenant run first; a job's effective cost halves after waiting this long,
+    so expensive jobs are not overtaken forever."""
+
+    SCHEDULER_SHARE_HALF_LIFE_SECONDS: float = 300.0
+    """Half-life of the compute usage from which a tenant's share of compute is reported."""
+
+    # Result storage settings
+    RESULTS_MAX_AGE_SECONDS: float = 7 * 24 * 3600
+    """Stored upscaling results older than this (since last access) are removed. 0 disables the limit."""
+
+    RESULTS_MAX_BYTES: int = 5 * 1024 ** 3
+    """Maximum total size of stored results; the oldest are removed first. 0 disables the limit."""
+
+    RESULTS_JANITOR_INTERVAL_SECONDS: float = 600.0
+    """Interval between result storage cleanups."""
+
+    RESULTS_CACHE_PUBLIC: bool = False
+    """Allow shared caches (CDNs, proxies) to store results. By default results are cacheable
+    by the client only, since a result reveals the uploaded image to anyone who has its URL."""
+
+    JOBS_ENABLED: bool = True
+    """Whether the background job endpoints (video, preview and /jobs) are enabled. Jobs are
+    kept in process memory, so pre-fork serving with several workers requires disabling them."""
+
+    JOBS_MAX_PER_TENANT: int = 2
+    """Maximum number of unfinished background jobs per tenant (see SCHEDULER_API_KEYS);
+    further jobs are rejected with 429. 0 disables the limit."""
+
+    JOBS_DEADLINE_SECONDS: float = 0.0
+    """Background jobs running longer than this are cancelled; 0 disables the limit. Clients can
+    cancel their jobs with DELETE /jobs/{job_id}."""
+
+    JOBS_TTL_SECONDS: float = 24 * 3600
+    """Finished background jobs (video, preview) and their files are removed this long after
+    they finish. Checked every RESULTS_JANITOR_INTERVAL_SECONDS."""
+
+    # Video settings
+    VIDEO_QUEUE_SIZE: int = 8
+    """Maximum number of frames buffered between the decode, inference and encode stages."""
+
+    VIDEO_TILE_SIZE: int = 128
+    """Tile size in pixels used to detect and reuse unchanged regions between video frames."""
+
+    VIDEO_REUSE_THRESHOLD: float = 1.0
+    """Mean absolute pixel difference below which a frame region is considered unchanged."""
+
+    # Request history settings
+    HISTORY_RETENTION_DAYS: float = 7.0
+    """Raw request history records older than this are compacted into hourly rollups."""
+
+    HISTORY_HOURLY_RETENTION_DAYS: float = 90.0
+    """Hourly history rollups older than this are compacted into daily rollups."""
+
+    HISTORY_ROTATION_INTERVAL_SECONDS: float = 3600.0
+    """Interval between request history rotations."""
+
+    # Job broker settings
+    BROKER_URL: str = ""
+    """Job broker for distributed workers, e.g. "sqlite:///broker.db" (relative path) or
+    "sqlite:////var/lib/upscaler/broker.db". When set, the API only enqueues upscaling and
+    waits for workers started with `cli worker`. Empty runs inference in the API process.
+    The SQLite broker works on a single host only (WAL is unsafe on network filesystems)."""
+
+    BROKER_VISIBILITY_TIMEOUT_SECONDS: float = 60.0
+    """A claimed task is hidden from other workers for this long; workers extend the lease
+    while they run, so a task is only redelivered when its worker dies."""
+
+    BROKER_MAX_ATTEMPTS: int = 3
+    """Number of times a task is handed to workers before it is marked as failed."""
+
+    BROKER_POLL_INTERVAL_SECONDS: float = 0.2
+    """Interval at which idle workers poll for tasks and the API polls for results."""
+
+    BROKER_TASK_TTL_SECONDS: float = 3600.0
+    """Finished tasks whose result was never collected, and workers not seen for this long,
+    are removed by the API's periodic cleanup."""
+
+    # Admin settings
+    ADMIN_TOKEN: str = ""
+    """Token for admin endpoints (X-Admin-Token header), such as on-demand profiling.
+    Empty disables the admin endpoints."""
+
+    PROFILE_MAX_SECONDS: float = 300.0
+    """Upper limit on the duration of one profiling session."""
+
     # FastAPI documentation settings
     TITLE: str
     """Title of the API documentation."""
@@ -72,6 +246,10 @@ class Settings(BaseSettings):
         "ALLOW_ORIGINS",
         "ALLOW_METHODS",
         "ALLOW_HEADERS",
+        "INFERENCE_PRECISION_OVERRIDES",
+        "SCHEDULER_API_KEYS",
+        "SCHEDULER_TENANT_WEIGHTS",
+        "SCHEDULER_TENANT_LIMITS",
         mode="before",
     )
     def parse_json(cls, value: Any) -> Any:
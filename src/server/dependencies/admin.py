@@ -0,0 +1,20 @@
+import secrets
+from typing import Callable, Optional
+
+from fastapi import Depends, Header, HTTPException, status
+
+from src.server.config import Settings
+
+
+def require_admin(settings_injector: Callable[[], Settings]) -> Callable[[Optional[str], Settings], None]:
+    def _require_admin(
+            token: Optional[str] = Header(None, alias="X-Admin-Token"),
+            settings: Settings = Depends(settings_injector),
+    ) -> None:
+        # Without a configured token the admin endpoints do not exist
+        if not settings.ADMIN_TOKEN:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+        if token is None or not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+    return _require_admin
@@ -0,0 +1,20 @@
+from typing import Callable, Optional
+
+from fastapi import Depends
+
+from src.server.broker.backends import create_broker
+from src.server.broker.base import JobBroker
+from src.server.config import Settings
+
+_broker: Optional[JobBroker] = None
+
+
+def get_broker(settings_injector: Callable[[], Settings]) -> Callable[[], Optional[JobBroker]]:
+    def _get_broker(settings: Settings = Depends(settings_injector)) -> Optional[JobBroker]:
+        # One broker per process; None when BROKER_URL is not set (local inference)
+        global _broker
+        if _broker is None:
+            _broker = create_broker(settings)
+        return _broker
+
+    return _get_broker
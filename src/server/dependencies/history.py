@@ -1,8 +1,10 @@
-from typing import Callable
+from datetime import datetime
+from typing import Callable, Optional
 
-from fastapi import Depends
+from fastapi import Depends, Query
 
 from src.server.config import Settings
+from src.server.utils.columns import HistoryColumns, history_columns
 from src.server.utils.reports import PDFReportGenerator
 from src.server.utils.statistics import RequestStatistics
 
@@ -13,8 +15,10 @@ def get_pdf_reports_generator(
 ) -> Callable[[], PDFReportGenerator]:
     def _get_pdf_reports_generator(
             settings: Settings = Depends(settings_injector),
+            since: Optional[datetime] = Query(None, description="Start of the report window (inclusive)"),
+            until: Optional[datetime] = Query(None, description="End of the report window (exclusive)"),
     ) -> PDFReportGenerator:
-        return PDFReportGenerator(history_file=history_file, settings=settings)
+        return PDFReportGenerator(history_file=history_file, settings=settings, since=since, until=until)
 
     return _get_pdf_reports_generator
 
@@ -25,7 +29,21 @@ def get_statistics_processor(
 ) -> Callable[[], RequestStatistics]:
     def _get_statistics_processor(
             settings: Settings = Depends(settings_injector),
+            since: Optional[datetime] = Query(None, description="Start of the statistics window (inclusive)"),
+            until: Optional[datetime] = Query(None, description="End of the statistics window (exclusive)"),
     ) -> RequestStatistics:
-        return RequestStatistics(history_file=history_file, settings=settings)
+        return RequestStatistics(history_file=history_file, settings=settings, since=since, until=until)
 
     return _get_statistics_processor
+
+
+def get_history_columns(
+        history_file: str,
+        settings_injector: Callable[[], Settings],
+) -> Callable[[], HistoryColumns]:
+    def _get_history_columns(
+            settings: Settings = Depends(settings_injector),
+    ) -> HistoryColumns:
+        return history_columns.get(settings.APP_FILES_PATH / history_file)
+
+    return _get_history_columns
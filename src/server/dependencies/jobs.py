@@ -0,0 +1,21 @@
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, status
+
+from src.server.config import Settings
+from src.server.utils.jobs import JobManager
+
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager(settings_injector: Callable[[], Settings]) -> Callable[[], JobManager]:
+    def _get_job_manager(settings: Settings = Depends(settings_injector)) -> JobManager:
+        if not settings.JOBS_ENABLED:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Background jobs are disabled")
+        # Jobs live in process memory, so all requests must share one manager
+        global _job_manager
+        if _job_manager is None:
+            _job_manager = JobManager(settings=settings)
+        return _job_manager
+
+    return _get_job_manager
@@ -0,0 +1,51 @@
+import hashlib
+import secrets
+from typing import Callable, Literal, NamedTuple, Optional
+
+from fastapi import Depends, Header, Request
+
+from src.server.config import Settings
+from src.server.upscaler.scheduler import PRIORITY_CLASSES
+
+
+class Tenant(NamedTuple):
+    """Client on whose behalf upscaling is scheduled."""
+    id: str
+    priority: str
+
+
+def tenant_id(request: Request, api_key: Optional[str]) -> str:
+    """Tenant id: a digest of a known API key (never the key itself), or the client IP."""
+    if api_key:
+        return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def key_priority(settings: Settings, api_key: Optional[str]) -> Optional[str]:
+    """The highest priority class allowed for an API key, or None if the key is not configured."""
+    if not api_key:
+        return None
+    for key, priority in settings.SCHEDULER_API_KEYS.items():
+        if secrets.compare_digest(api_key.encode(), key.encode()):
+            return priority
+    return None
+
+
+def get_tenant(settings_injector: Callable[[], Settings]) -> Callable[..., Tenant]:
+    def _get_tenant(
+            request: Request,
+            api_key: Optional[str] = Header(None, alias="X-API-Key"),
+            priority: Optional[Literal["interactive", "batch", "background"]] = Header(None, alias="X-Priority"),
+            settings: Settings = Depends(settings_injector),
+    ) -> Tenant:
+        allowed = key_priority(settings, api_key)
+        if allowed is None:
+            # Unknown keys are ignored: otherwise a client could get a fresh fair share per random key
+            api_key = None
+            allowed = settings.SCHEDULER_DEFAULT_PRIORITY
+        # X-Priority may lower the class, but not raise it above what the client is allowed
+        requested = priority or allowed
+        priority = max(requested, allowed, key=PRIORITY_CLASSES.index)
+        return Tenant(id=tenant_id(request, api_key), priority=priority)
+
+    return _get_tenant
@@ -0,0 +1,13 @@
+from typing import Callable
+
+from fastapi import Depends
+
+from src.server.config import Settings
+from src.server.utils.storage import ResultStorage
+
+
+def get_result_storage(settings_injector: Callable[[], Settings]) -> Callable[[], ResultStorage]:
+    def _get_result_storage(settings: Settings = Depends(settings_injector)) -> ResultStorage:
+        return ResultStorage(settings=settings)
+
+    return _get_result_storage
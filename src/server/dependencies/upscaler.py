@@ -1,4 +1,4 @@
-from typing import Callable
+from typing import Callable, Optional
 
 from fastapi import Depends, Body
 
@@ -13,3 +13,21 @@ def get_upscaler(get_settings: Callable[[], Settings]) -> Callable[[ModelType],
         return upscaler
 
     return _get_upscaler
+
+
+def get_model(model: ModelType = Body(...)) -> ModelEnum:
+    return ModelEnum[model]
+
+
+def get_local_upscaler(get_settings: Callable[[], Settings]) -> Callable[[ModelEnum], Optional[Upscaler]]:
+    def _get_local_upscaler(
+            model: ModelEnum = Depends(get_model),
+            settings: Settings = Depends(get_settings),
+    ) -> Optional[Upscaler]:
+        # With BROKER_URL set, inference runs on the broker workers and the API host
+        # doesn't need the model files
+        if settings.BROKER_URL:
+            return None
+        return Upscaler(model=model, settings=settings)
+
+    return _get_local_upscaler
@@ -1,3 +1,6 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, status, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,16 +8,71 @@ from fastapi.responses import JSONResponse
 
 from pydantic import ValidationError
 
+from src.server.broker.backends import create_broker, run_cleanup
 from src.server.config import Settings
+from src.server.dependencies.jobs import get_job_manager
+from src.server.dependencies.settings import get_settings
+from src.server.logger import logger
+from src.server.upscaler.autotune import autotune
+from src.server.upscaler.executor import get_inference_executor
+from src.server.utils.cancellation import UpscaleCancelled
+from src.server.utils.rollups import HistoryRotator
+from src.server.utils.storage import ResultStorage
 from src.server.api.v1.routers.upscaler import router as upscaler_router_v1
 from src.server.api.v1.routers.models import router as models_router_v1
 from src.server.api.v1.routers.history import router as history_router_v1
+from src.server.api.v1.routers.jobs import router as jobs_router_v1
+from src.server.api.v1.routers.broker import router as broker_router_v1
+from src.server.api.v1.routers.admin import router as admin_router_v1
 
 # Load application configuration
 settings = Settings()  # type: ignore[call-arg]
 
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """
+    Application lifespan: prepares the inference executor (optionally autotuned
+    for the host) before serving requests and runs the result storage janitor,
+    the request history rotation and the cleanup of finished background jobs
+    (plus the job broker cleanup when BROKER_URL is set). Under the pre-fork
+    server, the process-wide tasks run in one worker only.
+    """
+    # Under the pre-fork server the autotuner has already run in the parent process, and
+    # the process-wide background tasks run only in the worker of slot 0
+    prefork_slot = getattr(application.state, "prefork_slot", None)
+    get_inference_executor(settings)
+    if settings.INFERENCE_AUTOTUNE and prefork_slot is None:
+        await asyncio.get_event_loop().run_in_executor(None, autotune, settings)
+
+    background = []
+    if settings.JOBS_ENABLED:
+        job_manager = get_job_manager(get_settings)(settings)
+        background.append(asyncio.create_task(
+            job_manager.run_janitor(settings.JOBS_TTL_SECONDS, settings.RESULTS_JANITOR_INTERVAL_SECONDS)
+        ))
+    if prefork_slot in (None, 0):
+        background.append(asyncio.create_task(
+            ResultStorage(settings).run_janitor(settings.RESULTS_JANITOR_INTERVAL_SECONDS)
+        ))
+        background.append(asyncio.create_task(
+            HistoryRotator(settings=settings).run(settings.HISTORY_ROTATION_INTERVAL_SECONDS)
+        ))
+        broker = create_broker(settings)
+        if broker is not None:
+            background.append(asyncio.create_task(
+                run_cleanup(broker, settings.BROKER_TASK_TTL_SECONDS, settings.RESULTS_JANITOR_INTERVAL_SECONDS)
+            ))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+
+
 # Initialize main FastAPI application with metadata from settings
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.TITLE,
     description=settings.DESCRIPTION,
     version=settings.VERSION,
@@ -39,18 +97,23 @@ app.add_middleware(
 app.include_router(upscaler_router_v1, prefix="/api/latest")
 app.include_router(models_router_v1, prefix="/api/latest")
 app.include_router(history_router_v1, prefix="/api/latest")
+app.include_router(jobs_router_v1, prefix="/api/latest")
+app.include_router(broker_router_v1, prefix="/api/latest")
+app.include_router(admin_router_v1, prefix="/api/latest")
 
 # Include routers for v1 API
 v1.include_router(upscaler_router_v1)
 v1.include_router(models_router_v1)
 v1.include_router(history_router_v1)
+v1.include_router(jobs_router_v1)
+v1.include_router(broker_router_v1)
+v1.include_router(admin_router_v1)
 
 # Mount v1 application under /api/v1 path
 app.mount("/api/v1", v1)
 
 
 # noinspection PyUnusedLocal
-@app.exception_handler(Exception)
 async def exception_error(
         request: Request,
         exc: Exception,
@@ -72,7 +135,6 @@ async def exception_error(
 
 
 # noinspection PyUnusedLocal
-@app.exception_handler(ValidationError)
 async def validation_exception_error(
     request: Request,
     exc: ValidationError,
@@ -91,3 +153,42 @@ async def validation_exception_error(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=jsonable_encoder({"detail": exc.errors()}),
     )
+
+
+# noinspection PyUnusedLocal
+async def upscale_cancelled_error(
+    request: Request,
+    exc: UpscaleCancelled,
+) -> JSONResponse:
+    """
+    Handler for upscaling cancelled by a client disconnect or an expired deadline.
+
+    Parameters:
+        request: The incoming request (unused)
+        exc: The cancellation that occurred
+
+    Returns:
+        JSONResponse: 504 error response if the deadline expired, 499 otherwise
+    """
+    logger.info(f"Request cancelled: {exc.reason}")
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT if exc.reason == "deadline exceeded" else 499,
+        content=jsonable_encoder({"detail": str(exc)}),
+    )
+
+
+def register_handlers(application: FastAPI) -> None:
+    """
+    Register the exception handlers on an application. Mounted sub-applications
+    do not inherit the handlers of the parent, so each one needs its own.
+
+    Parameters:
+        application: The application to register the handlers on
+    """
+    application.add_exception_handler(Exception, exception_error)
+    application.add_exception_handler(ValidationError, validation_exception_error)
+    application.add_exception_handler(UpscaleCancelled, upscale_cancelled_error)
+
+
+register_handlers(app)
+register_handlers(v1)
@@ -0,0 +1,193 @@
+import gc
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import uvicorn
+
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum
+from src.server.logger import logger
+from src.server.upscaler.autotune import autotune
+from src.server.upscaler.executor import resolve_thread_counts, configure_inference_executor, get_inference_config
+from src.server.upscaler.opencv import Upscaler
+
+
+def preload_models(settings: Settings) -> None:
+    """
+    Load and warm up every available model in the current (parent) process.
+
+    Each model is loaded once per inference worker, so requests in the forked workers
+    take already warmed instances from the pool and share their weights copy-on-write.
+    """
+    # The autotuned pool size, if the autotuner has run, otherwise the configured one
+    copies = get_inference_config()[0] or resolve_thread_counts(settings)[0]
+    for model in ModelEnum:
+        try:
+            Upscaler(model=model, settings=settings).warmup(copies=copies)
+        except FileNotFoundError:
+            logger.warning(f"Model {model.name} is not available, skipping preload")
+
+
+def memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """
+    Return RSS, PSS and USS (private) memory of a process in bytes, read from
+    /proc/<pid>/smaps_rollup. Returns None if it is not available (non-Linux, exited process).
+    """
+    try:
+        content = Path(f"/proc/{pid}/smaps_rollup").read_text()
+    except OSError:
+        return None
+
+    values: Dict[str, int] = {}
+    for line in content.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+class PreforkSupervisor:
+    """
+    Pre-fork server: models are loaded and warmed up in the parent process, then the
+    workers are forked and serve the same listening socket. Crashed workers are restarted,
+    and per-worker memory (USS/PSS) is logged periodically to verify weight sharing.
+
+    The inference autotuner runs once in the parent. Process-wide background tasks
+    (result storage janitor, history rotation, broker cleanup) run only in the worker
+    of slot 0, see `app.state.prefork_slot` in the application lifespan.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            port: int,
+            workers: int,
+            settings: Settings = None,
+            memory_report_interval: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.settings = settings or Settings()  # type: ignore[call-arg]
+        self.memory_report_interval = memory_report_interval
+
+        self._children: Dict[int, int] = {}  # pid -> worker slot
+        self._restarts: Dict[int, float] = {}  # slot -> time of the last restart
+        self._socket: Optional[socket.socket] = None
+        self._stopping = False
+
+    def run(self) -> None:
+        if self.settings.INFERENCE_AUTOTUNE:
+            autotune(self.settings)
+        preload_models(self.settings)
+
+        # Import the application before forking so its modules are shared as well
+        from src.server.main import app
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(2048)
+        self._socket.set_inheritable(True)
+        logger.info(f"Prefork server listening on {self.host}:{self.port} with {self.workers} workers")
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        # Move everything allocated so far out of the GC's reach, so collections in the
+        # workers don't touch (and un-share) the parent's pages
+        gc.freeze()
+
+        # Warm-up has started OpenCV's worker threads; fork() would copy their pool state
+        # (locks, thread ids) without the threads. Run OpenCV sequentially in the parent,
+        # each worker restores its thread count after the fork
+        cv2.setNumThreads(0)
+
+        for slot in range(self.workers):
+            self._spawn(slot, app)
+
+        last_report = time.monotonic()
+        while self._children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.5)
+                if time.monotonic() - last_report >= self.memory_report_interval:
+                    self.report_memory()
+                    last_report = time.monotonic()
+                continue
+
+            slot = self._children.pop(pid, None)
+            if slot is None or self._stopping:
+                continue
+
+            logger.error(f"Worker {pid} (slot {slot}) exited with status {status}, restarting")
+            # Back off if the worker keeps crashing right after start
+            if time.monotonic() - self._restarts.get(slot, 0.0) < 1.0:
+                time.sleep(1.0)
+            self._spawn(slot, app)
+
+        self._socket.close()
+        logger.info("Prefork server stopped")
+
+    def _spawn(self, slot: int, app) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                # Threads don't survive fork(): the inherited inference pool has none, so it is
+                # recreated with the same (possibly autotuned) size. This also restores the
+                # OpenCV thread count turned off in the parent
+                workers, threads = get_inference_config()
+                if not workers:
+                    workers, threads = resolve_thread_counts(self.settings)
+                configure_inference_executor(workers, threads)
+                app.state.prefork_slot = slot
+                config = uvicorn.Config(app, log_config=None)
+                uvicorn.Server(config).run(sockets=[self._socket])
+            except BaseException as exc:
+                logger.error(f"Worker slot {slot} failed: {exc}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        self._children[pid] = slot
+        self._restarts[slot] = time.monotonic()
+        logger.info(f"Worker {pid} started (slot {slot})")
+
+    # noinspection PyUnusedLocal
+    def _handle_stop(self, signum, frame) -> None:
+        if self._stopping:
+            return
+        logger.info(f"Received signal {signum}, stopping workers")
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report_memory(self) -> Dict[int, Optional[Dict[str, int]]]:
+        """Log and return memory usage of the parent and every worker."""
+        report = {os.getpid(): memory_usage(os.getpid())}
+        report.update({pid: memory_usage(pid) for pid in self._children})
+
+        for pid, usage in report.items():
+            if usage is not None:
+                role = "parent" if pid == os.getpid() else f"worker slot {self._children[pid]}"
+                logger.info(
+                    f"Memory {role} ({pid}): USS {usage['uss'] / 2 ** 20:.1f} MiB, "
+                    f"PSS {usage['pss'] / 2 ** 20:.1f} MiB, RSS {usage['rss'] / 2 ** 20:.1f} MiB"
+                )
+        return report
@@ -0,0 +1,112 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Any
+
+import cv2
+import numpy as np
+
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum
+from src.server.logger import logger
+from src.server.upscaler.executor import configure_inference_executor
+from src.server.upscaler.opencv import Upscaler
+
+
+def candidate_configs(cpu_count: int, max_workers: int = 16) -> List[Tuple[int, int]]:
+    """
+    Кандидаты (параллельных запросов, потоков OpenCV на запрос) для перебора.
+
+    Число запросов - степени двойки до числа ядер (но не больше max_workers: каждый
+    параллельный запрос держит свою копию модели); потоки - все ядра поровну
+    и половина ядер поровну (на случай, если SMT-ядра только мешают).
+    """
+    configs = []
+    workers = 1
+    while workers <= min(cpu_count, max_workers):
+        for threads in {max(1, cpu_count // workers), max(1, cpu_count // (workers * 2))}:
+            configs.append((workers, threads))
+        workers *= 2
+    return sorted(set(configs))
+
+
+def _measure(
+        upscaler: Upscaler,
+        image: np.ndarray,
+        workers: int,
+        threads: int,
+        requests_per_worker: int,
+) -> Dict[str, Any]:
+    """Прогоняет workers параллельных потоков запросов и измеряет пропускную способность и задержку"""
+    cv2.setNumThreads(threads)
+    latencies: List[float] = []
+
+    # noinspection PyUnusedLocal
+    def run_one(index: int) -> float:
+        cv2.setNumThreads(threads)
+        started_at = time.perf_counter()
+        upscaler.upscale_array(image, tile_size=0, skip_threshold=0)
+        return time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    # Каждый поток берёт свой экземпляр модели из пула, как и при обработке запросов
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies.extend(pool.map(run_one, range(workers * requests_per_worker)))
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "workers": workers,
+        "threads": threads,
+        "throughput": len(latencies) / elapsed,
+        "latency_p50": statistics.median(latencies),
+    }
+
+
+def autotune(settings: Settings = None, model: ModelEnum = ModelEnum.EDSR_x2) -> Tuple[int, int]:
+    """
+    Подбирает размер пула инференса и число потоков OpenCV для текущей машины.
+
+    Для каждого кандидата на синтетическом изображении измеряются пропускная способность
+    и медианная задержка. Выбирается кандидат с наибольшей пропускной способностью среди тех,
+    чья задержка не хуже лучшей более чем в INFERENCE_AUTOTUNE_MAX_LATENCY_FACTOR раз.
+    Найденная конфигурация сразу применяется к пулу инференса, а лишние копии модели,
+    загруженные для замеров, выгружаются.
+
+    :return: (число параллельных запросов, число потоков OpenCV)
+    """
+    settings = settings or Settings()
+    cpu_count = os.cpu_count() or 1
+    size = settings.INFERENCE_AUTOTUNE_IMAGE_SIZE
+    image = np.random.default_rng(0).integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+    configs = candidate_configs(cpu_count)
+    max_workers = max(workers for workers, _ in configs)
+    logger.info(f"Autotuning inference on {cpu_count} CPUs, {len(configs)} candidates, {size}px image")
+
+    # Прогрев: первый прогон включает выделение памяти и инициализацию слоёв
+    upscaler = Upscaler(model=model, settings=settings)
+    upscaler.warmup(copies=max_workers, size=size)
+
+    results = []
+    for workers, threads in configs:
+        result = _measure(upscaler, image, workers, threads, settings.INFERENCE_AUTOTUNE_ROUNDS)
+        logger.info(
+            f"Autotune {workers} workers x {threads} threads: {result['throughput']:.2f} req/s, "
+            f"p50 {result['latency_p50'] * 1000:.0f} ms"
+        )
+        results.append(result)
+
+    best_latency = min(result["latency_p50"] for result in results)
+    acceptable = [
+        result for result in results
+        if result["latency_p50"] <= best_latency * settings.INFERENCE_AUTOTUNE_MAX_LATENCY_FACTOR
+    ]
+    best = max(acceptable, key=lambda result: result["throughput"])
+    logger.info(f"Autotune selected {best['workers']} workers x {best['threads']} threads")
+
+    # Для замеров загружено до max_workers копий модели; больше, чем запросов в пуле, не понадобится
+    upscaler.trim(best["workers"])
+
+    configure_inference_executor(best["workers"], best["threads"])
+    return best["workers"], best["threads"]
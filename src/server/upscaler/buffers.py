@@ -0,0 +1,116 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Iterator, Any
+
+import numpy as np
+
+from src.server.config import Settings
+from src.server.logger import logger
+
+# Классы размеров: 4 шага на каждую степень двойки (потери на округление - не больше 25%)
+_CLASS_STEPS = 4
+_MIN_CLASS_BYTES = 64 * 1024
+
+
+def size_class(nbytes: int) -> int:
+    """Размер класса (в байтах), в который помещается буфер nbytes"""
+    if nbytes <= _MIN_CLASS_BYTES:
+        return _MIN_CLASS_BYTES
+    power = 1 << (int(nbytes - 1).bit_length() - 1)
+    step = power // _CLASS_STEPS
+    return -(-nbytes // step) * step
+
+
+class BufferPool:
+    """
+    Пул переиспользуемых буферов NumPy, разложенных по классам размеров.
+
+    Большие массивы на каждый запрос (холст результата, тайлы, промежуточные изображения)
+    берутся из пула и возвращаются в него, а не выделяются и освобождаются заново: это
+    убирает поток крупных malloc/free, фрагментацию кучи и рост RSS при параллельных запросах.
+    Свободные буферы хранятся, пока их суммарный размер не превышает max_cached_bytes.
+    """
+
+    def __init__(self, max_cached_bytes: int):
+        self.max_cached_bytes = max_cached_bytes
+        self._free: Dict[int, List[np.ndarray]] = {}
+        self._borrowed: Dict[int, np.ndarray] = {}
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "allocated_bytes": 0, "dropped": 0}
+
+    def acquire(self, shape: Tuple[int, ...], dtype: Any = np.uint8) -> np.ndarray:
+        """
+        Берёт из пула массив формы shape (содержимое не инициализировано).
+
+        Возвращённый массив - представление буфера пула; отдать его обратно - release().
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        size = size_class(nbytes)
+
+        with self._lock:
+            free = self._free.get(size)
+            if free:
+                buffer = free.pop()
+                self._cached_bytes -= size
+                self._stats["hits"] += 1
+            else:
+                buffer = None
+                self._stats["misses"] += 1
+                self._stats["allocated_bytes"] += size
+
+        if buffer is None:
+            buffer = np.empty(size, dtype=np.uint8)
+        with self._lock:
+            self._borrowed[id(buffer)] = buffer
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def release(self, array: np.ndarray):
+        """Возвращает в пул буфер массива, полученного через acquire()"""
+        root = array
+        while root.base is not None:
+            root = root.base
+
+        with self._lock:
+            # Чужие массивы и повторный release игнорируются
+            buffer = self._borrowed.pop(id(root), None)
+            if buffer is None:
+                return
+            if self._cached_bytes + buffer.size > self.max_cached_bytes:
+                self._stats["dropped"] += 1
+                return
+            self._free.setdefault(buffer.size, []).append(buffer)
+            self._cached_bytes += buffer.size
+
+    @contextmanager
+    def borrow(self, shape: Tuple[int, ...], dtype: Any = np.uint8) -> Iterator[np.ndarray]:
+        """Массив из пула на время блока with"""
+        array = self.acquire(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.release(array)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "cached_bytes": self._cached_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self._cached_bytes = 0
+
+
+# Пул буферов процесса (общий для всех потоков инференса)
+_pool: Optional[BufferPool] = None
+
+
+def get_buffer_pool(settings: Settings = None) -> BufferPool:
+    """Возвращает пул буферов, создавая его по настройкам при первом обращении"""
+    global _pool
+    if _pool is None:
+        settings = settings or Settings()
+        _pool = BufferPool(settings.BUFFER_POOL_MAX_BYTES)
+        logger.info(f"Buffer pool created, up to {settings.BUFFER_POOL_MAX_BYTES} cached bytes")
+    return _pool
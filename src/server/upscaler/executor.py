@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import cv2
+
+from src.server.config import Settings
+from src.server.logger import logger
+
+# Выделенный пул потоков для загрузки моделей и инференса (общий на процесс)
+_executor: Optional[ThreadPoolExecutor] = None
+_workers = 0
+_threads = 0
+
+
+def resolve_thread_counts(settings: Settings) -> Tuple[int, int]:
+    """
+    Вычисляет размер пула инференса и число внутренних потоков OpenCV на запрос.
+
+    Нулевые значения в настройках означают автоматический выбор: несколько параллельных
+    запросов, между которыми поровну делятся ядра, чтобы не было переподписки.
+
+    :return: (число параллельных запросов, число потоков OpenCV)
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = settings.INFERENCE_WORKERS or max(1, min(4, cpu_count // 2))
+    threads = settings.INFERENCE_THREADS or max(1, cpu_count // workers)
+    return workers, threads
+
+
+def _init_worker(threads: int):
+    cv2.setNumThreads(threads)
+
+
+def configure_inference_executor(workers: int, threads: int) -> ThreadPoolExecutor:
+    """
+    Пересоздаёт пул инференса с заданными размерами.
+
+    cv2.setNumThreads вызывается и глобально, и в каждом потоке пула: в зависимости от
+    параллельного бэкенда OpenCV (pthreads/TBB или OpenMP) настройка действует на процесс
+    или на поток.
+    """
+    global _executor, _workers, _threads
+
+    previous = _executor
+    cv2.setNumThreads(threads)
+    _executor = ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="inference",
+        initializer=_init_worker,
+        initargs=(threads,),
+    )
+    _workers, _threads = workers, threads
+    logger.info(f"Inference executor configured: {workers} workers x {threads} OpenCV threads")
+
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return _executor
+
+
+def get_inference_executor(settings: Settings = None) -> ThreadPoolExecutor:
+    """Возвращает пул инференса, создавая его по настройкам при первом обращении"""
+    if _executor is None:
+        return configure_inference_executor(*resolve_thread_counts(settings or Settings()))
+    return _executor
+
+
+def get_inference_config() -> Tuple[int, int]:
+    """Текущая конфигурация пула: (число параллельных запросов, число потоков OpenCV)"""
+    return _workers, _threads
@@ -1,5 +1,7 @@
 import os
-from typing import Optional, Tuple
+import threading
+from contextlib import contextmanager, ExitStack
+from typing import Optional, Tuple, Callable, Dict, Any, Iterator, Set
 import asyncio
 
 import cv2
@@ -9,6 +11,75 @@ from cv2 import dnn_superres
 from src.server.config import Settings
 from src.server.enums.models import ModelEnum
 from src.server.logger import logger
+from src.server.upscaler.buffers import get_buffer_pool
+from src.server.upscaler.executor import get_inference_executor
+from src.server.upscaler.planning import ResizePlan, plan_output_size, resolve_target_size
+from src.server.upscaler.quantization import QuantizedSuperRes, calibration_path
+from src.server.upscaler.registry import model_registry
+from src.server.upscaler.scheduler import Ticket, get_scheduler, peek_image_size
+from src.server.upscaler.tiles import Tile, split_tiles, is_flat_tile
+from src.server.utils.cancellation import CancelToken
+from src.server.utils.history import RequestHistory
+from src.server.utils.profiling import profiler
+
+# Модели, для которых уже предупреждали о переходе с int8 на fp32
+_int8_fallbacks: Set[str] = set()
+
+
+def model_path(model: ModelEnum, settings: Settings) -> str:
+    """Путь к файлу модели"""
+    return str(settings.MODELS_PATH / model.value.model_name / model.value.model_type)
+
+
+def resolve_precision(model: ModelEnum, settings: Settings) -> str:
+    """
+    Точность инференса модели по настройкам (INFERENCE_PRECISION_OVERRIDES, затем
+    INFERENCE_PRECISION).
+
+    Если настроен int8, но калибровочных данных нет, модель работает в fp32 (с предупреждением),
+    а не падает на каждом запросе.
+    """
+    precision = settings.INFERENCE_PRECISION_OVERRIDES.get(model.name, settings.INFERENCE_PRECISION)
+    if precision == "int8" and not os.path.exists(calibration_path(model_path(model, settings))):
+        if model.name not in _int8_fallbacks:
+            _int8_fallbacks.add(model.name)
+            logger.warning(
+                f"Calibration data for {model.name} not found, running it in fp32 instead of int8; "
+                f"create it with 'python -m src.server.cli quantize'"
+            )
+        return "fp32"
+    return precision
+
+
+def result_params(
+        model: ModelEnum,
+        settings: Settings,
+        output_size: Optional[Tuple[Optional[int], Optional[int]]],
+        output_format: str,
+        precision: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Все параметры, от которых зависит результат (для ключа хранилища результатов).
+
+    Не загружает модель, поэтому подходит и фронтенду брокера, где файлов моделей может не быть.
+
+    :param precision: Фактическая точность модели; по умолчанию - заданная в настройках
+    """
+    if precision is None:
+        precision = settings.INFERENCE_PRECISION_OVERRIDES.get(model.name, settings.INFERENCE_PRECISION)
+    return {
+        "model_name": model.value.model_name,
+        "scale": model.value.scale,
+        "precision": precision,
+        "precision_overrides": settings.INFERENCE_PRECISION_OVERRIDES,
+        "output_size": list(output_size) if output_size else None,
+        "output_format": output_format,
+        "tile_size": settings.TILE_SIZE,
+        "tile_pad": settings.TILE_PAD,
+        "tile_skip_method": settings.TILE_SKIP_METHOD,
+        "tile_skip_threshold": settings.TILE_SKIP_THRESHOLD,
+        "tile_skip_interpolation": settings.TILE_SKIP_INTERPOLATION,
+    }
 
 
 class Upscaler:
@@ -17,27 +88,35 @@ class Upscaler:
     Работает с байтами на входе и выходе.
     """
 
-    def __init__(self, model: ModelEnum, settings: Settings, use_cuda: bool = None):
+    def __init__(self, model: ModelEnum, settings: Settings, use_cuda: bool = None, precision: str = None):
         """
         Инициализация апскейлера.
 
         :param model: Выбранная модель из ModelEnum.
         :param use_cuda: Использовать ли CUDA для ускорения
+        :param precision: Точность инференса ('fp32', 'fp16', 'int8'); по умолчанию из настроек
+            (int8 без калибровочных данных заменяется на fp32, см. resolve_precision)
         """
         logger.info(f"Initializing Upscaler with model: {model.name}")
         logger.debug(f"Model path: {model.value.model_name}/{model.value.model_type}")
         logger.debug(f"Scale factor: {model.value.scale}")
 
         self.settings = settings or Settings()
-        self.model_path = str(self.settings.MODELS_PATH / model.value.model_name / model.value.model_type)
+        self.model = model
+        self.model_path = model_path(model, self.settings)
         self.model_name = model.value.model_name
         self.scale = model.value.scale
         self.use_cuda = use_cuda if use_cuda is not None else self.settings.USE_CUDA
-        self.sr = None
+        self.precision = precision or resolve_precision(model, self.settings)
+        self._model_key = (self.model_path, self.use_cuda, self.precision)
+        # Экземпляр сети, взятый из пула моделей текущим потоком (на время инференса)
+        self._local = threading.local()
         self._initialized = False
+        self._resize_plan: Optional[ResizePlan] = None
+        self._tile_stats: Dict[str, int] = {"tiles": 0, "done_tiles": 0, "skipped_tiles": 0, "reused_tiles": 0}
 
         logger.debug(f"Full model path: {self.model_path}")
-        logger.info(f"CUDA enabled: {self.use_cuda}")
+        logger.info(f"CUDA enabled: {self.use_cuda}, precision: {self.precision}")
 
         if not os.path.exists(self.model_path):
             error_msg = f"Model file not found: {self.model_path}"
@@ -48,51 +127,138 @@ class Upscaler:
         """Асинхронная инициализация модели super resolution"""
         logger.info("Starting model initialization...")
         try:
-            await asyncio.get_event_loop().run_in_executor(None, self._initialize_model_sync)
+            await asyncio.get_event_loop().run_in_executor(
+                get_inference_executor(self.settings),
+                self._initialize_model_sync,
+            )
             self._initialized = True
             logger.info("Model successfully initialized")
         except Exception as e:
             logger.error(f"Model initialization failed: {str(e)}")
             raise
 
+    def initialize_sync(self):
+        """
+        Синхронная инициализация модели в текущем потоке/процессе.
+
+        Используется там, где нет event loop (CLI, воркеры пула процессов).
+        """
+        if self._initialized:
+            return
+        logger.info("Starting model initialization (sync)...")
+        self._initialize_model_sync()
+        self._initialized = True
+        logger.info("Model successfully initialized")
+
     def _initialize_model_sync(self):
         """Синхронная инициализация модели (выполняется в executor)"""
+        model_registry.preload(self._model_key, self._create_model)
+
+    def _create_model(self):
+        """Загружает новый экземпляр сети super resolution"""
+        if self.precision == "int8":
+            if self.use_cuda:
+                logger.warning("int8 inference runs on CPU only, ignoring CUDA")
+            return QuantizedSuperRes(self.model_path, calibration_path(self.model_path))
+
         logger.debug("Creating DnnSuperResImpl instance")
-        self.sr = dnn_superres.DnnSuperResImpl_create()  # type: ignore[name-defined]
+        sr = dnn_superres.DnnSuperResImpl_create()  # type: ignore[name-defined]
 
         logger.debug(f"Reading model from {self.model_path}")
-        self.sr.readModel(self.model_path)
+        sr.readModel(self.model_path)
 
-        if self.use_cuda:
+        use_cuda = self.use_cuda
+        if use_cuda:
             try:
                 logger.debug("Setting CUDA backend and target")
-                self.sr.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
-                self.sr.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+                sr.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                sr.setPreferableTarget(self._target("DNN_TARGET_CUDA"))
                 logger.info("CUDA backend successfully configured")
             except Exception as exc:
                 logger.warning(f"CUDA not available: {exc}, falling back to CPU")
-                self.use_cuda = False
+                use_cuda = False
 
-        if not self.use_cuda:
+        if not use_cuda:
             logger.debug("Setting OpenCV backend and CPU target")
-            self.sr.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-            self.sr.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            sr.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            sr.setPreferableTarget(self._target("DNN_TARGET_CPU"))
 
         logger.debug(f"Setting model: {self.model_name.lower()} with scale {self.scale}")
-        self.sr.setModel(self.model_name.lower(), self.scale)
+        sr.setModel(self.model_name.lower(), self.scale)
+        return sr
+
+    def _target(self, target: str) -> int:
+        """Цель cv2.dnn с учётом точности: для fp16 - вариант *_FP16, если он есть в этой сборке OpenCV"""
+        if self.precision == "fp16":
+            fp16_target = getattr(cv2.dnn, f"{target}_FP16", None)
+            if fp16_target is not None:
+                return fp16_target
+            logger.warning(f"{target}_FP16 is not supported by this OpenCV build, using fp32")
+        return getattr(cv2.dnn, target)
+
+    def warmup(self, copies: int = 1, size: int = 32):
+        """
+        Загружает copies экземпляров модели в пул и прогоняет через каждый маленькое изображение,
+        чтобы отложенная инициализация слоёв произошла заранее (например, до fork()).
+        """
+        image = np.zeros((size, size, 3), dtype=np.uint8)
+        # Экземпляры берутся из пула на время прогрева, чтобы параллельный запрос
+        # не получил тот же экземпляр сети
+        models = [model_registry.acquire(self._model_key, self._create_model) for _ in range(copies)]
+        try:
+            for sr in models:
+                sr.upsample(image)
+        finally:
+            for sr in models:
+                model_registry.release(self._model_key, sr)
+        self._initialized = True
+        logger.info(f"Model {self.model_path} warmed up ({copies} copies)")
+
+    def trim(self, copies: int):
+        """Оставляет в пуле не больше copies экземпляров модели (лишние свободные выгружаются)"""
+        unloaded = model_registry.trim(self._model_key, copies)
+        if unloaded:
+            logger.info(f"Model {self.model_path}: unloaded {unloaded} extra copies, keeping {copies}")
+
+    @property
+    def sr(self):
+        """Экземпляр сети, которым текущий поток владеет во время инференса (иначе None)"""
+        return getattr(self._local, "sr", None)
+
+    @contextmanager
+    def _checkout(self) -> Iterator[Any]:
+        """Берёт экземпляр сети из пула на время инференса (повторный вход использует тот же)"""
+        if self.sr is not None:
+            yield self.sr
+            return
+
+        self._local.sr = model_registry.acquire(self._model_key, self._create_model)
+        try:
+            yield self._local.sr
+        finally:
+            model_registry.release(self._model_key, self._local.sr)
+            self._local.sr = None
 
     async def upscale(
             self,
             image_bytes: bytes,
-            output_size: Optional[Tuple[int, int]] = None,
+            output_size: Optional[Tuple[Optional[int], Optional[int]]] = None,
             output_format: str = 'png',
+            cancel_token: Optional[CancelToken] = None,
+            tenant: str = "default",
+            priority: str = "interactive",
     ) -> bytes:
         """
         Асинхронное увеличение разрешения изображения из байтов.
 
         :param image_bytes: Байты изображения
-        :param output_size: Опционально: желаемый размер (ширина, высота)
+        :param output_size: Опционально: желаемый размер (ширина, высота); одна из сторон
+            может быть None - тогда она вычисляется с сохранением пропорций
         :param output_format: Формат выходного изображения ('jpg', 'png')
+        :param cancel_token: Опционально: токен отмены; проверяется на границах тайлов
+            и в очереди планировщика, при отмене бросается UpscaleCancelled
+        :param tenant: Клиент для справедливого планирования (ключ API или IP)
+        :param priority: Класс приоритета: 'interactive', 'batch' или 'background'
         :return: Байты увеличенного изображения
         """
         logger.info("Starting upscaling process")
@@ -105,29 +271,189 @@ class Upscaler:
             logger.info("Model not initialized, initializing now...")
             await self.initialize()
 
+        ticket: Optional[Ticket] = None
         try:
-            # Запускаем CPU-bound операции в executor
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
-                self._upscale_sync,
-                image_bytes,
-                output_size,
-                output_format
-            )
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            # Слот выдаёт планировщик, затем CPU-bound операции выполняются в выделенном пуле инференса
+            cost = self.estimate_cost(image_bytes, output_size)
+            async with get_scheduler(self.settings).slot(tenant, priority, cost, cancel_token) as ticket:
+                ticket.work = asyncio.get_event_loop().run_in_executor(
+                    get_inference_executor(self.settings),
+                    self._upscale_sync,
+                    image_bytes,
+                    output_size,
+                    output_format,
+                    cancel_token,
+                )
+                # shield: отмена запроса не должна отменять future работы - по нему освобождается слот
+                result = await asyncio.shield(ticket.work)
             logger.info("Upscaling completed successfully")
             logger.debug(f"Output size: {len(result)} bytes")
             return result
         except Exception as e:
             logger.error(f"Upscaling failed: {str(e)}")
             raise
+        finally:
+            RequestHistory.annotate(tiles=self.tile_stats)
+            if self._resize_plan is not None:
+                RequestHistory.annotate(resize_plan=self._resize_plan.to_dict())
+            if ticket is not None:
+                RequestHistory.annotate(scheduler=ticket.to_dict())
+
+    def estimate_cost(
+            self,
+            image_bytes: bytes,
+            output_size: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    ) -> float:
+        """
+        Оценка стоимости увеличения для планировщика: мегапиксели результата.
+
+        Размер входа читается из заголовка (PNG, JPEG, BMP); для прочих форматов
+        грубо принимается один пиксель на байт файла.
+        """
+        size = peek_image_size(image_bytes)
+        if size is None or not all(size):
+            return len(image_bytes) * self.scale ** 2 / 1e6
+        width, height = size
+        if output_size:
+            width, height = resolve_target_size((width, height), *output_size)
+            return width * height / 1e6
+        return width * height * self.scale ** 2 / 1e6
+
+    def upscale_sync(
+            self,
+            image_bytes: bytes,
+            output_size: Optional[Tuple[Optional[int], Optional[int]]] = None,
+            output_format: str = 'png',
+            cancel_token: Optional[CancelToken] = None,
+    ) -> bytes:
+        """
+        Синхронное увеличение разрешения изображения из байтов (без event loop).
+
+        :param image_bytes: Байты изображения
+        :param output_size: Опционально: желаемый размер (ширина, высота); одна из сторон
+            может быть None - тогда она вычисляется с сохранением пропорций
+        :param output_format: Формат выходного изображения ('jpg', 'png')
+        :param cancel_token: Опционально: токен отмены, проверяемый на границах тайлов
+        :return: Байты увеличенного изображения
+        """
+        self.initialize_sync()
+        return self._upscale_sync(image_bytes, output_size, output_format, cancel_token)
 
+    @profiler.profiled("upscale")
     def _upscale_sync(
             self,
             image_bytes: bytes,
-            output_size: Optional[Tuple[int, int]],
-            output_format: str
+            output_size: Optional[Tuple[Optional[int], Optional[int]]],
+            output_format: str,
+            cancel_token: Optional[CancelToken] = None,
     ) -> bytes:
         """Синхронная реализация upscale для выполнения в executor"""
+        image = self.decode_image(image_bytes)
+        height, width = image.shape[:2]
+        if output_size:
+            target_width, target_height = resolve_target_size((width, height), *output_size)
+        else:
+            target_width, target_height = width * self.scale, height * self.scale
+
+        # Холст результата берётся из пула буферов и возвращается в него после кодирования
+        with get_buffer_pool(self.settings).borrow((target_height, target_width, image.shape[2])) as canvas:
+            # Увеличение разрешения
+            logger.info("Performing upscaling...")
+            if output_size:
+                logger.debug(f"Using custom output size: {output_size}")
+                result = self.upscale_to_size(image, output_size, cancel_token=cancel_token, out=canvas)
+            else:
+                logger.debug("Using default upscaling")
+                result = self.upscale_array(image, cancel_token=cancel_token, out=canvas)
+
+            logger.debug(f"Upscaled image dimensions: {result.shape[1]}x{result.shape[0]}")
+
+            return self.encode_image(result, output_format)
+
+    def result_params(
+            self,
+            output_size: Optional[Tuple[Optional[int], Optional[int]]],
+            output_format: str,
+    ) -> Dict[str, Any]:
+        """Все параметры, от которых зависит результат (для ключа хранилища результатов)"""
+        return result_params(self.model, self.settings, output_size, output_format, self.precision)
+
+    def upscale_to_size(
+            self,
+            image: np.ndarray,
+            output_size: Tuple[Optional[int], Optional[int]],
+            cancel_token: Optional[CancelToken] = None,
+            out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Увеличение до заданного размера самым дешёвым способом.
+
+        Вместо полного прогона выбранной модели с последующим ресайзом берётся модель
+        с наименьшим достаточным масштабом, вход заранее уменьшается до размера, который
+        после сети даёт целевой, а остаток добирается интерполяцией. Если увеличение
+        не требуется, сеть не используется вовсе.
+
+        :param image: Изображение в виде массива HxWxC (uint8)
+        :param output_size: Желаемый размер (ширина, высота); одна из сторон может быть None
+        :param cancel_token: Опционально: токен отмены
+        :param out: Опционально: массив размера output_size, в который записывается результат
+        :return: Изображение размера output_size
+        """
+        height, width = image.shape[:2]
+        target = resolve_target_size((width, height), *output_size)
+        plan = plan_output_size((width, height), target, self._available_models())
+        self._resize_plan = plan
+        logger.info(f"Resize plan for {width}x{height} -> {target[0]}x{target[1]}: {plan.to_dict()}")
+
+        if plan.model is None:
+            self._tile_stats = {"tiles": 0, "done_tiles": 0, "skipped_tiles": 0, "reused_tiles": 0}
+            shrinking = target[0] <= width and target[1] <= height
+            return cv2.resize(
+                image, target, dst=out, interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_CUBIC,
+            )
+
+        if plan.model.value.scale == self.scale:
+            upscaler = self
+        else:
+            upscaler = Upscaler(model=plan.model, settings=self.settings, use_cuda=self.use_cuda)
+
+        pool = get_buffer_pool(self.settings)
+        with ExitStack() as stack:
+            source = image
+            if plan.pre_size:
+                pre_width, pre_height = plan.pre_size
+                source = stack.enter_context(pool.borrow((pre_height, pre_width, image.shape[2])))
+                cv2.resize(image, plan.pre_size, dst=source, interpolation=cv2.INTER_AREA)
+
+            upscaled_width, upscaled_height = source.shape[1] * upscaler.scale, source.shape[0] * upscaler.scale
+            if (upscaled_width, upscaled_height) == target:
+                upscaled = upscaler.upscale_array(source, cancel_token=cancel_token, out=out)
+                self._tile_stats = upscaler._tile_stats
+                return upscaled
+
+            intermediate = stack.enter_context(pool.borrow((upscaled_height, upscaled_width, image.shape[2])))
+            upscaled = upscaler.upscale_array(source, cancel_token=cancel_token, out=intermediate)
+            self._tile_stats = upscaler._tile_stats
+
+            shrinking = target[0] <= upscaled_width and target[1] <= upscaled_height
+            return cv2.resize(
+                upscaled, target, dst=out, interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_CUBIC,
+            )
+
+    def _available_models(self):
+        """Модели того же семейства, файлы которых есть на диске"""
+        return [
+            model for model in ModelEnum
+            if model.value.model_name == self.model_name
+            and (self.settings.MODELS_PATH / model.value.model_name / model.value.model_type).exists()
+        ]
+
+    @staticmethod
+    def decode_image(image_bytes: bytes) -> np.ndarray:
+        """Декодирует изображение из байтов в массив BGR"""
         logger.debug("Decoding image from bytes")
         np_arr = np.frombuffer(image_bytes, np.uint8)
         image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
@@ -138,22 +464,14 @@ class Upscaler:
             raise ValueError(error_msg)
 
         logger.debug(f"Original image dimensions: {image.shape[1]}x{image.shape[0]}")
+        return image
 
-        # Увеличение разрешения
-        logger.info("Performing upscaling...")
-        if output_size:
-            logger.debug(f"Using custom output size: {output_size}")
-            result = self.sr.upsample(image, output_size)
-        else:
-            logger.debug("Using default upscaling")
-            result = self.sr.upsample(image)
-
-        logger.debug(f"Upscaled image dimensions: {result.shape[1]}x{result.shape[0]}")
-
-        # Кодирование результата в байты
+    @staticmethod
+    def encode_image(image: np.ndarray, output_format: str, quality: int = 95) -> bytes:
+        """Кодирует массив изображения в байты формата output_format ('jpg', 'png')"""
         logger.debug(f"Encoding image to {output_format} format")
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 95] if output_format == 'jpg' else []
-        success, encoded_image = cv2.imencode(f'.{output_format}', result, encode_param)
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality] if output_format == 'jpg' else []
+        success, encoded_image = cv2.imencode(f'.{output_format}', image, encode_param)
 
         if not success:
             error_msg = f"Failed to encode image to {output_format} format"
@@ -161,3 +479,174 @@ class Upscaler:
             raise RuntimeError(error_msg)
 
         return encoded_image.tobytes()
+
+    def interpolate(self, image: np.ndarray) -> np.ndarray:
+        """
+        Быстрое увеличение интерполяцией (без сети) до того же масштаба, что и у модели.
+        Используется для мгновенного превью.
+        """
+        height, width = image.shape[:2]
+        return cv2.resize(image, (width * self.scale, height * self.scale), interpolation=cv2.INTER_CUBIC)
+
+    def upscale_array(
+            self,
+            image: np.ndarray,
+            tile_size: Optional[int] = None,
+            reuse_tile: Optional[Callable[[Tile], Optional[np.ndarray]]] = None,
+            skip_threshold: Optional[float] = None,
+            on_tile: Optional[Callable[[Tile, np.ndarray, int, int], None]] = None,
+            cancel_token: Optional[CancelToken] = None,
+            out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Увеличение разрешения уже декодированного изображения (BGR).
+
+        При tile_size > 0 изображение обрабатывается по тайлам с перекрытием TILE_PAD пикселей,
+        что ограничивает пиковое потребление памяти сетью. Однородные тайлы (дисперсия или
+        плотность границ ниже порога) увеличиваются интерполяцией без прогона через сеть.
+
+        :param image: Изображение в виде массива HxWxC (uint8)
+        :param tile_size: Размер тайла в пикселях; None - из настроек, 0 - без разбиения
+            (с токеном отмены или если на сетке TILE_GRID_SIZE нашлись однородные тайлы,
+            изображение всё же разбивается на тайлы TILE_GRID_SIZE)
+        :param reuse_tile: Опционально: функция, возвращающая уже готовый увеличенный тайл
+            (например, из предыдущего кадра видео) или None, если тайл нужно обработать сетью
+        :param skip_threshold: Порог пропуска однородных тайлов; None - из настроек, 0 - не пропускать
+        :param on_tile: Опционально: callback(тайл, увеличенный тайл, обработано, всего),
+            вызывается после каждого тайла (для постепенного уточнения превью)
+        :param cancel_token: Опционально: токен отмены, проверяемый перед каждым тайлом
+        :param out: Опционально: массив (H*scale)x(W*scale)xC, в который записывается результат
+            (например, из пула буферов); по умолчанию выделяется новый
+        :return: Увеличенное изображение
+        """
+        self.initialize_sync()
+        with self._checkout():
+            return self._upscale_array(image, tile_size, reuse_tile, skip_threshold, on_tile, cancel_token, out)
+
+    def _upscale_array(
+            self,
+            image: np.ndarray,
+            tile_size: Optional[int],
+            reuse_tile: Optional[Callable[[Tile], Optional[np.ndarray]]],
+            skip_threshold: Optional[float],
+            on_tile: Optional[Callable[[Tile, np.ndarray, int, int], None]],
+            cancel_token: Optional[CancelToken],
+            out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Реализация upscale_array; вызывается с экземпляром сети, взятым из пула"""
+        height, width = image.shape[:2]
+        tile_size = self.settings.TILE_SIZE if tile_size is None else tile_size
+        skip_threshold = self.settings.TILE_SKIP_THRESHOLD if skip_threshold is None else skip_threshold
+        if tile_size <= 0 and (
+                cancel_token is not None or skip_threshold > 0 and self._has_flat_tiles(image, skip_threshold)
+        ):
+            # Отмена проверяется только между тайлами: целиком изображение прервать нельзя
+            tile_size = self.settings.TILE_GRID_SIZE
+        tiles = split_tiles(width, height, tile_size)
+        self._tile_stats = {"tiles": len(tiles), "done_tiles": 0, "skipped_tiles": 0, "reused_tiles": 0}
+
+        if len(tiles) == 1 and reuse_tile is None and on_tile is None:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            # Сеть пишет результат прямо в out, если он подходящего размера
+            result = self.sr.upsample(image, out) if out is not None else self.sr.upsample(image)
+            self._tile_stats["done_tiles"] = 1
+            return result
+
+        logger.debug(f"Upscaling in {len(tiles)} tiles of up to {tile_size}px")
+        if out is not None:
+            result = out
+        else:
+            result = np.empty((height * self.scale, width * self.scale, image.shape[2]), dtype=np.uint8)
+        for index, tile in enumerate(tiles, 1):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            x0, y0, x1, y1 = tile.scaled(self.scale)
+            upscaled = result[y0:y1, x0:x1]
+            reused = reuse_tile(tile) if reuse_tile is not None else None
+            if reused is not None:
+                upscaled[:] = reused
+                self._tile_stats["reused_tiles"] += 1
+            elif skip_threshold > 0 and self._is_flat_tile(image, tile, skip_threshold):
+                self._interpolate_tile(image, tile, upscaled)
+                self._tile_stats["skipped_tiles"] += 1
+            else:
+                self._upscale_tile(image, tile, upscaled)
+
+            self._tile_stats["done_tiles"] = index
+            if on_tile is not None:
+                on_tile(tile, upscaled, index, len(tiles))
+
+        logger.debug(
+            f"Tiles: {self._tile_stats['tiles']} total, {self._tile_stats['skipped_tiles']} interpolated, "
+            f"{self._tile_stats['reused_tiles']} reused"
+        )
+        return result
+
+    @property
+    def tile_stats(self) -> Dict[str, Any]:
+        """
+        Статистика последнего вызова upscale_array: количество тайлов (всего и обработанных
+        до отмены), доля тайлов, увеличенных интерполяцией вместо сети, и количество
+        переиспользованных тайлов.
+        """
+        stats = dict(self._tile_stats)
+        stats["skipped_ratio"] = stats["skipped_tiles"] / stats["tiles"] if stats["tiles"] else 0.0
+        return stats
+
+    @property
+    def resize_plan(self) -> Optional[ResizePlan]:
+        """План последнего вызова upscale_to_size (None, если размер не задавался)"""
+        return self._resize_plan
+
+    def _has_flat_tiles(self, image: np.ndarray, threshold: float) -> bool:
+        """
+        Проверяет, есть ли однородные тайлы на сетке TILE_GRID_SIZE: только тогда изображение
+        без заданного TILE_SIZE имеет смысл разбивать, иначе оно целиком идёт через сеть.
+        """
+        height, width = image.shape[:2]
+        grid = split_tiles(width, height, self.settings.TILE_GRID_SIZE)
+        return len(grid) > 1 and any(self._is_flat_tile(image, tile, threshold) for tile in grid)
+
+    def _is_flat_tile(self, image: np.ndarray, tile: Tile, threshold: float) -> bool:
+        """Проверяет, является ли тайл однородным (фон, заливка), чтобы не тратить на него сеть"""
+        return is_flat_tile(image, tile, threshold, self.settings.TILE_SKIP_METHOD)
+
+    def _interpolate_tile(self, image: np.ndarray, tile: Tile, out: np.ndarray) -> np.ndarray:
+        """
+        Увеличивает тайл интерполяцией (bicubic или Lanczos) с тем же перекрытием, что и сеть,
+        и записывает его без перекрытия в out
+        """
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = tile.padded(self.settings.TILE_PAD, width, height)
+        interpolation = cv2.INTER_LANCZOS4 if self.settings.TILE_SKIP_INTERPOLATION == "lanczos" else cv2.INTER_CUBIC
+
+        shape = ((y1 - y0) * self.scale, (x1 - x0) * self.scale, image.shape[2])
+        with get_buffer_pool(self.settings).borrow(shape) as upscaled:
+            cv2.resize(image[y0:y1, x0:x1], (shape[1], shape[0]), dst=upscaled, interpolation=interpolation)
+            self._crop_padding(upscaled, tile, x0, y0, out)
+        return out
+
+    def _upscale_tile(self, image: np.ndarray, tile: Tile, out: np.ndarray) -> np.ndarray:
+        """Увеличивает один тайл вместе с перекрытием и записывает его без перекрытия в out"""
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = tile.padded(self.settings.TILE_PAD, width, height)
+
+        # Вход тайла и выход сети - во временных буферах пула, переиспользуемых между тайлами
+        pool = get_buffer_pool(self.settings)
+        with pool.borrow((y1 - y0, x1 - x0, image.shape[2])) as source, \
+                pool.borrow(((y1 - y0) * self.scale, (x1 - x0) * self.scale, image.shape[2])) as upscaled:
+            np.copyto(source, image[y0:y1, x0:x1])
+            upscaled = self.sr.upsample(source, upscaled)
+            self._crop_padding(upscaled, tile, x0, y0, out)
+        return out
+
+    def _crop_padding(self, upscaled: np.ndarray, tile: Tile, x0: int, y0: int, out: np.ndarray):
+        """Копирует в out увеличенный тайл без перекрытия"""
+        offset_x = (tile.x - x0) * self.scale
+        offset_y = (tile.y - y0) * self.scale
+        out[:] = upscaled[
+            offset_y:offset_y + tile.height * self.scale,
+            offset_x:offset_x + tile.width * self.scale,
+        ]
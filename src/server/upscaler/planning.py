@@ -0,0 +1,83 @@
+import math
+from typing import NamedTuple, Optional, Tuple, Iterable, Dict, Any
+
+from src.server.enums.models import ModelEnum
+
+
+class ResizePlan(NamedTuple):
+    """
+    Самый дешёвый способ получить изображение заданного размера.
+
+    model - модель для увеличения (None - достаточно интерполяции),
+    pre_size - размер, до которого вход уменьшается перед сетью (None - без уменьшения),
+    output_size - итоговый размер (ширина, высота).
+    """
+    model: Optional[ModelEnum]
+    pre_size: Optional[Tuple[int, int]]
+    output_size: Tuple[int, int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model.name if self.model is not None else None,
+            "pre_size": list(self.pre_size) if self.pre_size is not None else None,
+            "output_size": list(self.output_size),
+        }
+
+
+def resolve_target_size(
+        input_size: Tuple[int, int],
+        width: Optional[int],
+        height: Optional[int],
+) -> Tuple[int, int]:
+    """Дополняет недостающую сторону целевого размера с сохранением пропорций входа"""
+    input_width, input_height = input_size
+    if width and height:
+        return width, height
+    if width:
+        return width, max(1, round(input_height * width / input_width))
+    if height:
+        return max(1, round(input_width * height / input_height)), height
+    raise ValueError("Either width or height must be specified")
+
+
+def plan_output_size(
+        input_size: Tuple[int, int],
+        target_size: Tuple[int, int],
+        models: Iterable[ModelEnum],
+) -> ResizePlan:
+    """
+    Выбирает самый дешёвый способ получить target_size из изображения input_size.
+
+    - Если увеличение не требуется, сеть не используется вовсе.
+    - Иначе берётся модель с наименьшим масштабом, которого достаточно (или наибольшим
+      из доступных, если не хватает ни одного), а вход заранее уменьшается так, чтобы
+      сеть не считала пиксели, которые всё равно будут отброшены при финальном ресайзе.
+
+    :param input_size: Размер входа (ширина, высота)
+    :param target_size: Требуемый размер (ширина, высота)
+    :param models: Доступные модели
+    """
+    input_width, input_height = input_size
+    target_width, target_height = target_size
+    required_scale = max(target_width / input_width, target_height / input_height)
+
+    if required_scale <= 1:
+        return ResizePlan(model=None, pre_size=None, output_size=target_size)
+
+    candidates = sorted(models, key=lambda model: model.value.scale)
+    if not candidates:
+        return ResizePlan(model=None, pre_size=None, output_size=target_size)
+
+    model = next((model for model in candidates if model.value.scale >= required_scale), candidates[-1])
+    scale = model.value.scale
+
+    pre_size = None
+    if required_scale < scale:
+        pre_size = (
+            min(input_width, math.ceil(target_width / scale)),
+            min(input_height, math.ceil(target_height / scale)),
+        )
+        if pre_size == input_size:
+            pre_size = None
+
+    return ResizePlan(model=model, pre_size=pre_size, output_size=target_size)
@@ -0,0 +1,111 @@
+import os
+from typing import Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from src.server.logger import logger
+
+# Калибровочные данные лежат рядом с моделью: EDSR_x2.pb -> EDSR_x2.int8.npz
+CALIBRATION_SUFFIX = ".int8.npz"
+
+# Средний цвет DIV2K (BGR), который DnnSuperResImpl вычитает из входа EDSR и прибавляет к выходу
+EDSR_MEAN = (103.1545782, 111.5626247, 114.35629928)
+
+
+def calibration_path(model_path: str) -> str:
+    """Путь к калибровочным данным int8-варианта модели"""
+    return os.path.splitext(model_path)[0] + CALIBRATION_SUFFIX
+
+
+def calibration_patches(
+        images: Iterable[np.ndarray],
+        patch_size: int = 64,
+        patches_per_image: int = 4,
+        seed: int = 0,
+) -> np.ndarray:
+    """
+    Вырезает из изображений случайные (но воспроизводимые) патчи для калибровки квантования.
+
+    :return: Массив патчей NxHxWx3 (uint8)
+    """
+    rng = np.random.default_rng(seed)
+    patches: List[np.ndarray] = []
+    for image in images:
+        height, width = image.shape[:2]
+        if height < patch_size or width < patch_size:
+            image = cv2.resize(image, (max(width, patch_size), max(height, patch_size)), interpolation=cv2.INTER_CUBIC)
+            height, width = image.shape[:2]
+        for _ in range(patches_per_image):
+            y = int(rng.integers(0, height - patch_size + 1))
+            x = int(rng.integers(0, width - patch_size + 1))
+            patches.append(image[y:y + patch_size, x:x + patch_size])
+
+    if not patches:
+        raise ValueError("No calibration images")
+    return np.stack(patches)
+
+
+def save_calibration(path: str, patches: np.ndarray):
+    """Сохраняет калибровочные патчи (атомарно)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, patches=patches)
+    os.replace(tmp_path, path)
+
+
+class QuantizedSuperRes:
+    """
+    EDSR, квантованная в int8 средствами cv2.dnn (Net.quantize) по сохранённым калибровочным патчам.
+
+    OpenCV не умеет сохранять квантованную сеть, поэтому офлайн готовятся только калибровочные
+    данные (python -m src.server.cli quantize), а квантование детерминированно повторяется
+    при загрузке. Повторяет интерфейс DnnSuperResImpl (upsample) и его обработку EDSR:
+    из входа BGR float32 вычитается EDSR_MEAN, к выходу он прибавляется, и результат
+    приводится к uint8 с насыщением. Калибровочные патчи проходят ту же нормализацию.
+    """
+
+    def __init__(self, model_path: str, calibration_file: str):
+        if not os.path.exists(calibration_file):
+            error_msg = (
+                f"Calibration data not found: {calibration_file}; "
+                f"create it with 'python -m src.server.cli quantize'"
+            )
+            logger.error(error_msg)
+            raise FileNotFoundError(error_msg)
+
+        net = self.load_net(model_path)
+        patches = np.load(calibration_file)["patches"]
+        blob = cv2.dnn.blobFromImages([patch.astype(np.float32) for patch in patches], mean=EDSR_MEAN)
+
+        logger.debug(f"Quantizing {model_path} with {len(patches)} calibration patches")
+        self.net = net.quantize([blob], cv2.CV_32F, cv2.CV_32F)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    @staticmethod
+    def load_net(model_path: str):
+        """Загружает сеть FP32 из .pb для прогона без DnnSuperResImpl"""
+        net = cv2.dnn.readNetFromTensorflow(model_path)
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return net
+
+    @staticmethod
+    def run(net, image: np.ndarray, result: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Прогоняет изображение BGR (uint8) через сеть так же, как DnnSuperResImpl для EDSR.
+
+        :param result: Опционально: массив uint8 нужного размера для записи результата
+        """
+        net.setInput(cv2.dnn.blobFromImage(image.astype(np.float32), mean=EDSR_MEAN))
+        output = net.forward()[0].transpose(1, 2, 0)
+        output += np.array(EDSR_MEAN, dtype=np.float32)
+        np.rint(output, out=output)
+        np.clip(output, 0, 255, out=output)
+        if result is None or result.shape != output.shape:
+            return output.astype(np.uint8)
+        np.copyto(result, output, casting="unsafe")
+        return result
+
+    def upsample(self, image: np.ndarray, result: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.run(self.net, image, result)
@@ -0,0 +1,87 @@
+import threading
+from typing import Dict, List, Hashable, Callable, Any
+
+from src.server.logger import logger
+
+
+class ModelRegistry:
+    """
+    Пул загруженных моделей процесса.
+
+    Экземпляр сети не потокобезопасен, поэтому каждый параллельный инференс берёт свой
+    экземпляр из пула и возвращает его после работы. Модели загружаются один раз и
+    переиспользуются между запросами; если загрузить их до fork(), веса разделяются
+    дочерними процессами по copy-on-write.
+    """
+
+    def __init__(self):
+        self._idle: Dict[Hashable, List[Any]] = {}
+        self._loaded: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Берёт свободный экземпляр модели из пула или загружает новый через factory()"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if idle:
+                return idle.pop()
+
+        logger.debug(f"No idle model for {key}, loading a new instance")
+        model = factory()
+        with self._lock:
+            self._loaded[key] = self._loaded.get(key, 0) + 1
+        return model
+
+    def release(self, key: Hashable, model: Any):
+        """Возвращает экземпляр модели в пул"""
+        with self._lock:
+            self._idle.setdefault(key, []).append(model)
+
+    def preload(self, key: Hashable, factory: Callable[[], Any], copies: int = 1) -> List[Any]:
+        """
+        Загружает модели так, чтобы в пуле было не меньше copies экземпляров.
+
+        :return: Свободные экземпляры модели
+        """
+        with self._lock:
+            # Недостающие экземпляры сразу учитываются в счётчике, чтобы параллельные preload()
+            # не загрузили их повторно; сама загрузка идёт без блокировки
+            missing = max(copies - self._loaded.get(key, 0), 0)
+            self._loaded[key] = self._loaded.get(key, 0) + missing
+
+        models = []
+        try:
+            for _ in range(missing):
+                models.append(factory())
+        finally:
+            with self._lock:
+                self._loaded[key] -= missing - len(models)
+                idle = self._idle.setdefault(key, [])
+                idle.extend(models)
+                result = list(idle)
+        return result
+
+    def trim(self, key: Hashable, copies: int) -> int:
+        """
+        Выгружает свободные экземпляры модели сверх copies (например, лишние копии после
+        автотюнинга). Взятые из пула экземпляры не трогаются.
+
+        :return: Количество выгруженных экземпляров
+        """
+        with self._lock:
+            idle = self._idle.get(key, [])
+            excess = min(self._loaded.get(key, 0) - copies, len(idle))
+            if excess <= 0:
+                return 0
+            del idle[:excess]
+            self._loaded[key] -= excess
+        logger.debug(f"Unloaded {excess} idle instances of {key}")
+        return excess
+
+    def loaded(self, key: Hashable) -> int:
+        """Количество загруженных экземпляров модели"""
+        with self._lock:
+            return self._loaded.get(key, 0)
+
+
+model_registry = ModelRegistry()
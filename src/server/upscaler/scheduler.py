@@ -0,0 +1,314 @@
+import asyncio
+import concurrent.futures
+import struct
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional, Dict, List, Tuple, AsyncIterator, Any, Iterator
+
+from src.server.config import Settings
+from src.server.logger import logger
+from src.server.upscaler.executor import get_inference_config
+from src.server.utils.cancellation import CancelToken
+
+# Классы приоритета от высшего к низшему: задача низшего класса запускается, только если
+# в высших нет задач, которые можно запустить
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+
+# Период проверки токена отмены, пока задача ждёт в очереди
+_CANCEL_POLL_SECONDS = 0.25
+
+
+def peek_image_size(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Размер изображения (ширина, высота) по заголовку PNG, JPEG или BMP без декодирования.
+
+    :return: Размер или None, если формат не распознан
+    """
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n" and len(image_bytes) >= 24:
+        return struct.unpack(">II", image_bytes[16:24])
+    if image_bytes[:2] == b"BM" and len(image_bytes) >= 26:
+        width, height = struct.unpack("<ii", image_bytes[18:26])
+        return abs(width), abs(height)
+    if image_bytes[:2] == b"\xff\xd8":
+        # Ищем маркер SOFn, пропуская остальные сегменты
+        offset = 2
+        while offset + 9 <= len(image_bytes):
+            if image_bytes[offset] != 0xFF:
+                return None
+            marker = image_bytes[offset + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            length = struct.unpack(">H", image_bytes[offset + 2:offset + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", image_bytes[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+    return None
+
+
+class Ticket:
+    """Задача, ожидающая слот инференса или выполняющаяся в нём"""
+
+    def __init__(self, tenant: str, priority: str, cost: float, future: asyncio.Future):
+        self.tenant = tenant
+        self.priority = priority
+        self.cost = cost
+        self.future = future
+        # Работа в пуле инференса, занимающая слот (задаёт владелец слота)
+        self.work: Optional[asyncio.Future] = None
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.compute_share: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> float:
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+    @property
+    def compute_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сведения для истории запросов"""
+        return {
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "cost": round(self.cost, 4),
+            "queue_wait_seconds": round(self.queue_wait, 4),
+            "compute_seconds": round(self.compute_seconds, 4),
+            "compute_share": round(self.compute_share, 4) if self.compute_share is not None else None,
+        }
+
+
+class FairScheduler:
+    """
+    Планировщик слотов инференса между клиентами (tenants).
+
+    Слотов столько же, сколько потоков в пуле инференса, поэтому задачи ждут здесь, а не
+    в очереди пула. Между классами приоритета - строгий приоритет; внутри класса - взвешенная
+    справедливая очередь (WFQ): у каждого клиента есть виртуальное время окончания его работы,
+    запускается задача клиента с наименьшим виртуальным окончанием (start + cost / weight).
+    Из очереди клиента берётся самая дешёвая задача (с поправкой на ожидание, чтобы дорогие
+    не ждали бесконечно), поэтому короткие задачи обгоняют длинные. Клиент, у которого
+    запущено SCHEDULER_TENANT_MAX_CONCURRENCY задач, пропускается.
+
+    Работает в потоке event loop и не требует блокировок.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._queues: Dict[str, Dict[str, List[Ticket]]] = {priority: {} for priority in PRIORITY_CLASSES}
+        self._virtual_time: Dict[str, float] = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._last_finish: Dict[Tuple[str, str], float] = {}
+        self._running: Dict[str, int] = {}
+        self._running_total = 0
+        # Затраченное время инференса по клиентам с экспоненциальным затуханием: (значение, момент)
+        self._usage: Dict[str, Tuple[float, float]] = {}
+
+    @property
+    def slots(self) -> int:
+        # Пул инференса может быть пересоздан автотюнером, поэтому размер читается каждый раз
+        return max(1, get_inference_config()[0])
+
+    def weight(self, tenant: str) -> float:
+        return max(self.settings.SCHEDULER_TENANT_WEIGHTS.get(tenant, 1.0), 1e-6)
+
+    def limit(self, tenant: str) -> int:
+        """Наибольшее число одновременных задач клиента (0 - без ограничения)"""
+        return self.settings.SCHEDULER_TENANT_LIMITS.get(tenant, self.settings.SCHEDULER_TENANT_MAX_CONCURRENCY)
+
+    @asynccontextmanager
+    async def slot(
+            self,
+            tenant: str,
+            priority: str,
+            cost: float,
+            cancel_token: Optional[CancelToken] = None,
+    ) -> AsyncIterator[Ticket]:
+        """
+        Ждёт слот инференса и удерживает его на время блока.
+
+        Если блок запустил работу в пуле инференса, её future нужно сохранить в ticket.work:
+        при отмене ожидающей задачи поток пула продолжает работать до ближайшей проверки
+        токена отмены, и слот освобождается только после завершения этой работы.
+
+        :param tenant: Клиент (ключ API или IP)
+        :param priority: Класс приоритета из PRIORITY_CLASSES
+        :param cost: Оценка стоимости задачи (мегапиксели результата)
+        :param cancel_token: Опционально: при отмене задача покидает очередь (UpscaleCancelled)
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class '{priority}', expected one of {PRIORITY_CLASSES}")
+
+        ticket = Ticket(tenant, priority, cost, asyncio.get_event_loop().create_future())
+        if tenant not in self._queues[priority]:
+            # Клиент начинает очередь не раньше текущего виртуального времени: простой не копит кредит
+            key = (priority, tenant)
+            self._last_finish[key] = max(self._last_finish.get(key, 0.0), self._virtual_time[priority])
+        self._queues[priority].setdefault(tenant, []).append(ticket)
+        self._dispatch()
+
+        try:
+            while not ticket.future.done():
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                await asyncio.wait({ticket.future}, timeout=_CANCEL_POLL_SECONDS)
+        except BaseException:
+            if ticket.future.done():
+                self._release(ticket)
+            else:
+                self._remove(ticket)
+            raise
+
+        if ticket.queue_wait > 1.0:
+            logger.debug(f"Tenant {tenant} ({priority}) waited {ticket.queue_wait:.2f}s for an inference slot")
+        try:
+            yield ticket
+        finally:
+            if ticket.work is not None and not ticket.work.done():
+                ticket.work.add_done_callback(lambda work: self._release_after(ticket, work))
+            else:
+                self._release(ticket)
+
+    @contextmanager
+    def slot_from_thread(
+            self,
+            loop: asyncio.AbstractEventLoop,
+            tenant: str,
+            priority: str,
+            cost: float,
+            cancel_token: Optional[CancelToken] = None,
+    ) -> Iterator[Ticket]:
+        """
+        То же, что slot(), для кода в отдельном потоке (фоновые задачи): слот ждётся и
+        освобождается в event loop, а работа блока выполняется в вызывающем потоке.
+
+        Поток не должен принадлежать пулу инференса: иначе, ожидая слот, он занимал бы поток,
+        который нужен владельцам слотов.
+
+        :param loop: Event loop, в котором работает планировщик
+        """
+        acquired: concurrent.futures.Future = concurrent.futures.Future()
+
+        async def hold():
+            async with self.slot(tenant, priority, cost, cancel_token) as ticket:
+                release = loop.create_future()
+                acquired.set_result((ticket, release))
+                await release
+
+        holder = asyncio.run_coroutine_threadsafe(hold(), loop)
+        concurrent.futures.wait([acquired, holder], return_when=concurrent.futures.FIRST_COMPLETED)
+        if not acquired.done():
+            # Слот не выдан: задачу отменили в очереди
+            holder.result()
+        ticket, release = acquired.result()
+        try:
+            yield ticket
+        finally:
+            loop.call_soon_threadsafe(release.set_result, None)
+            holder.result()
+
+    def _release_after(self, ticket: Ticket, work: asyncio.Future):
+        """Освобождает слот после работы, результат которой уже никто не ждёт"""
+        if not work.cancelled() and work.exception() is not None:
+            logger.debug(f"Abandoned inference of tenant {ticket.tenant} failed: {work.exception()}")
+        self._release(ticket)
+
+    def _remove(self, ticket: Ticket):
+        tickets = self._queues[ticket.priority].get(ticket.tenant)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[ticket.priority][ticket.tenant]
+
+    def _next(self, now: float) -> Optional[Ticket]:
+        """Выбирает следующую задачу: класс приоритета, затем клиент с наименьшим виртуальным окончанием"""
+        aging = self.settings.SCHEDULER_AGING_SECONDS
+        for priority in PRIORITY_CLASSES:
+            best: Optional[Ticket] = None
+            best_finish = 0.0
+            for tenant, tickets in self._queues[priority].items():
+                limit = self.limit(tenant)
+                if limit and self._running.get(tenant, 0) >= limit:
+                    continue
+                # Дешёвые задачи клиента идут первыми; ожидание уменьшает эффективную стоимость
+                ticket = min(tickets, key=lambda item: item.cost / (1 + (now - item.enqueued_at) / aging))
+                finish = self._last_finish[(priority, tenant)] + ticket.cost / self.weight(tenant)
+                if best is None or finish < best_finish:
+                    best, best_finish = ticket, finish
+            if best is not None:
+                return best
+        return None
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._running_total < self.slots:
+            ticket = self._next(now)
+            if ticket is None:
+                return
+
+            key = (ticket.priority, ticket.tenant)
+            start = self._last_finish[key]
+            self._last_finish[key] = start + ticket.cost / self.weight(ticket.tenant)
+            self._virtual_time[ticket.priority] = start
+
+            self._remove(ticket)
+            self._running[ticket.tenant] = self._running.get(ticket.tenant, 0) + 1
+            self._running_total += 1
+            ticket.started_at = now
+            ticket.future.set_result(True)
+
+    def _release(self, ticket: Ticket):
+        ticket.finished_at = time.monotonic()
+        self._running_total -= 1
+        self._running[ticket.tenant] -= 1
+        if not self._running[ticket.tenant]:
+            del self._running[ticket.tenant]
+        ticket.compute_share = self._account(ticket.tenant, ticket.compute_seconds, ticket.finished_at)
+
+        # Клиент без задач, отставший от виртуального времени, ничем не отличается от нового
+        key = (ticket.priority, ticket.tenant)
+        if (ticket.tenant not in self._queues[ticket.priority]
+                and self._last_finish.get(key, 0.0) <= self._virtual_time[ticket.priority]):
+            self._last_finish.pop(key, None)
+
+        self._dispatch()
+
+    def _decayed(self, value: float, since: float, now: float) -> float:
+        return value * 0.5 ** ((now - since) / self.settings.SCHEDULER_SHARE_HALF_LIFE_SECONDS)
+
+    def _account(self, tenant: str, seconds: float, now: float) -> float:
+        """Учитывает время инференса клиента и возвращает его долю за последнее время"""
+        usage = {name: self._decayed(value, since, now) for name, (value, since) in self._usage.items()}
+        usage[tenant] = usage.get(tenant, 0.0) + seconds
+        total = sum(usage.values())
+        # Давно не активные клиенты с пренебрежимо малой долей забываются
+        self._usage = {name: (value, now) for name, value in usage.items() if name == tenant or value > total * 1e-4}
+        return usage[tenant] / total if total > 0 else 1.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние очередей: ожидающие и выполняющиеся задачи по классам и клиентам"""
+        return {
+            "slots": self.slots,
+            "running": dict(self._running),
+            "queued": {
+                priority: {tenant: len(tickets) for tenant, tickets in tenants.items()}
+                for priority, tenants in self._queues.items()
+            },
+        }
+
+
+# Планировщик процесса (общий для всех запросов)
+_scheduler: Optional[FairScheduler] = None
+
+
+def get_scheduler(settings: Settings = None) -> FairScheduler:
+    """Возвращает планировщик, создавая его по настройкам при первом обращении"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(settings or Settings())
+    return _scheduler
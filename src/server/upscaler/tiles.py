@@ -0,0 +1,76 @@
+from typing import NamedTuple, List, Tuple, Literal
+
+import cv2
+import numpy as np
+
+
+class Tile(NamedTuple):
+    """Прямоугольник исходного изображения, обрабатываемый как отдельный тайл."""
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def padded(self, pad: int, image_width: int, image_height: int) -> Tuple[int, int, int, int]:
+        """
+        Возвращает границы тайла, расширенные на pad пикселей (с учётом краёв изображения).
+
+        Перекрытие нужно, чтобы на стыках тайлов не появлялись швы: сеть видит контекст
+        вокруг тайла, а лишнее обрезается после увеличения.
+
+        :return: (x0, y0, x1, y1) в координатах исходного изображения
+        """
+        return (
+            max(self.x - pad, 0),
+            max(self.y - pad, 0),
+            min(self.x + self.width + pad, image_width),
+            min(self.y + self.height + pad, image_height),
+        )
+
+    def scaled(self, scale: int) -> Tuple[int, int, int, int]:
+        """Возвращает (x0, y0, x1, y1) тайла в координатах увеличенного изображения"""
+        return (
+            self.x * scale,
+            self.y * scale,
+            (self.x + self.width) * scale,
+            (self.y + self.height) * scale,
+        )
+
+
+def split_tiles(image_width: int, image_height: int, tile_size: int) -> List[Tile]:
+    """
+    Разбивает изображение на тайлы не больше tile_size x tile_size (построчно, слева направо).
+
+    При tile_size <= 0 возвращает один тайл на всё изображение.
+    """
+    if tile_size <= 0:
+        return [Tile(0, 0, image_width, image_height)]
+
+    return [
+        Tile(x, y, min(tile_size, image_width - x), min(tile_size, image_height - y))
+        for y in range(0, image_height, tile_size)
+        for x in range(0, image_width, tile_size)
+    ]
+
+
+def is_flat_tile(
+        image: np.ndarray,
+        tile: Tile,
+        threshold: float,
+        method: Literal["variance", "edges"] = "variance",
+) -> bool:
+    """
+    Проверяет, является ли тайл однородным (фон, заливка).
+
+    Метод 'variance' сравнивает дисперсию яркости с порогом, метод 'edges' -
+    долю пикселей на границах Canny (в процентах).
+    """
+    region = image[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+
+    if method == "edges":
+        edges = cv2.Canny(gray, 100, 200)
+        return cv2.countNonZero(edges) * 100.0 / edges.size < threshold
+
+    _, std = cv2.meanStdDev(gray)
+    return float(std[0][0]) ** 2 < threshold
@@ -0,0 +1,254 @@
+import queue
+import threading
+from contextlib import nullcontext
+from typing import Optional, Callable, Dict, Any, List, ContextManager
+
+import cv2
+import numpy as np
+
+from src.server.config import Settings
+from src.server.logger import logger
+from src.server.upscaler.opencv import Upscaler
+from src.server.upscaler.tiles import Tile
+from src.server.utils.cancellation import CancelToken
+
+# Маркер конца потока кадров между стадиями конвейера
+_END = object()
+
+
+class VideoUpscaler:
+    """
+    Потоковое увеличение разрешения видео или последовательности изображений.
+
+    Декодирование (cv2.VideoCapture), инференс и кодирование (cv2.VideoWriter) выполняются
+    параллельно в отдельных потоках, связанных очередями ограниченного размера, поэтому
+    потребление памяти не зависит от длины ролика. Неизменившиеся относительно предыдущего
+    кадра области не прогоняются через сеть: используется уже увеличенный тайл.
+    """
+
+    def __init__(self, upscaler: Upscaler, settings: Settings = None):
+        self.upscaler = upscaler
+        self.settings = settings or upscaler.settings
+        self.tile_size = self.settings.VIDEO_TILE_SIZE
+        self.reuse_threshold = self.settings.VIDEO_REUSE_THRESHOLD
+
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._cancel_token: Optional[CancelToken] = None
+        self._inference_slot: Optional[Callable[[float], ContextManager]] = None
+
+        self.stats: Dict[str, Any] = {
+            "frames": 0,
+            "reused_frames": 0,
+            "tiles": 0,
+            "reused_tiles": 0,
+        }
+
+    def process(
+            self,
+            source: str,
+            destination: str,
+            on_progress: Optional[Callable[[int, int], None]] = None,
+            cancel_token: Optional[CancelToken] = None,
+            inference_slot: Optional[Callable[[float], ContextManager]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Увеличивает разрешение видео.
+
+        :param source: Путь к видео или шаблон последовательности кадров (например, 'frames/%05d.png')
+        :param destination: Путь к выходному видео (.mp4) или шаблон последовательности кадров
+        :param on_progress: Опционально: callback(обработано_кадров, всего_кадров)
+        :param cancel_token: Опционально: токен отмены, проверяется перед каждым кадром и между тайлами
+        :param inference_slot: Опционально: фабрика контекста, удерживаемого на время инференса
+            каждого кадра, по стоимости кадра в мегапикселях (например, слот планировщика)
+        :return: Статистика обработки
+        :raises UpscaleCancelled: Если обработка отменена; конвейер останавливается
+        """
+        self._cancel_token = cancel_token
+        self._inference_slot = inference_slot
+
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            error_msg = f"Failed to open video source: {source}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        logger.info(f"Upscaling video {source}: {total_frames} frames at {fps:.2f} fps")
+
+        self.upscaler.initialize_sync()
+
+        decoded: queue.Queue = queue.Queue(maxsize=self.settings.VIDEO_QUEUE_SIZE)
+        upscaled: queue.Queue = queue.Queue(maxsize=self.settings.VIDEO_QUEUE_SIZE)
+
+        decoder = threading.Thread(target=self._guard, args=(self._decode, capture, decoded), daemon=True)
+        encoder = threading.Thread(
+            target=self._guard,
+            args=(self._encode, upscaled, destination, fps, total_frames, on_progress),
+            daemon=True,
+        )
+        decoder.start()
+        encoder.start()
+
+        try:
+            self._guard(self._infer, decoded, upscaled)
+        finally:
+            decoder.join()
+            encoder.join()
+            capture.release()
+
+        if self._error is not None:
+            raise self._error
+
+        logger.info(
+            f"Video upscaled: {self.stats['frames']} frames, {self.stats['reused_frames']} reused frames, "
+            f"{self.stats['reused_tiles']}/{self.stats['tiles']} reused tiles"
+        )
+        return self.stats
+
+    def _guard(self, stage: Callable, *args):
+        """Запускает стадию конвейера; при ошибке останавливает остальные стадии"""
+        try:
+            stage(*args)
+        except BaseException as exc:
+            if self._error is None:
+                self._error = exc
+            logger.error(f"Video pipeline stage {stage.__name__} failed: {exc}")
+            self._stop.set()
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        """Кладёт элемент в очередь, пока конвейер не остановлен; False - если остановлен"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue) -> Any:
+        """Достаёт элемент из очереди; при остановке конвейера возвращает маркер конца"""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _decode(self, capture: cv2.VideoCapture, decoded: queue.Queue):
+        while not self._stop.is_set():
+            success, frame = capture.read()
+            if not success:
+                break
+            if not self._put(decoded, frame):
+                return
+        self._put(decoded, _END)
+
+    def _infer(self, decoded: queue.Queue, upscaled: queue.Queue):
+        reference: Optional[np.ndarray] = None
+        previous_result: Optional[np.ndarray] = None
+
+        while True:
+            frame = self._get(decoded)
+            if frame is _END:
+                break
+            if self._cancel_token is not None:
+                self._cancel_token.raise_if_cancelled()
+
+            if reference is not None and reference.shape == frame.shape and not cv2.absdiff(frame, reference).any():
+                result = previous_result
+                self.stats["reused_frames"] += 1
+            else:
+                with self._slot(frame):
+                    if reference is None or reference.shape != frame.shape:
+                        result = self.upscaler.upscale_array(frame, cancel_token=self._cancel_token)
+                        reference = frame
+                    else:
+                        result, reference = self._upscale_with_reuse(frame, reference, previous_result)
+
+            previous_result = result
+            self.stats["frames"] += 1
+            if not self._put(upscaled, result):
+                return
+
+        self._put(upscaled, _END)
+
+    def _slot(self, frame: np.ndarray) -> ContextManager:
+        """Контекст инференса кадра (слот планировщика, если он задан)"""
+        if self._inference_slot is None:
+            return nullcontext()
+        height, width = frame.shape[:2]
+        return self._inference_slot(width * height * self.upscaler.scale ** 2 / 1e6)
+
+    def _upscale_with_reuse(self, frame: np.ndarray, reference: np.ndarray, previous_result: np.ndarray):
+        """
+        Увеличивает кадр по тайлам, переиспользуя тайлы предыдущего результата для областей,
+        которые почти не изменились.
+
+        Для переиспользованных тайлов в опорном кадре остаются старые пиксели, поэтому
+        медленные изменения накапливаются и не «застревают» навсегда.
+
+        :return: (увеличенный кадр, новый опорный кадр)
+        """
+        difference = cv2.absdiff(frame, reference)
+        scale = self.upscaler.scale
+        reused: List[Tile] = []
+
+        def reuse_tile(tile: Tile) -> Optional[np.ndarray]:
+            self.stats["tiles"] += 1
+            region = difference[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+            if region.mean() >= self.reuse_threshold:
+                return None
+
+            reused.append(tile)
+            self.stats["reused_tiles"] += 1
+            x0, y0, x1, y1 = tile.scaled(scale)
+            return previous_result[y0:y1, x0:x1]
+
+        result = self.upscaler.upscale_array(
+            frame, tile_size=self.tile_size, reuse_tile=reuse_tile, cancel_token=self._cancel_token
+        )
+
+        new_reference = frame.copy()
+        for tile in reused:
+            new_reference[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width] = \
+                reference[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+
+        return result, new_reference
+
+    def _encode(
+            self,
+            upscaled: queue.Queue,
+            destination: str,
+            fps: float,
+            total_frames: int,
+            on_progress: Optional[Callable[[int, int], None]],
+    ):
+        writer: Optional[cv2.VideoWriter] = None
+        is_sequence = "%" in destination
+        written = 0
+
+        try:
+            while True:
+                frame = self._get(upscaled)
+                if frame is _END:
+                    break
+
+                if is_sequence:
+                    if not cv2.imwrite(destination % written, frame):
+                        raise RuntimeError(f"Failed to write frame {written} to {destination}")
+                else:
+                    if writer is None:
+                        height, width = frame.shape[:2]
+                        writer = cv2.VideoWriter(destination, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                        if not writer.isOpened():
+                            raise RuntimeError(f"Failed to open video writer for {destination}")
+                    writer.write(frame)
+
+                written += 1
+                if on_progress is not None:
+                    on_progress(written, total_frames)
+        finally:
+            if writer is not None:
+                writer.release()
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, AsyncIterator
+
+from starlette.requests import Request
+
+
+class UpscaleCancelled(RuntimeError):
+    """Обработка прервана: клиент отключился или истёк дедлайн запроса."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Upscaling cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Токен кооперативной отмены, общий для обработчика запроса и потока executor.
+
+    Обработчик запроса вызывает cancel() (например, при отключении клиента), а цикл
+    инференса проверяет токен на границах тайлов через raise_if_cancelled().
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        """
+        :param deadline_seconds: Опционально: через сколько секунд от создания токена
+            обработка считается просроченной
+        """
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+    def cancel(self, reason: str):
+        """Запрашивает отмену (повторные вызовы не меняют причину)"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """Бросает UpscaleCancelled, если отмена запрошена или дедлайн истёк"""
+        if self.cancelled:
+            raise UpscaleCancelled(self.reason or "cancelled")
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(
+        request: Request,
+        token: CancelToken,
+        poll_interval: float = 0.5,
+) -> AsyncIterator[CancelToken]:
+    """
+    Пока открыт контекст, периодически проверяет, не отключился ли клиент,
+    и при отключении отменяет токен.
+    """
+
+    async def watch():
+        while not token.cancelled:
+            if await request.is_disconnected():
+                token.cancel("client disconnected")
+                return
+            await asyncio.sleep(poll_interval)
+
+    task = asyncio.create_task(watch())
+    try:
+        yield token
+    finally:
+        task.cancel()
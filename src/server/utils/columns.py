@@ -0,0 +1,470 @@
+import json
+import re
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.server.logger import logger
+from src.server.utils.rollups import DURATION_BUCKETS, empty_model, empty_rollup, history_lock, record_time
+
+# Время в записях истории - локальное без часового пояса; храним его как секунды от EPOCH
+# в той же шкале, чтобы границы часов и суток совпадали с почасовыми агрегатами
+EPOCH = datetime(1970, 1, 1)
+
+TIME_BUCKETS = {"hour": 3600, "day": 86400}
+GROUP_FIELDS = ("model", "scale", "status", "tenant", "priority", "time")
+METRICS = {
+    "duration": "duration",
+    "size": "size",
+    "skipped_ratio": "skipped_ratio",
+    "queue_wait": "queue_wait",
+    "compute_share": "compute_share",
+}
+_PERCENTILE = re.compile(r"^p(\d{1,2}(\.\d+)?|100)$")
+
+# Код (модель, масштаб) - одно целое, чтобы группировать по полному имени модели одной сортировкой
+_SCALE_RADIX = 1 << 16
+
+# Наибольший диапазон значений, факторизуемый таблицей вместо сортировки
+_DENSE_SPAN = 1 << 22
+
+_COLUMNS = {
+    "timestamp": np.float64,
+    "model": np.int32,
+    "scale": np.int32,
+    "status": np.int32,
+    "duration": np.float64,
+    "size": np.float64,
+    "cache_hit": np.bool_,
+    "skipped_ratio": np.float64,
+    "cancel_reason": np.int32,
+    "tenant": np.int32,
+    "priority": np.int32,
+    "queue_wait": np.float64,
+    "compute_share": np.float64,
+}
+_CATEGORICAL = ("model", "status", "cancel_reason", "tenant", "priority")
+
+
+def to_seconds(moment: datetime) -> float:
+    return (moment - EPOCH).total_seconds()
+
+
+def from_seconds(seconds: float) -> datetime:
+    return EPOCH + timedelta(seconds=float(seconds))
+
+
+def _full_model_name(model_name: str, scale: int) -> str:
+    name = model_name or "unknown"
+    return f"{name}_x{scale}" if scale else name
+
+
+def _factorize(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Уникальные значения целочисленного столбца и коды значений (индексы в уникальных).
+
+    Для узкого диапазона значений (коды категорий, масштабы, часы за год) используется
+    таблица по np.bincount за O(n) вместо сортировки np.unique.
+    """
+    if not len(column):
+        return column[:0], np.zeros(0, dtype=np.int64)
+
+    low = column.min()
+    span = int(column.max() - low) + 1
+    if span <= _DENSE_SPAN:
+        offsets = column - low
+        present = np.bincount(offsets, minlength=span) > 0
+        lookup = np.cumsum(present) - 1
+        return np.flatnonzero(present) + low, lookup[offsets]
+
+    uniques, codes = np.unique(column, return_inverse=True)
+    return uniques, codes.reshape(-1)
+
+
+class HistoryColumns:
+    """
+    Неизменяемый снимок истории запросов в виде столбцов NumPy.
+
+    Строковые поля (модель, статус, причина отмены) хранятся кодами категорий, отсутствующие
+    числовые значения - NaN (масштаб - 0). Все агрегаты считаются векторно по маске строк.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], categories: Dict[str, List[str]]):
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _code(self, column: str, value: str) -> int:
+        try:
+            return self.categories[column].index(value)
+        except ValueError:
+            return -1
+
+    def mask(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> np.ndarray:
+        """Маска записей в окне [since, until); записи без времени попадают только в неограниченное окно"""
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.timestamp >= to_seconds(since)
+        if until is not None:
+            mask &= self.timestamp < to_seconds(until)
+        return mask
+
+    def rollup(self, mask: np.ndarray) -> Dict[str, Any]:
+        """Агрегат выбранных записей в формате utils.rollups"""
+        rollup = empty_rollup()
+        rollup["count"] = int(mask.sum())
+        if not rollup["count"]:
+            return rollup
+
+        statuses = np.bincount(self.status[mask], minlength=len(self.categories["status"]))
+        rollup["statuses"] = {
+            name: int(count) for name, count in zip(self.categories["status"], statuses) if count
+        }
+
+        cancelled = mask & (self.status == self._code("status", "cancelled"))
+        if cancelled.any():
+            reasons = np.bincount(self.cancel_reason[cancelled], minlength=len(self.categories["cancel_reason"]))
+            rollup["cancel_reasons"] = {
+                name: int(count) for name, count in zip(self.categories["cancel_reason"], reasons) if count
+            }
+            rollup["cancelled_seconds"] = float(np.nansum(self.duration[cancelled]))
+
+        success = mask & (self.status == self._code("status", "success"))
+        if not success.any():
+            return rollup
+
+        rollup["cache_hits"] = int((success & self.cache_hit).sum())
+
+        # Результаты из хранилища не отражают время обработки моделью
+        timed = success & ~self.cache_hit & ~np.isnan(self.duration)
+        buckets = np.searchsorted(DURATION_BUCKETS, self.duration[timed], side="left")
+        rollup["duration_histogram"] = np.bincount(buckets, minlength=len(DURATION_BUCKETS) + 1).tolist()
+
+        self._rollup_models(rollup, success)
+
+        scales = self.scale[success]
+        scales = scales[scales > 0]
+        if len(scales):
+            values, counts = np.unique(scales, return_counts=True)
+            rollup["scales"] = {str(value): int(count) for value, count in zip(values, counts)}
+
+        ratios = self.skipped_ratio[success]
+        ratios = ratios[~np.isnan(ratios)]
+        rollup["tile_skip_ratio_sum"] = float(ratios.sum())
+        rollup["tile_skip_ratio_count"] = int(len(ratios))
+        return rollup
+
+    def _rollup_models(self, rollup: Dict[str, Any], success: np.ndarray):
+        model_names = self.categories["model"]
+        has_name = np.array([bool(name) for name in model_names], dtype=bool)
+
+        # Записи с неизвестной моделью и масштабом (полное имя 'unknown') не учитываются
+        selected = success & (has_name[self.model] | (self.scale > 0))
+        if not selected.any():
+            return
+
+        keys = self.model[selected].astype(np.int64) * _SCALE_RADIX + self.scale[selected]
+        groups, inverse = _factorize(keys)
+        size = len(groups)
+
+        duration = self.duration[selected]
+        timed = ~self.cache_hit[selected] & ~np.isnan(duration)
+        file_size = self.size[selected]
+        sized = ~np.isnan(file_size)
+
+        counts = np.bincount(inverse, weights=has_name[self.model[selected]], minlength=size)
+        duration_sum = np.bincount(inverse, weights=np.where(timed, duration, 0.0), minlength=size)
+        duration_count = np.bincount(inverse, weights=timed, minlength=size)
+        size_sum = np.bincount(inverse, weights=np.where(sized, file_size, 0.0), minlength=size)
+        size_count = np.bincount(inverse, weights=sized, minlength=size)
+
+        for index, key in enumerate(groups):
+            model_name = model_names[key // _SCALE_RADIX]
+            model = empty_model(model_name or None)
+            model.update({
+                "count": int(counts[index]),
+                "duration_sum": float(duration_sum[index]),
+                "duration_count": int(duration_count[index]),
+                "size_sum": float(size_sum[index]),
+                "size_count": int(size_count[index]),
+            })
+            rollup["models"][_full_model_name(model_name, int(key % _SCALE_RADIX))] = model
+
+    def query(
+            self,
+            group_by: Sequence[str] = (),
+            metric: str = "duration",
+            aggregations: Sequence[str] = ("count", "mean"),
+            bucket: str = "hour",
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Группирует записи окна по полям group_by и считает агрегаты метрики.
+
+        :param group_by: Поля группировки: 'model' (полное имя), 'scale', 'status', 'tenant', 'priority', 'time'
+        :param metric: 'duration', 'size', 'skipped_ratio', 'queue_wait' или 'compute_share'
+        :param aggregations: 'count' (число записей группы), 'sum', 'mean', 'min', 'max', 'pNN' (перцентиль)
+        :param bucket: Размер интервала для группировки по времени: 'hour' или 'day'
+        :return: Строки результата, отсортированные по значениям полей группировки
+        """
+        for field in group_by:
+            if field not in GROUP_FIELDS:
+                raise ValueError(f"Unknown group by field '{field}', expected one of {GROUP_FIELDS}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {tuple(METRICS)}")
+        if bucket not in TIME_BUCKETS:
+            raise ValueError(f"Unknown time bucket '{bucket}', expected one of {tuple(TIME_BUCKETS)}")
+        for aggregation in aggregations:
+            if aggregation not in ("count", "sum", "mean", "min", "max") and not _PERCENTILE.match(aggregation):
+                raise ValueError(f"Unknown aggregation '{aggregation}'")
+
+        mask = self.mask(since, until)
+        if "time" in group_by:
+            mask &= ~np.isnan(self.timestamp)
+
+        keys, labels = self._group_keys(group_by, bucket, mask)
+        groups, inverse = _factorize(keys)
+        size = len(groups)
+
+        values = self.columns[METRICS[metric]][mask]
+        valid = ~np.isnan(values)
+        values, value_groups = values[valid], inverse[valid]
+
+        counts = np.bincount(inverse, minlength=size)
+        value_counts = np.bincount(value_groups, minlength=size)
+        sums = np.bincount(value_groups, weights=values, minlength=size)
+
+        # Значения, отсортированные внутри групп: для минимума, максимума и перцентилей.
+        # Устойчивая сортировка по коду группы после сортировки по значению сохраняет порядок
+        # значений внутри группы; для малых целых кодов NumPy сортирует её поразрядно за O(n)
+        sorted_values = values
+        if any(aggregation not in ("count", "sum", "mean") for aggregation in aggregations):
+            order = np.argsort(values)
+            code_type = np.uint16 if size <= np.iinfo(np.uint16).max else np.int64
+            order = order[np.argsort(value_groups[order].astype(code_type), kind="stable")]
+            sorted_values = values[order]
+        starts = np.concatenate(([0], np.cumsum(value_counts)[:-1]))
+        has_values = value_counts > 0
+        last = max(len(sorted_values) - 1, 0)
+        if not len(sorted_values):
+            sorted_values = np.full(1, np.nan)
+
+        results: Dict[str, np.ndarray] = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for aggregation in aggregations:
+                if aggregation == "count":
+                    results[aggregation] = counts
+                elif aggregation == "sum":
+                    results[aggregation] = np.where(has_values, sums, np.nan)
+                elif aggregation == "mean":
+                    results[aggregation] = np.where(has_values, sums / value_counts, np.nan)
+                elif aggregation == "min":
+                    results[aggregation] = np.where(has_values, sorted_values[np.minimum(starts, last)], np.nan)
+                elif aggregation == "max":
+                    end = np.clip(starts + value_counts - 1, 0, last)
+                    results[aggregation] = np.where(has_values, sorted_values[end], np.nan)
+                else:
+                    # Линейная интерполяция между соседними значениями, как np.percentile
+                    position = starts + float(aggregation[1:]) / 100 * np.maximum(value_counts - 1, 0)
+                    lower = np.clip(np.floor(position).astype(np.int64), 0, last)
+                    upper = np.clip(np.ceil(position).astype(np.int64), 0, last)
+                    fraction = position - np.floor(position)
+                    interpolated = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+                    results[aggregation] = np.where(has_values, interpolated, np.nan)
+
+        # Строки собираются из списков Python: подписи считаются один раз на уникальное значение поля
+        fields = [
+            (field, [field_labels[code] for code in ((groups // radix) % len(field_labels)).tolist()])
+            for field, radix, field_labels in labels
+        ]
+        columns = [
+            (aggregation, column.tolist() if aggregation == "count" else [
+                None if value != value else value for value in column.astype(np.float64).tolist()
+            ])
+            for aggregation, column in results.items()
+        ]
+        names = [name for name, _ in fields + columns]
+        return [dict(zip(names, row)) for row in zip(*(values for _, values in fields + columns))]
+
+    def _group_keys(self, group_by: Sequence[str], bucket: str, mask: np.ndarray):
+        """
+        Сводит поля группировки в один целочисленный ключ (смешанная система счисления по кодам полей).
+
+        :return: (ключи выбранных записей, [(поле, разряд поля в ключе, подписи значений поля)])
+        """
+        keys = np.zeros(int(mask.sum()), dtype=np.int64)
+        labels = []
+        radix = 1
+
+        # Поля обходятся в обратном порядке, чтобы первое поле было старшим разрядом
+        for field in reversed(group_by):
+            if field == "model":
+                column = self.model[mask].astype(np.int64) * _SCALE_RADIX + self.scale[mask]
+            elif field == "time":
+                column = np.floor(self.timestamp[mask] / TIME_BUCKETS[bucket]).astype(np.int64)
+            else:
+                column = self.columns[field][mask].astype(np.int64)
+
+            values, codes = _factorize(column)
+            keys += codes * radix
+            labels.append((field, radix, [self._label(field, value, bucket) for value in values.tolist()]))
+            radix *= max(len(values), 1)
+
+        return keys, list(reversed(labels))
+
+    def _label(self, field: str, value: int, bucket: str):
+        """Значение поля группировки по его коду в столбце"""
+        if field == "model":
+            return _full_model_name(self.categories["model"][value // _SCALE_RADIX], value % _SCALE_RADIX)
+        if field in ("status", "tenant", "priority"):
+            return self.categories[field][value]
+        if field == "time":
+            return from_seconds(value * TIME_BUCKETS[bucket]).isoformat()
+        return value
+
+
+class _ColumnStore:
+    """Растущие столбцы истории одного файла (ёмкость удваивается, как у list)"""
+
+    def __init__(self):
+        self.size = 0
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self.categories: Dict[str, List[str]] = {name: [] for name in _CATEGORICAL}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in _CATEGORICAL}
+
+    def _code(self, column: str, value: str) -> int:
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(codes)
+            self.categories[column].append(value)
+        return codes[value]
+
+    def _row(self, record: Dict[str, Any]) -> Tuple:
+        moment = record_time(record)
+        upscaler = record.get("upscaler")
+        upscaler = upscaler if isinstance(upscaler, dict) else {}
+        image = record.get("image")
+        image = image if isinstance(image, dict) else {}
+        tiles = record.get("tiles")
+        tiles = tiles if isinstance(tiles, dict) else {}
+        scheduler = record.get("scheduler")
+        scheduler = scheduler if isinstance(scheduler, dict) else {}
+
+        duration = record.get("duration_seconds")
+        size = image.get("size")
+        skipped_ratio = tiles.get("skipped_ratio")
+        queue_wait = scheduler.get("queue_wait_seconds")
+        compute_share = scheduler.get("compute_share")
+        return (
+            to_seconds(moment) if moment is not None else np.nan,
+            self._code("model", str(upscaler.get("model_name") or "")),
+            int(upscaler.get("scale") or 0),
+            self._code("status", str(record.get("status", "unknown"))),
+            float(duration) if duration is not None else np.nan,
+            float(size) if size is not None else np.nan,
+            bool(record.get("cache_hit")),
+            float(skipped_ratio) if skipped_ratio is not None else np.nan,
+            self._code("cancel_reason", str(record.get("cancel_reason", "unknown"))),
+            self._code("tenant", str(scheduler.get("tenant") or "unknown")),
+            self._code("priority", str(scheduler.get("priority") or "unknown")),
+            float(queue_wait) if queue_wait is not None else np.nan,
+            float(compute_share) if compute_share is not None else np.nan,
+        )
+
+    def extend(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        rows = [self._row(record) for record in records]
+        required = self.size + len(rows)
+        capacity = len(self.columns["timestamp"])
+        if required > capacity:
+            capacity = max(required, capacity * 2, 1024)
+            for name, column in self.columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+
+        for name, values in zip(_COLUMNS, zip(*rows)):
+            self.columns[name][self.size:required] = values
+        self.size = required
+
+    def snapshot(self) -> HistoryColumns:
+        # Срезы не копируют данные: добавление пишет за пределы среза или в новый массив
+        return HistoryColumns(
+            {name: column[:self.size] for name, column in self.columns.items()},
+            {name: list(values) for name, values in self.categories.items()},
+        )
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """Подпись файла (время изменения, размер) для проверки актуальности кэша"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class HistoryColumnsCache:
+    """
+    Кэш столбцов истории по файлам.
+
+    Файл разбирается один раз; записи, добавленные этим процессом (RequestHistory), дописываются
+    в столбцы без повторного чтения. Если файл изменился иначе (ротация, другой процесс),
+    он будет прочитан заново при следующем обращении.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores: Dict[Path, Tuple[Optional[Tuple[int, int]], _ColumnStore]] = {}
+
+    def get(self, history_file: Path) -> HistoryColumns:
+        # Порядок блокировок как при записи (RequestHistory): сначала файл истории, затем кэш
+        with history_lock(history_file), self._lock:
+            signature = file_signature(history_file)
+            entry = self._stores.get(history_file)
+            if entry is not None and entry[0] == signature:
+                return entry[1].snapshot()
+
+            store = _ColumnStore()
+            if signature is not None:
+                try:
+                    with open(history_file, "r") as f:
+                        store.extend(json.load(f))
+                except json.JSONDecodeError:
+                    logger.error(f"History file {history_file} is corrupted, ignoring it")
+                    return store.snapshot()
+                self._stores[history_file] = (signature, store)
+            return store.snapshot()
+
+    def append(self, history_file: Path, record: Dict[str, Any], previous_signature: Optional[Tuple[int, int]]):
+        """
+        Дописывает запись, только что добавленную в файл.
+
+        :param previous_signature: Подпись файла до записи: если кэш соответствовал другой версии
+            файла, он сбрасывается
+        """
+        with self._lock:
+            entry = self._stores.get(history_file)
+            if entry is None:
+                return
+            if entry[0] != previous_signature:
+                del self._stores[history_file]
+                return
+            entry[1].extend([record])
+            self._stores[history_file] = (file_signature(history_file), entry[1])
+
+
+history_columns = HistoryColumnsCache()
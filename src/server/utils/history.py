@@ -1,10 +1,28 @@
+import asyncio
 import json
+from contextvars import ContextVar
 from datetime import datetime
 from functools import wraps
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from starlette.requests import Request
+
+from src.server.broker.base import JobBroker
 from src.server.config import Settings
+from src.server.dependencies.scheduler import Tenant
 from src.server.logger import logger
+from src.server.utils.cancellation import UpscaleCancelled
+from src.server.utils.columns import file_signature, history_columns
+from src.server.utils.profiling import profiler
+from src.server.utils.rollups import history_lock
+from src.server.utils.storage import ResultStorage
+
+# Аргументы эндпоинта, которые не попадают в историю: запрос и служебные зависимости не
+# сериализуются и не несут полезных данных (клиент и приоритет записываются в поле scheduler)
+_NOT_RECORDED = (Request, Settings, ResultStorage, JobBroker, Tenant)
+
+# Дополнительные поля записи истории текущего запроса (заполняются через RequestHistory.annotate)
+_annotations: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_history_annotations", default=None)
 
 
 class RequestHistory:
@@ -20,6 +38,8 @@ class RequestHistory:
         @wraps(func)
         async def wrapper(*args, **kwargs):
             request_data = self._collect_request_data(*args, **kwargs)
+            annotations: Dict[str, Any] = {}
+            token = _annotations.set(annotations)
 
             try:
                 # Выполняем запрос
@@ -34,6 +54,16 @@ class RequestHistory:
                     "end_time": end_time.isoformat(),
                     "duration_seconds": (end_time - start_time).total_seconds(),
                 })
+            except UpscaleCancelled as e:
+                end_time = datetime.now()
+                request_data.update({
+                    "status": "cancelled",
+                    "cancel_reason": e.reason,
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "duration_seconds": (end_time - start_time).total_seconds(),
+                })
+                raise e
             except Exception as e:
                 request_data.update({
                     "status": "error",
@@ -42,12 +72,32 @@ class RequestHistory:
                 })
                 raise e
             finally:
-                self._save_to_history(request_data)
+                _annotations.reset(token)
+                # Запись перечитывает и переписывает файл истории под блокировкой, поэтому
+                # выполняется в пуле потоков, не блокируя event loop
+                await asyncio.get_event_loop().run_in_executor(None, self._record, request_data, annotations)
 
             return response
 
         return wrapper
 
+    def _record(self, request_data: Dict[str, Any], annotations: Dict[str, Any]):
+        with profiler.section("history"):
+            request_data.update(self.updated_kwargs(annotations))
+            self._save_to_history(request_data)
+
+    @staticmethod
+    def annotate(**fields: Any):
+        """
+        Добавляет поля к записи истории текущего запроса.
+
+        Вызывается из кода, выполняющегося внутри обёрнутого эндпоинта (в том же asyncio task);
+        вне записываемого запроса ничего не делает.
+        """
+        annotations = _annotations.get()
+        if annotations is not None:
+            annotations.update(fields)
+
     def updated_kwargs(self, kwargs):
         new_kwargs = {}
 
@@ -85,6 +135,7 @@ class RequestHistory:
 
     def _collect_request_data(self, *args, **kwargs) -> Dict[str, Any]:
         """Собирает информацию о запросе."""
+        kwargs = {key: value for key, value in kwargs.items() if not isinstance(value, _NOT_RECORDED)}
 
         return {
             "args": str(args),
@@ -97,12 +148,16 @@ class RequestHistory:
     def _save_to_history(self, record: Dict[str, Any]):
         """Сохраняет запись в файл истории."""
         try:
-            with open(self.history_file, "r") as f:
-                history = json.load(f)
+            with history_lock(self.history_file):
+                previous_signature = file_signature(self.history_file)
+                with open(self.history_file, "r") as f:
+                    history = json.load(f)
 
-            history.append(record)
+                history.append(record)
 
-            with open(self.history_file, "w") as f:
-                json.dump(history, f, indent=2)
+                with open(self.history_file, "w") as f:
+                    json.dump(history, f, indent=2)
+
+                history_columns.append(self.history_file, record, previous_signature)
         except Exception as e:
             logger.error(f"Failed to save request history: {e}")
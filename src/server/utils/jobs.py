@@ -0,0 +1,259 @@
+import asyncio
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Set, List, AsyncIterator, ContextManager
+
+import numpy as np
+
+from src.server.config import Settings
+from src.server.logger import logger
+from src.server.upscaler.scheduler import Ticket, get_scheduler
+from src.server.utils.cancellation import CancelToken, UpscaleCancelled
+
+
+class JobLimitExceeded(RuntimeError):
+    """У клиента уже запущено максимальное число фоновых задач (JOBS_MAX_PER_TENANT)."""
+
+
+class Job:
+    """Фоновая задача (например, увеличение видео) и её текущее состояние."""
+
+    def __init__(
+            self,
+            job_id: str,
+            kind: str,
+            job_dir: Path,
+            tenant: Optional[str] = None,
+            priority: Optional[str] = None,
+            deadline_seconds: Optional[float] = None,
+    ):
+        self.id = job_id
+        self.kind = kind
+        self.job_dir = job_dir
+        # Клиент, запустивший задачу, и его класс приоритета
+        self.tenant = tenant
+        self.priority = priority
+        # Отмена по запросу клиента (DELETE /jobs/{id}) или по истечении JOBS_DEADLINE_SECONDS;
+        # функция задачи передаёт токен в инференс, который проверяет его между тайлами и кадрами
+        self.cancel_token = CancelToken(deadline_seconds=deadline_seconds)
+        self.status = "pending"
+        self.progress = 0.0
+        self.result_path: Optional[Path] = None
+        self.media_type = "application/octet-stream"
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.details: Dict[str, Any] = {}
+        # Промежуточный результат для постепенного уточнения (превью, дополняемое тайлами)
+        self.canvas: Optional[np.ndarray] = None
+
+        self.events: List[Dict[str, Any]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Set[asyncio.Event] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    def inference_slot(self, cost: float) -> ContextManager[Ticket]:
+        """
+        Слот планировщика инференса для части работы задачи (кадра видео, изображения превью)
+        с клиентом, приоритетом и токеном отмены задачи. Вызывается из потока задачи.
+
+        :param cost: Оценка стоимости части работы (мегапиксели результата)
+        """
+        return get_scheduler().slot_from_thread(
+            self._loop, self.tenant or "default", self.priority, cost, self.cancel_token,
+        )
+
+    def set_progress(self, done: int, total: int):
+        """Обновляет прогресс задачи (вызывается из потока executor)"""
+        if total <= 0:
+            return
+        progress = min(done / total, 1.0)
+        # Не публикуем событие на каждый кадр - только при изменении хотя бы на 1%
+        if int(progress * 100) != int(self.progress * 100):
+            self.publish({"type": "progress", "progress": progress})
+        self.progress = progress
+
+    def publish(self, event: Dict[str, Any]):
+        """
+        Добавляет событие задачи и будит подписчиков.
+        Безопасно вызывать как из event loop, так и из потока executor.
+        """
+        self.events.append(event)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        for waiter in self._waiters:
+            waiter.set()
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Отдаёт все события задачи (начиная с первого) до её завершения"""
+        waiter = asyncio.Event()
+        self._waiters.add(waiter)
+        index = 0
+        try:
+            while True:
+                while index < len(self.events):
+                    index += 1
+                    yield self.events[index - 1]
+                if self.finished:
+                    break
+                await waiter.wait()
+                waiter.clear()
+        finally:
+            self._waiters.discard(waiter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "details": self.details,
+        }
+
+
+class JobManager:
+    """
+    Менеджер фоновых задач процесса: создаёт задачи, запускает их в собственном пуле потоков
+    и хранит их состояние в памяти. Файлы задач лежат в APP_FILES_PATH/jobs/<id>.
+
+    Инференс задачи выполняет в слотах планировщика (Job.inference_slot), наравне с запросами
+    и с учётом их клиента и приоритета, поэтому задачи не обходят справедливое планирование.
+    """
+
+    def __init__(self, settings: Settings = None):
+        self.settings = settings or Settings()
+        self.jobs_dir = self.settings.APP_FILES_PATH / "jobs"
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Потоки задач большую часть времени ждут слотов инференса или ввода-вывода
+        self._executor = ThreadPoolExecutor(thread_name_prefix="jobs")
+
+    def create(self, kind: str, tenant: Optional[str] = None, priority: Optional[str] = None) -> Job:
+        """
+        Создаёт новую задачу и её рабочую директорию.
+
+        :param tenant: Клиент, запускающий задачу; у одного клиента может быть не больше
+            JOBS_MAX_PER_TENANT незавершённых задач
+        :param priority: Класс приоритета клиента для планировщика инференса
+        :raises JobLimitExceeded: Если у клиента уже максимальное число незавершённых задач
+        """
+        limit = self.settings.JOBS_MAX_PER_TENANT
+        if tenant is not None and limit:
+            active = sum(1 for job in self._jobs.values() if job.tenant == tenant and not job.finished)
+            if active >= limit:
+                raise JobLimitExceeded(f"Tenant already has {active} unfinished jobs (limit {limit})")
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        priority = priority or self.settings.SCHEDULER_DEFAULT_PRIORITY
+        job = Job(job_id, kind, job_dir, tenant, priority, self.settings.JOBS_DEADLINE_SECONDS)
+        self._jobs[job_id] = job
+        logger.info(f"Job {job_id} ({kind}) created for {tenant or 'unknown tenant'}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def submit(self, job: Job, func: Callable[[Job], None]) -> Job:
+        """
+        Запускает синхронную функцию задачи в пуле потоков задач, не блокируя event loop.
+
+        :param job: Задача, созданная через create()
+        :param func: Функция, выполняющая работу; должна заполнить job.result_path
+            и выполнять инференс в слотах job.inference_slot()
+        """
+        job._loop = asyncio.get_event_loop()
+        task = job._loop.create_task(self._run(job, func))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Job, func: Callable[[Job], None]):
+        job.status = "running"
+        logger.info(f"Job {job.id} started")
+        try:
+            await asyncio.get_event_loop().run_in_executor(self._executor, func, job)
+            job.status = "done"
+            job.progress = 1.0
+            logger.info(f"Job {job.id} completed")
+        except UpscaleCancelled as e:
+            job.status = "cancelled"
+            job.error = e.reason
+            logger.info(f"Job {job.id} cancelled: {e.reason}")
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+            logger.error(f"Job {job.id} failed: {str(e)}")
+        finally:
+            job.finished_at = datetime.now()
+            job.canvas = None
+            job.publish({"type": job.status, "progress": job.progress, "error": job.error})
+
+    def cancel(self, job: Job):
+        """Запрашивает отмену задачи: работа прерывается на ближайшей границе тайла или кадра"""
+        if not job.finished:
+            job.cancel_token.cancel("cancelled by the client")
+            logger.info(f"Job {job.id} cancellation requested")
+
+    def remove(self, job_id: str):
+        """Удаляет задачу и её файлы"""
+        job = self._jobs.pop(job_id, None)
+        if job is not None:
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+
+    def expire(self, max_age_seconds: float) -> List[Path]:
+        """Забывает задачи, завершённые более max_age_seconds назад, и возвращает их директории"""
+        cutoff = datetime.now() - timedelta(seconds=max_age_seconds)
+        expired = [job for job in self._jobs.values() if job.finished and job.finished_at < cutoff]
+        for job in expired:
+            del self._jobs[job.id]
+        return [job.job_dir for job in expired]
+
+    def orphaned(self, max_age_seconds: float, known: Set[str]) -> List[Path]:
+        """
+        Директории без задачи в памяти (known), не менявшиеся max_age_seconds: остались
+        от прошлых запусков процесса (задачи хранятся только в памяти).
+        """
+        cutoff = time.time() - max_age_seconds
+        directories = []
+        for path in self.jobs_dir.iterdir():
+            try:
+                if path.name not in known and path.is_dir() and path.stat().st_mtime < cutoff:
+                    directories.append(path)
+            except FileNotFoundError:
+                continue
+        return directories
+
+    async def run_janitor(self, max_age_seconds: float, interval_seconds: float):
+        """Фоновая задача: периодически удаляет завершённые задачи старше max_age_seconds вместе с файлами"""
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                # Список задач меняется только в event loop, файлы удаляются в пуле потоков
+                directories = set(self.expire(max_age_seconds))
+                known = set(self._jobs)
+                directories.update(await loop.run_in_executor(None, self.orphaned, max_age_seconds, known))
+                for directory in directories:
+                    await loop.run_in_executor(None, shutil.rmtree, directory, True)
+                if directories:
+                    logger.info(f"Removed {len(directories)} expired job directories")
+            except Exception as e:
+                logger.error(f"Job cleanup failed: {str(e)}")
+            await asyncio.sleep(interval_seconds)
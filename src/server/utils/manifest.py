@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional, NamedTuple
+
+from src.server.logger import logger
+
+
+class SourceFingerprint(NamedTuple):
+    """Хэш входного файла и его размер/mtime, снятые до чтения содержимого"""
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+class UpscaleManifest:
+    """
+    Манифест пакетной обработки: для каждого входного файла хранит хэш содержимого,
+    модель, формат, параметры увеличения (точность, тайлы) и путь к результату.
+    Позволяет пропускать уже обработанные файлы и продолжать работу после падения.
+    """
+
+    def __init__(self, manifest_file: Path):
+        self.manifest_file = manifest_file
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Загружает манифест из файла (пустой, если файла нет или он повреждён)"""
+        if not self.manifest_file.exists():
+            return {}
+
+        with open(self.manifest_file, "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                logger.warning(f"Manifest {self.manifest_file} is corrupted, starting from scratch")
+                return {}
+
+    @staticmethod
+    def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+        """Считает sha256 содержимого файла"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def fingerprint(self, path: Path) -> SourceFingerprint:
+        """
+        Хэш файла вместе с размером и mtime, снятыми до хэширования: если файл изменится
+        во время обработки, следующий запуск заметит это по mtime.
+        """
+        stat = path.stat()
+        return SourceFingerprint(self.file_hash(path), stat.st_size, stat.st_mtime_ns)
+
+    def is_up_to_date(
+            self,
+            key: str,
+            source: Path,
+            model: str,
+            output_format: str,
+            params: Dict[str, Any],
+    ) -> Optional[SourceFingerprint]:
+        """
+        Проверяет, актуален ли результат для входного файла.
+
+        Сначала сравниваются размер и mtime (дёшево), и только при расхождении
+        пересчитывается хэш содержимого.
+
+        :param params: Параметры, от которых зависит результат (точность, тайлы)
+        :return: None, если файл актуален, иначе отпечаток входного файла
+        """
+        stat = source.stat()
+        entry = self.entries.get(key)
+        if (
+                entry is not None
+                and entry.get("model") == model
+                and entry.get("format") == output_format
+                and entry.get("params") == params
+                and Path(entry.get("output", "")).exists()
+        ):
+            if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                return None
+
+            fingerprint = self.fingerprint(source)
+            if entry.get("sha256") == fingerprint.sha256:
+                entry.update({"size": fingerprint.size, "mtime_ns": fingerprint.mtime_ns})
+                return None
+            return fingerprint
+
+        return self.fingerprint(source)
+
+    def mark_done(
+            self,
+            key: str,
+            fingerprint: SourceFingerprint,
+            model: str,
+            output_format: str,
+            params: Dict[str, Any],
+            output: Path,
+    ):
+        """Отмечает файл как обработанный (с отпечатком, снятым до обработки)"""
+        self.entries[key] = {
+            "sha256": fingerprint.sha256,
+            "model": model,
+            "format": output_format,
+            "params": params,
+            "output": str(output),
+            "size": fingerprint.size,
+            "mtime_ns": fingerprint.mtime_ns,
+        }
+
+    def save(self):
+        """Атомарно сохраняет манифест (через временный файл и os.replace)"""
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifest_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.manifest_file)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
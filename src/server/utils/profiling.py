@@ -0,0 +1,350 @@
+import cProfile
+import json
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator, Tuple, Callable
+
+from src.server.logger import logger
+
+_SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Код, аллокации которого попадают в снимки tracemalloc: Upscaler и запись/агрегация истории
+TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(True, str(_SERVER_DIR / "upscaler" / "*")),
+    tracemalloc.Filter(True, str(_SERVER_DIR / "utils" / "history.py")),
+    tracemalloc.Filter(True, str(_SERVER_DIR / "utils" / "columns.py")),
+    tracemalloc.Filter(True, str(_SERVER_DIR / "utils" / "rollups.py")),
+]
+
+
+class ProfileSession:
+    """
+    Сессия профилирования: собирает данные по секциям ('upscale', 'history'),
+    выполняемым, пока сессия активна.
+
+    Сессия завершается по истечении времени (решает вызывающий код) или после
+    max_requests секций 'upscale' (событие done).
+    """
+
+    mode = ""
+    media_type = "application/octet-stream"
+    extension = ""
+
+    def __init__(self, max_requests: int = 0):
+        self.max_requests = max_requests
+        self.requests = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        try:
+            yield
+        finally:
+            if name == "upscale":
+                with self._lock:
+                    self.requests += 1
+                    if self.max_requests and self.requests >= self.max_requests:
+                        self.done.set()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.finished_at = time.monotonic()
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def result(self) -> bytes:
+        raise NotImplementedError
+
+
+class SamplingSession(ProfileSession):
+    """
+    Сэмплирующий профилировщик: раз в interval секунд снимает стеки потоков, находящихся
+    внутри профилируемых секций (sys._current_frames), и считает одинаковые стеки.
+
+    Результат - collapsed stacks (формат flamegraph.pl / speedscope): 'секция;кадр;кадр N'.
+    Время в нативном коде (OpenCV, NumPy) приписывается вызывающей Python-функции.
+    """
+
+    mode = "sampling"
+    media_type = "text/plain"
+    extension = "collapsed"
+
+    def __init__(self, max_requests: int = 0, interval: float = 0.01):
+        super().__init__(max_requests)
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        # Потоки внутри секций: ident -> имя секции
+        self._threads: Dict[int, str] = {}
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        ident = threading.get_ident()
+        with self._lock:
+            outer = self._threads.get(ident)
+            self._threads[ident] = name
+        try:
+            with super().track(name):
+                yield
+        finally:
+            with self._lock:
+                if outer is None:
+                    self._threads.pop(ident, None)
+                else:
+                    self._threads[ident] = outer
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        super().stop()
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()  # noqa
+            for ident, section in threads.items():
+                frame = frames.get(ident)
+                if frame is None or ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(section)
+                self._stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def result(self) -> bytes:
+        lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+        return ("\n".join(lines) + "\n").encode()
+
+
+class CProfileSession(ProfileSession):
+    """
+    Детерминированное профилирование секций через cProfile; статистика всех секций
+    объединяется в один файл pstats (python -m pstats, snakeviz).
+
+    Профилируется одна секция за раз (один профилировщик на интерпретатор), параллельные
+    секции выполняются без профилирования и учитываются в skipped.
+    """
+
+    mode = "cprofile"
+    extension = "pstats"
+
+    def __init__(self, max_requests: int = 0):
+        super().__init__(max_requests)
+        self.profiled = 0
+        self.skipped = 0
+        self._stats: Optional[pstats.Stats] = None
+        self._profiling = threading.Lock()
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        with super().track(name):
+            if not self._profiling.acquire(blocking=False):
+                with self._lock:
+                    self.skipped += 1
+                yield
+                return
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                with self._lock:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profile)
+                    else:
+                        self._stats.add(profile)
+                    self.profiled += 1
+            finally:
+                self._profiling.release()
+
+    def result(self) -> bytes:
+        # Тот же формат, что пишет pstats.Stats.dump_stats
+        return marshal.dumps(self._stats.stats if self._stats is not None else {})
+
+
+class TracemallocSession(ProfileSession):
+    """
+    Снимки tracemalloc на каждую секцию: разница живых аллокаций кода Upscaler и истории
+    до и после секции (по строкам) и пик трассируемой памяти за секцию.
+
+    tracemalloc глобален, поэтому при параллельных запросах в снимок секции попадают
+    и аллокации соседних запросов.
+    """
+
+    mode = "tracemalloc"
+    media_type = "application/json"
+    extension = "json"
+
+    def __init__(self, max_requests: int = 0, frames: int = 1, top: int = 10):
+        super().__init__(max_requests)
+        self.frames = frames
+        self.top = top
+        self.sections: List[Dict[str, Any]] = []
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+        super().stop()
+
+    @staticmethod
+    def _snapshot() -> Tuple[tracemalloc.Snapshot, int]:
+        tracemalloc.reset_peak()
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+        return snapshot, tracemalloc.get_traced_memory()[0]
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        if not tracemalloc.is_tracing():
+            yield
+            return
+
+        before, current_before = self._snapshot()
+        started_at = time.perf_counter()
+        try:
+            with super().track(name):
+                yield
+        finally:
+            if tracemalloc.is_tracing():
+                self._record(name, time.perf_counter() - started_at, before, current_before)
+
+    def _record(self, name: str, seconds: float, before: tracemalloc.Snapshot, current_before: int):
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+        differences = after.compare_to(before, "lineno")
+        with self._lock:
+            self.sections.append({
+                "section": name,
+                "seconds": round(seconds, 4),
+                "peak_bytes": max(0, peak - current_before),
+                "retained_bytes": sum(stat.size_diff for stat in differences),
+                "top": [
+                    {
+                        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_diff": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                        "size": stat.size,
+                    }
+                    for stat in differences[:self.top]
+                ],
+            })
+
+    def result(self) -> bytes:
+        return json.dumps({"requests": self.requests, "sections": self.sections}, indent=2).encode()
+
+
+SESSIONS = {
+    SamplingSession.mode: SamplingSession,
+    CProfileSession.mode: CProfileSession,
+    TracemallocSession.mode: TracemallocSession,
+}
+
+
+class Profiler:
+    """
+    Профилировщик процесса по запросу администратора.
+
+    Профилируемый код оборачивается в section(); пока сессии нет, это одна проверка
+    атрибута, так что выключенный профилировщик практически ничего не стоит.
+    Одновременно может идти только одна сессия.
+    """
+
+    def __init__(self):
+        self._session: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> Optional[ProfileSession]:
+        return self._session
+
+    def start(self, mode: str, max_requests: int = 0, **options: Any) -> ProfileSession:
+        """
+        Начинает сессию профилирования.
+
+        :param mode: 'sampling', 'cprofile' или 'tracemalloc'
+        :param max_requests: Сессия завершается после стольких запросов на увеличение (0 - без ограничения)
+        :raises RuntimeError: Если уже идёт другая сессия
+        """
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError(f"A {self._session.mode} profiling session is already running")
+            session = SESSIONS[mode](max_requests, **options)
+            session.start()
+            self._session = session
+        logger.info(f"Profiling session started: {mode}, max requests: {max_requests or 'unlimited'}")
+        return session
+
+    def stop(self) -> Optional[ProfileSession]:
+        """Завершает текущую сессию и возвращает её (с собранными данными)"""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.stop()
+            logger.info(f"Profiling session stopped after {session.seconds:.1f}s, {session.requests} requests")
+        return session
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        """Отмечает профилируемый участок кода ('upscale', 'history')"""
+        session = self._session
+        if session is None:
+            yield
+            return
+        with session.track(name):
+            yield
+
+    def profiled(self, name: str) -> Callable:
+        """Декоратор: вся функция - профилируемая секция name"""
+
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if self._session is None:
+                    return func(*args, **kwargs)
+                with self.section(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+profiler = Profiler()
@@ -1,17 +1,26 @@
 import json
 from datetime import datetime
-from typing import List, Dict, Any, cast
+from typing import List, Dict, Any, Optional, cast
 
 from fpdf import FPDF
 
 from src.server.config import Settings
+from src.server.utils.rollups import HistoryRollups, in_window, local_time, record_time
 
 
 class PDFReportGenerator:
-    def __init__(self, history_file: str = "request_history.json", settings: Settings = None):
+    def __init__(
+            self,
+            history_file: str = "request_history.json",
+            settings: Settings = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ):
         self.settings = settings or Settings()
 
         self.history_file = self.settings.APP_FILES_PATH / history_file
+        self.since = local_time(since)
+        self.until = local_time(until)
         self.max_line_width = 150  # Максимальная ширина строки в мм
         self.cell_height = 6  # Высота строки в мм
 
@@ -23,6 +32,15 @@ class PDFReportGenerator:
         with open(self.history_file, "r") as f:
             history = json.load(f)
 
+        if self.since is not None or self.until is not None:
+            history = [
+                record for record in history
+                if (moment := record_time(record)) is not None and in_window(moment, self.since, self.until)
+            ]
+
+        # Периоды старше срока хранения сырых записей есть только в агрегатах
+        rollups = HistoryRollups(settings=self.settings).load().window(self.since, self.until)
+
         pdf = FPDF()
         pdf.set_auto_page_break(auto=True, margin=15)
         pdf.add_page()
@@ -34,6 +52,9 @@ class PDFReportGenerator:
         self._add_title(pdf, "Request History Report")
         self._add_report_metadata(pdf)
 
+        if rollups:
+            self._add_rollups(pdf, rollups)
+
         for i, record in enumerate(history, 1):
             self._add_record(pdf, record, i)
             pdf.ln(10)
@@ -52,6 +73,39 @@ class PDFReportGenerator:
         pdf.set_font("Arial", size=10)
         pdf.cell(0, 6, f"Generated at: {datetime.now().isoformat()}", ln=1)
         pdf.cell(0, 6, f"Source file: {self.history_file}", ln=1)
+        if self.since is not None or self.until is not None:
+            since = self.since.isoformat() if self.since else "-"
+            until = self.until.isoformat() if self.until else "-"
+            pdf.cell(0, 6, f"Window: {since} .. {until}", ln=1)
+        pdf.ln(10)
+
+    def _add_rollups(self, pdf: FPDF, rollups: List[Dict[str, Any]]):
+        """Таблица агрегатов: период, число запросов, успешные, отменённые и среднее время обработки"""
+        pdf.set_font("Arial", style="B", size=12)
+        pdf.cell(0, 8, "Aggregated history", ln=1, fill=True)
+
+        columns = [("Period", 60), ("Requests", 30), ("Success", 30), ("Cancelled", 30), ("Avg time, s", 30)]
+        pdf.set_font("Arial", style="B", size=10)
+        for title, width in columns:
+            pdf.cell(width, self.cell_height, title, border=1)
+        pdf.ln(self.cell_height)
+
+        pdf.set_font("Arial", size=10)
+        for rollup in rollups:
+            models = rollup["models"].values()
+            duration_count = sum(model["duration_count"] for model in models)
+            avg_time = sum(model["duration_sum"] for model in models) / duration_count if duration_count else 0.0
+            row = [
+                f"{rollup['start']} ({rollup['period']})",
+                rollup["count"],
+                rollup["statuses"].get("success", 0),
+                rollup["statuses"].get("cancelled", 0),
+                f"{avg_time:.2f}",
+            ]
+            for value, (_, width) in zip(row, columns):
+                pdf.cell(width, self.cell_height, str(value), border=1)
+            pdf.ln(self.cell_height)
+
         pdf.ln(10)
 
     def _add_record(self, pdf: FPDF, record: Dict[str, Any], record_num: int):
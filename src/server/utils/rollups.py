@@ -0,0 +1,311 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator
+
+from src.server.config import Settings
+from src.server.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка действует только внутри процесса
+    fcntl = None
+
+_history_thread_lock = threading.Lock()
+
+# Верхние границы корзин гистограммы длительности запросов (секунды); последняя корзина - всё, что дольше
+DURATION_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+
+
+@contextmanager
+def history_lock(history_file: Path) -> Iterator[None]:
+    """
+    Защищает файл истории и агрегаты от одновременной записи запросами (RequestHistory)
+    и ротацией: между потоками процесса и, через flock на файле <history_file>.lock,
+    между процессами (pre-fork воркеры).
+    """
+    with _history_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(history_file.with_name(history_file.name + ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def full_model_name(upscaler_data: Dict) -> str:
+    """Возвращает полное имя модели (например, 'edsr_x2')"""
+    model_name = upscaler_data.get("model_name") or "unknown"
+    scale = upscaler_data.get("scale")
+
+    if scale is not None:
+        return f"{model_name}_x{scale}"
+    return model_name
+
+
+def empty_rollup() -> Dict[str, Any]:
+    """Пустой агрегат истории запросов"""
+    return {
+        "count": 0,
+        "statuses": {},
+        "duration_histogram": [0] * (len(DURATION_BUCKETS) + 1),
+        "models": {},
+        "scales": {},
+        "cache_hits": 0,
+        "tile_skip_ratio_sum": 0.0,
+        "tile_skip_ratio_count": 0,
+        "cancel_reasons": {},
+        "cancelled_seconds": 0.0,
+    }
+
+
+def empty_model(model_name: Optional[str]) -> Dict[str, Any]:
+    """Пустой агрегат одной версии модели"""
+    return {
+        "model_name": model_name,
+        "count": 0,
+        "duration_sum": 0.0,
+        "duration_count": 0,
+        "size_sum": 0.0,
+        "size_count": 0,
+    }
+
+
+def duration_bucket(duration: float) -> int:
+    """Индекс корзины гистограммы для длительности"""
+    for index, bound in enumerate(DURATION_BUCKETS):
+        if duration <= bound:
+            return index
+    return len(DURATION_BUCKETS)
+
+
+def add_record(rollup: Dict[str, Any], record: Dict[str, Any]):
+    """Добавляет запись истории в агрегат"""
+    rollup["count"] += 1
+    status = record.get("status", "unknown")
+    rollup["statuses"][status] = rollup["statuses"].get(status, 0) + 1
+
+    if status == "cancelled":
+        reason = record.get("cancel_reason", "unknown")
+        rollup["cancel_reasons"][reason] = rollup["cancel_reasons"].get(reason, 0) + 1
+        rollup["cancelled_seconds"] += record.get("duration_seconds") or 0.0
+
+    if status != "success":
+        return
+
+    upscaler = record.get("upscaler", {})
+    model_name = upscaler.get("model_name")
+    full_name = full_model_name(upscaler)
+    duration = record.get("duration_seconds")
+    size = record.get("image", {}).get("size")
+    cache_hit = bool(record.get("cache_hit"))
+
+    if cache_hit:
+        rollup["cache_hits"] += 1
+    elif duration is not None:
+        rollup["duration_histogram"][duration_bucket(duration)] += 1
+
+    if full_name != "unknown":
+        model = rollup["models"].setdefault(full_name, empty_model(model_name))
+        if model_name:
+            model["count"] += 1
+        # Результаты из хранилища не отражают время обработки моделью
+        if duration is not None and not cache_hit:
+            model["duration_sum"] += duration
+            model["duration_count"] += 1
+        if size is not None:
+            model["size_sum"] += size
+            model["size_count"] += 1
+
+    scale = upscaler.get("scale")
+    if scale is not None:
+        rollup["scales"][str(scale)] = rollup["scales"].get(str(scale), 0) + 1
+
+    tiles = record.get("tiles", {})
+    if "skipped_ratio" in tiles:
+        rollup["tile_skip_ratio_sum"] += tiles["skipped_ratio"]
+        rollup["tile_skip_ratio_count"] += 1
+
+
+def merge_rollups(target: Dict[str, Any], source: Dict[str, Any]):
+    """Добавляет агрегат source к агрегату target"""
+    for key in ("count", "cache_hits", "tile_skip_ratio_sum", "tile_skip_ratio_count", "cancelled_seconds"):
+        target[key] += source.get(key, 0)
+
+    for key in ("statuses", "scales", "cancel_reasons"):
+        for name, value in source.get(key, {}).items():
+            target[key][name] = target[key].get(name, 0) + value
+
+    for index, value in enumerate(source.get("duration_histogram", [])):
+        target["duration_histogram"][index] += value
+
+    for full_name, source_model in source.get("models", {}).items():
+        model = target["models"].setdefault(full_name, empty_model(source_model.get("model_name")))
+        for key in ("count", "duration_sum", "duration_count", "size_sum", "size_count"):
+            model[key] += source_model.get(key, 0)
+
+
+def record_time(record: Dict[str, Any]) -> Optional[datetime]:
+    """Время запроса из записи истории"""
+    try:
+        return datetime.fromisoformat(record["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def local_time(moment: Optional[datetime]) -> Optional[datetime]:
+    """Приводит время к локальному без часового пояса, как в записях истории"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def in_window(moment: datetime, since: Optional[datetime], until: Optional[datetime]) -> bool:
+    return (since is None or moment >= since) and (until is None or moment < until)
+
+
+class HistoryRollups:
+    """
+    Агрегаты истории запросов по часам и по дням.
+
+    Сырые записи старше HISTORY_RETENTION_DAYS сворачиваются в почасовые агрегаты,
+    а почасовые старше HISTORY_HOURLY_RETENTION_DAYS - в дневные. Каждая запись учитывается
+    ровно на одном уровне (сырые записи, часы или дни), поэтому уровни можно просто суммировать.
+    """
+
+    def __init__(self, rollups_file: str = "request_history_rollups.json", settings: Settings = None):
+        self.settings = settings or Settings()
+        self.rollups_file = self.settings.APP_FILES_PATH / rollups_file
+        self.hourly: Dict[str, Dict[str, Any]] = {}
+        self.daily: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> "HistoryRollups":
+        if self.rollups_file.exists():
+            with open(self.rollups_file, "r") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    logger.error(f"Rollups file {self.rollups_file} is corrupted, ignoring it")
+                    data = {}
+            self.hourly = data.get("hourly", {})
+            self.daily = data.get("daily", {})
+        return self
+
+    def save(self):
+        """Атомарно сохраняет агрегаты"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.rollups_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"hourly": self.hourly, "daily": self.daily}, f)
+            os.replace(tmp_path, self.rollups_file)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def window(self, since: Optional[datetime], until: Optional[datetime]) -> List[Dict[str, Any]]:
+        """
+        Агрегаты, начало периода которых попадает в окно [since, until).
+
+        :return: Список агрегатов с полями 'period' ('hour'/'day') и 'start'
+        """
+        result = []
+        for period, buckets in (("day", self.daily), ("hour", self.hourly)):
+            for start, rollup in sorted(buckets.items()):
+                if in_window(datetime.fromisoformat(start), since, until):
+                    result.append({"period": period, "start": start, **rollup})
+        return result
+
+    def add_records(self, records: List[Dict[str, Any]]):
+        """Сворачивает сырые записи в почасовые агрегаты"""
+        for record in records:
+            moment = record_time(record)
+            if moment is None:
+                continue
+            start = moment.replace(minute=0, second=0, microsecond=0).isoformat()
+            add_record(self.hourly.setdefault(start, empty_rollup()), record)
+
+    def compact_hourly(self, cutoff: datetime) -> int:
+        """Сворачивает почасовые агрегаты старше cutoff в дневные; возвращает их количество"""
+        compacted = 0
+        for start in sorted(self.hourly):
+            moment = datetime.fromisoformat(start)
+            if moment >= cutoff:
+                continue
+            day = moment.replace(hour=0).isoformat()
+            merge_rollups(self.daily.setdefault(day, empty_rollup()), self.hourly.pop(start))
+            compacted += 1
+        return compacted
+
+
+class HistoryRotator:
+    """Ротация истории запросов: перенос старых сырых записей в агрегаты."""
+
+    def __init__(self, history_file: str = "request_history.json", settings: Settings = None):
+        self.settings = settings or Settings()
+        self.history_file = self.settings.APP_FILES_PATH / history_file
+
+    def rotate(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Переносит записи старше HISTORY_RETENTION_DAYS в почасовые агрегаты и сворачивает
+        почасовые агрегаты старше HISTORY_HOURLY_RETENTION_DAYS в дневные.
+
+        :return: Статистика ротации
+        """
+        now = now or datetime.now()
+        raw_cutoff = now - timedelta(days=self.settings.HISTORY_RETENTION_DAYS)
+        hourly_cutoff = now - timedelta(days=self.settings.HISTORY_HOURLY_RETENTION_DAYS)
+
+        with history_lock(self.history_file):
+            if not self.history_file.exists():
+                return {"rotated": 0, "compacted": 0}
+
+            with open(self.history_file, "r") as f:
+                try:
+                    history = json.load(f)
+                except json.JSONDecodeError:
+                    logger.error(f"History file {self.history_file} is corrupted, skipping rotation")
+                    return {"rotated": 0, "compacted": 0}
+
+            expired, kept = [], []
+            for record in history:
+                moment = record_time(record)
+                (expired if moment is not None and moment < raw_cutoff else kept).append(record)
+
+            rollups = HistoryRollups(settings=self.settings).load()
+            rollups.add_records(expired)
+            compacted = rollups.compact_hourly(hourly_cutoff)
+
+            if not expired and not compacted:
+                return {"rotated": 0, "compacted": 0}
+
+            # Сначала агрегаты, затем усечённая история: при сбое между шагами записи
+            # будут учтены дважды, но не потеряются
+            rollups.save()
+            fd, tmp_path = tempfile.mkstemp(dir=self.history_file.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(kept, f, indent=2)
+                os.replace(tmp_path, self.history_file)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+        logger.info(f"History rotated: {len(expired)} records rolled up, {compacted} hourly rollups compacted")
+        return {"rotated": len(expired), "compacted": compacted}
+
+    async def run(self, interval_seconds: float):
+        """Фоновая задача: периодическая ротация истории"""
+        while True:
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, self.rotate)
+            except Exception as e:
+                logger.error(f"History rotation failed: {str(e)}")
+            await asyncio.sleep(interval_seconds)
@@ -1,160 +1,138 @@
 import json
-from collections import defaultdict
-from typing import List, Dict
+from datetime import datetime
+from typing import Dict, Any, Optional
 
 from src.server.config import Settings
+from src.server.utils.columns import history_columns
+from src.server.utils.rollups import DURATION_BUCKETS, HistoryRollups, local_time, merge_rollups
 
 
 class RequestStatistics:
-    def __init__(self, history_file: str = "request_history.json", settings: Settings = None):
+    """
+    Статистика запросов за окно [since, until).
+
+    Сырые записи истории (кэшированные столбцы NumPy, utils.columns) и агрегаты (utils.rollups)
+    сводятся в один агрегат, из которого считаются все метрики, поэтому старые периоды
+    учитываются без хранения сырых записей.
+    """
+
+    def __init__(
+            self,
+            history_file: str = "request_history.json",
+            settings: Settings = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ):
         self.settings = settings or Settings()
         self.history_file = self.settings.APP_FILES_PATH / history_file
-        self.history_data = self._load_history()
-
-    def _load_history(self) -> List[Dict]:
-        """Загружает историю запросов из файла"""
-        if not self.history_file.exists():
-            return []
-
-        with open(self.history_file, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return []
-
-    def _get_full_model_name(self, upscaler_data: Dict) -> str:
-        """Возвращает полное имя модели (например, 'edsr_x2')"""
-        model_name = upscaler_data.get("model_name", "unknown")
-        scale = upscaler_data.get("scale")
-
-        if scale is not None:
-            return f"{model_name}_x{scale}"
-        return model_name
+        self.since = local_time(since)
+        self.until = local_time(until)
+        self.columns = history_columns.get(self.history_file)
+        self.rollups = HistoryRollups(settings=self.settings).load().window(self.since, self.until)
+        self.aggregate = self._aggregate()
+
+    def _aggregate(self) -> Dict[str, Any]:
+        """Сводит сырые записи и агрегаты окна в один агрегат"""
+        aggregate = self.columns.rollup(self.columns.mask(self.since, self.until))
+        for rollup in self.rollups:
+            merge_rollups(aggregate, rollup)
+        return aggregate
 
     def get_model_usage_stats(self) -> Dict[str, Dict[str, float]]:
         """Возвращает статистику использования моделей с детализацией по версиям"""
-        if not self.history_data:
-            return {}
-
-        # Словарь: тип модели -> версия модели -> количество
-        model_stats = defaultdict(lambda: defaultdict(int))
-        total_requests = 0
-
-        for record in self.history_data:
-            if record.get("status") != "success":
-                continue
-
-            upscaler = record.get("upscaler", {})
-            model_name = upscaler.get("model_name")
-            if model_name:
-                full_name = self._get_full_model_name(upscaler)
-                model_stats[model_name][full_name] += 1
-                total_requests += 1
-
+        models = self.aggregate["models"]
+        total_requests = sum(model["count"] for model in models.values() if model["model_name"])
         if total_requests == 0:
             return {}
 
         # Преобразуем в проценты
-        result = {}
-        for model_type, versions in model_stats.items():
-            result[model_type] = {
-                version: (count / total_requests) * 100
-                for version, count in versions.items()
-            }
+        result: Dict[str, Dict[str, float]] = {}
+        for full_name, model in models.items():
+            if model["model_name"] and model["count"]:
+                result.setdefault(model["model_name"], {})[full_name] = (model["count"] / total_requests) * 100
 
         return result
 
     def get_average_processing_time(self) -> Dict[str, float]:
         """Возвращает среднее время обработки для каждой версии модели"""
-        if not self.history_data:
-            return {}
-
-        # Словарь: полное имя модели -> список времен обработки
-        model_times = defaultdict(list)
-
-        for record in self.history_data:
-            if record.get("status") != "success":
-                continue
-
-            upscaler = record.get("upscaler", {})
-            full_name = self._get_full_model_name(upscaler)
-            duration = record.get("duration_seconds")
-
-            if full_name != "unknown" and duration is not None:
-                model_times[full_name].append(duration)
-
         return {
-            model: sum(times) / len(times)
-            for model, times in model_times.items()
+            full_name: model["duration_sum"] / model["duration_count"]
+            for full_name, model in self.aggregate["models"].items()
+            if model["duration_count"]
         }
 
     def get_average_file_size(self) -> Dict[str, float]:
         """Возвращает средний размер файлов для каждой версии модели"""
-        if not self.history_data:
-            return {}
-
-        # Словарь: полное имя модели -> список размеров
-        model_sizes = defaultdict(list)
-
-        for record in self.history_data:
-            if record.get("status") != "success":
-                continue
-
-            upscaler = record.get("upscaler", {})
-            full_name = self._get_full_model_name(upscaler)
-            image = record.get("image", {})
-            size = image.get("size")
-
-            if full_name != "unknown" and size is not None:
-                model_sizes[full_name].append(size)
-
         return {
-            model: (sum(sizes) / len(sizes))
-            for model, sizes in model_sizes.items()
+            full_name: model["size_sum"] / model["size_count"]
+            for full_name, model in self.aggregate["models"].items()
+            if model["size_count"]
         }
 
     def get_success_rate(self) -> float:
         """Возвращает процент успешных запросов"""
-        if not self.history_data:
-            return 0.0
-
-        total = len(self.history_data)
-        success = sum(1 for r in self.history_data if r.get("status") == "success")
+        total = self.aggregate["count"]
+        success = self.aggregate["statuses"].get("success", 0)
 
         return (success / total) * 100 if total > 0 else 0.0
 
     def get_scale_factors_stats(self) -> Dict[int, float]:
         """Возвращает статистику по коэффициентам масштабирования"""
-        if not self.history_data:
-            return {}
+        scales = self.aggregate["scales"]
+        total = sum(scales.values())
 
-        scale_counts = defaultdict(int)
-        total = 0
-
-        for record in self.history_data:
-            if record.get("status") != "success":
-                continue
+        return {
+            int(scale): (count / total) * 100
+            for scale, count in scales.items()
+        }
 
-            upscaler = record.get("upscaler", {})
-            scale = upscaler.get("scale")
+    def get_tile_skip_ratio(self) -> float:
+        """Возвращает среднюю долю тайлов, увеличенных интерполяцией вместо сети (в процентах)"""
+        count = self.aggregate["tile_skip_ratio_count"]
+        return (self.aggregate["tile_skip_ratio_sum"] / count) * 100 if count else 0.0
 
-            if scale is not None:
-                scale_counts[scale] += 1
-                total += 1
+    def get_cancellation_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику отменённых запросов и потраченного на них времени"""
+        cancelled = self.aggregate["statuses"].get("cancelled", 0)
+        total = self.aggregate["count"]
 
         return {
-            scale: (count / total) * 100
-            for scale, count in scale_counts.items()
+            "cancelled": cancelled,
+            "cancel_rate": (cancelled / total) * 100 if total > 0 else 0.0,
+            "reasons": dict(self.aggregate["cancel_reasons"]),
+            "wasted_seconds": self.aggregate["cancelled_seconds"],
         }
 
+    def get_cache_hit_rate(self) -> float:
+        """Возвращает процент успешных запросов, обслуженных из хранилища результатов"""
+        successful = self.aggregate["statuses"].get("success", 0)
+        if not successful:
+            return 0.0
+
+        return (self.aggregate["cache_hits"] / successful) * 100
+
+    def get_duration_histogram(self) -> Dict[str, int]:
+        """Возвращает распределение времени обработки успешных запросов по корзинам (верхняя граница в секундах)"""
+        labels = [f"<={bound}" for bound in DURATION_BUCKETS] + [f">{DURATION_BUCKETS[-1]}"]
+        return dict(zip(labels, self.aggregate["duration_histogram"]))
+
     def get_all_stats(self) -> Dict[str, Dict]:
         """Возвращает всю статистику в одном словаре"""
         return {
+            "window": {
+                "since": self.since.isoformat() if self.since else None,
+                "until": self.until.isoformat() if self.until else None,
+                "requests": self.aggregate["count"],
+            },
             "model_usage": self.get_model_usage_stats(),
             "avg_processing_time": self.get_average_processing_time(),
             "avg_file_size": self.get_average_file_size(),
             "success_rate": self.get_success_rate(),
             "scale_factors": self.get_scale_factors_stats(),
+            "tile_skip_ratio": self.get_tile_skip_ratio(),
+            "cancellations": self.get_cancellation_stats(),
+            "cache_hit_rate": self.get_cache_hit_rate(),
+            "duration_histogram": self.get_duration_histogram(),
         }
 
 
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, BinaryIO
+
+from src.server.config import Settings
+from src.server.logger import logger
+
+
+class ResultStorage:
+    """
+    Хранилище результатов увеличения в APP_FILES_PATH/results.
+
+    Результаты адресуются sha256 своего содержимого (он же ETag), а индекс связывает
+    ключ запроса (хэш входа и параметров) с результатом, чтобы повторный запрос того же
+    изображения не запускал инференс заново.
+    """
+
+    def __init__(self, settings: Settings = None):
+        self.settings = settings or Settings()
+        self.results_dir = self.settings.APP_FILES_PATH / "results"
+        self.index_dir = self.results_dir / "index"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def request_key(image_bytes: bytes, params: Dict[str, Any]) -> str:
+        """Ключ запроса: sha256 входного изображения и всех параметров, влияющих на результат"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_valid_digest(digest: str) -> bool:
+        return len(digest) == 64 and all(char in "0123456789abcdef" for char in digest)
+
+    def path(self, digest: str) -> Path:
+        """Путь к файлу результата (PNG) по его хэшу"""
+        return self.results_dir / digest[:2] / f"{digest}.png"
+
+    def get(self, digest: str, touch: bool = False) -> Optional[Path]:
+        """
+        Возвращает путь к результату, если он есть в хранилище.
+
+        :param touch: Обновить время доступа (mtime), продлевая срок хранения результата
+        """
+        if not self.is_valid_digest(digest):
+            return None
+        path = self.path(digest)
+        if not touch:
+            return path if path.exists() else None
+
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def open(self, digest: str, touch: bool = False) -> Optional[BinaryIO]:
+        """
+        Открывает результат на чтение. Открытый файл остаётся читаемым, даже если очистка
+        хранилища удалит его до конца отправки клиенту.
+
+        :param touch: Обновить время доступа (mtime), продлевая срок хранения результата
+        :return: Файл, который закрывает вызывающий, или None, если результата нет
+        """
+        if not self.is_valid_digest(digest):
+            return None
+        try:
+            file = open(self.path(digest), "rb")
+        except FileNotFoundError:
+            return None
+
+        if touch:
+            now = time.time()
+            os.utime(file.fileno(), (now, now))
+        return file
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Находит хэш результата по ключу запроса (и продлевает срок хранения результата)"""
+        index_path = self.index_dir / key
+        try:
+            digest = index_path.read_text().strip()
+        except OSError:
+            return None
+
+        if self.get(digest, touch=True) is None:
+            return None
+        return digest
+
+    def put(self, key: str, data: bytes) -> str:
+        """Сохраняет результат (атомарно) и связывает его с ключом запроса"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(path, data)
+        self._write_atomic(self.index_dir / key, digest.encode())
+        logger.debug(f"Stored result {digest} ({len(data)} bytes) for request {key}")
+        return digest
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def cleanup(self, max_age_seconds: float, max_bytes: int) -> Dict[str, int]:
+        """
+        Применяет ограничения хранения: удаляет результаты старше max_age_seconds, затем
+        самые старые результаты, пока суммарный размер не станет не больше max_bytes,
+        и записи индекса, указывающие на удалённые результаты.
+
+        :return: Статистика очистки
+        """
+        now = time.time()
+        files = []
+        removed = removed_bytes = 0
+
+        for path in self.results_dir.glob("??/*.png"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if max_age_seconds > 0 and now - stat.st_mtime > max_age_seconds:
+                path.unlink(missing_ok=True)
+                removed += 1
+                removed_bytes += stat.st_size
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in files)
+        if max_bytes > 0 and total_bytes > max_bytes:
+            for _, size, path in sorted(files, key=lambda item: item[0]):
+                if total_bytes <= max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total_bytes -= size
+                removed += 1
+                removed_bytes += size
+
+        stale_index = 0
+        for index_path in self.index_dir.iterdir():
+            if index_path.suffix == ".tmp":
+                continue
+            try:
+                digest = index_path.read_text().strip()
+            except OSError:
+                continue
+            if self.get(digest) is None:
+                index_path.unlink(missing_ok=True)
+                stale_index += 1
+
+        stats = {
+            "removed": removed,
+            "removed_bytes": removed_bytes,
+            "stale_index": stale_index,
+            "total_bytes": total_bytes,
+        }
+        if removed or stale_index:
+            logger.info(f"Result storage cleanup: {stats}")
+        return stats
+
+    async def run_janitor(self, interval_seconds: float):
+        """Фоновая задача: периодически применяет ограничения хранения из настроек"""
+        while True:
+            try:
+                await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    self.cleanup,
+                    self.settings.RESULTS_MAX_AGE_SECONDS,
+                    self.settings.RESULTS_MAX_BYTES,
+                )
+            except Exception as e:
+                logger.error(f"Result storage cleanup failed: {str(e)}")
+            await asyncio.sleep(interval_seconds)
@@ -0,0 +1,135 @@
+"""
+Contract tests for JobBroker backends.
+
+A backend's test module subclasses JobBrokerContract and provides the make_broker fixture:
+a factory returning a fresh, empty broker for the given max_attempts.
+"""
+import time
+
+from src.server.broker.base import CANCELLED, DONE, FAILED, PENDING, RUNNING
+
+LEASE = 60.0
+SHORT_LEASE = 0.05
+
+
+class JobBrokerContract:
+    def test_enqueue_and_claim_in_order(self, make_broker):
+        broker = make_broker()
+        first = broker.enqueue(b"first", {"model": "EDSR_x2"})
+        second = broker.enqueue(b"second", {"model": "EDSR_x4"})
+
+        task = broker.claim("worker-1", LEASE)
+        assert (task.id, task.payload, task.params) == (first, b"first", {"model": "EDSR_x2"})
+        assert (task.status, task.attempts, task.worker_id) == (RUNNING, 1, "worker-1")
+        assert broker.claim("worker-2", LEASE).id == second
+        assert broker.claim("worker-3", LEASE) is None
+
+    def test_complete_stores_result(self, make_broker):
+        broker = make_broker()
+        task_id = broker.enqueue(b"image", {})
+        broker.claim("worker-1", LEASE)
+
+        assert broker.complete(task_id, "worker-1", b"result", {"tiles": 4})
+        task = broker.get(task_id)
+        assert (task.status, task.result, task.details) == (DONE, b"result", {"tiles": 4})
+        assert task.payload is None
+
+        broker.remove(task_id)
+        assert broker.get(task_id) is None
+
+    def test_heartbeat_extends_lease(self, make_broker):
+        broker = make_broker()
+        task_id = broker.enqueue(b"image", {})
+        broker.claim("worker-1", SHORT_LEASE)
+
+        assert broker.heartbeat(task_id, "worker-1", LEASE)
+        time.sleep(SHORT_LEASE * 2)
+        assert broker.claim("worker-2", LEASE) is None
+        # Only the lease holder can extend it
+        assert not broker.heartbeat(task_id, "worker-2", LEASE)
+
+    def test_expired_lease_is_redelivered(self, make_broker):
+        broker = make_broker()
+        task_id = broker.enqueue(b"image", {})
+        broker.claim("worker-1", SHORT_LEASE)
+        time.sleep(SHORT_LEASE * 2)
+
+        task = broker.claim("worker-2", LEASE)
+        assert (task.id, task.attempts, task.payload) == (task_id, 2, b"image")
+        # The first worker lost its lease: its heartbeat and result are rejected
+        assert not broker.heartbeat(task_id, "worker-1", LEASE)
+        assert not broker.complete(task_id, "worker-1", b"stale", {})
+        assert broker.complete(task_id, "worker-2", b"result", {})
+        assert broker.get(task_id).result == b"result"
+
+    def test_expired_lease_fails_after_max_attempts(self, make_broker):
+        broker = make_broker(max_attempts=2)
+        task_id = broker.enqueue(b"image", {})
+        for worker_id in ("worker-1", "worker-2"):
+            assert broker.claim(worker_id, SHORT_LEASE).id == task_id
+            time.sleep(SHORT_LEASE * 2)
+
+        assert broker.claim("worker-3", LEASE) is None
+        assert broker.get(task_id).status == FAILED
+
+    def test_fail_retries_until_max_attempts(self, make_broker):
+        broker = make_broker(max_attempts=2)
+        task_id = broker.enqueue(b"image", {})
+
+        broker.claim("worker-1", LEASE)
+        broker.fail(task_id, "worker-1", "out of memory")
+        assert broker.get(task_id).status == PENDING
+
+        broker.claim("worker-2", LEASE)
+        broker.fail(task_id, "worker-2", "out of memory")
+        task = broker.get(task_id)
+        assert (task.status, task.error, task.attempts) == (FAILED, "out of memory", 2)
+        assert broker.claim("worker-3", LEASE) is None
+
+    def test_cancel_pending_and_running_tasks(self, make_broker):
+        broker = make_broker()
+        running = broker.enqueue(b"running", {})
+        pending = broker.enqueue(b"pending", {})
+        broker.claim("worker-1", LEASE)
+
+        broker.cancel(running)
+        broker.cancel(pending)
+        assert broker.get(running).status == CANCELLED
+        assert broker.get(pending).status == CANCELLED
+        assert broker.claim("worker-2", LEASE) is None
+        # The worker learns about the cancellation from its heartbeat, and its result is dropped
+        assert not broker.heartbeat(running, "worker-1", LEASE)
+        assert not broker.complete(running, "worker-1", b"result", {})
+
+    def test_cancel_keeps_finished_tasks(self, make_broker):
+        broker = make_broker()
+        task_id = broker.enqueue(b"image", {})
+        broker.claim("worker-1", LEASE)
+        broker.complete(task_id, "worker-1", b"result", {})
+
+        broker.cancel(task_id)
+        assert broker.get(task_id).status == DONE
+
+    def test_cleanup_removes_only_finished_tasks(self, make_broker):
+        broker = make_broker()
+        done = broker.enqueue(b"done", {})
+        broker.claim("worker-1", LEASE)
+        broker.complete(done, "worker-1", b"result", {})
+        pending = broker.enqueue(b"pending", {})
+
+        assert broker.cleanup(max_age_seconds=-1) == 1
+        assert broker.get(done) is None
+        assert broker.get(pending) is not None
+
+    def test_stats(self, make_broker):
+        broker = make_broker()
+        broker.register_worker("worker-1", concurrency=2)
+        task_id = broker.enqueue(b"image", {})
+        broker.enqueue(b"image", {})
+        broker.claim("worker-1", LEASE)
+        broker.complete(task_id, "worker-1", b"result", {})
+
+        stats = broker.queue_stats()
+        assert (stats[PENDING], stats[RUNNING], stats[DONE]) == (1, 0, 1)
+        [worker] = broker.worker_stats()
+        assert (worker["worker_id"], worker["concurrency"], worker["completed"]) == ("worker-1", 2, 1)
@@ -0,0 +1,22 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Settings are read from the environment when the server modules are imported, so the
+# required ones are set before the tests import anything from src.server
+_ROOT = Path(__file__).resolve().parent.parent
+_APP_FILES = Path(tempfile.mkdtemp(prefix="upscaler-tests-"))
+shutil.copy(_ROOT / "logger.ini", _APP_FILES / "logger.ini")
+
+for name, value in {
+    "APP_FILES_PATH": str(_APP_FILES),
+    "MODELS_PATH": str(_APP_FILES / "models"),
+    "TITLE": "AI Upscaler",
+    "DESCRIPTION": "",
+    "SUMMARY": "",
+    "VERSION": "test",
+    "CONTACT": "{}",
+    "LICENSE_INFO": "{}",
+}.items():
+    os.environ.setdefault(name, value)
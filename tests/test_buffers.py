@@ -0,0 +1,59 @@
+import numpy as np
+
+from src.server.upscaler.buffers import BufferPool, size_class
+
+
+def test_size_class_rounds_up_by_at_most_a_quarter():
+    assert size_class(1) == 64 * 1024
+    assert size_class(64 * 1024) == 64 * 1024
+    assert size_class(1 << 20) == 1 << 20
+    assert size_class((1 << 20) + 1) == (1 << 20) + (1 << 18)
+
+    for nbytes in (100_000, 1_234_567, 3 * 1024 ** 2 + 17, 99_999_999):
+        size = size_class(nbytes)
+        assert nbytes <= size <= nbytes * 1.25
+        # Sizes of one class share a buffer
+        assert size_class(size) == size
+
+
+def test_released_buffer_is_reused_for_same_class():
+    pool = BufferPool(max_cached_bytes=1 << 30)
+    first = pool.acquire((300, 400, 3))
+    first[:] = 7
+    pool.release(first)
+
+    # A slightly different shape of the same size class reuses the buffer
+    second = pool.acquire((301, 399, 3))
+    assert np.shares_memory(first, second)
+    assert second.shape == (301, 399, 3) and second.dtype == np.uint8
+
+    third = pool.acquire((300, 400, 3))
+    assert not np.shares_memory(second, third)
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 2
+
+
+def test_release_ignores_foreign_and_repeated_arrays():
+    pool = BufferPool(max_cached_bytes=1 << 30)
+    pool.release(np.zeros((10, 10), dtype=np.uint8))
+
+    array = pool.acquire((100, 100), np.float32)
+    pool.release(array[10:20])
+    pool.release(array)
+    assert pool.stats()["cached_bytes"] == size_class(100 * 100 * 4)
+
+
+def test_cached_bytes_are_limited():
+    size = size_class(200_000)
+    pool = BufferPool(max_cached_bytes=size)
+    arrays = [pool.acquire((200_000,)) for _ in range(2)]
+    for array in arrays:
+        pool.release(array)
+
+    stats = pool.stats()
+    assert stats["cached_bytes"] == size
+    assert stats["dropped"] == 1
+
+    with pool.borrow((200_000,)) as borrowed:
+        assert pool.stats()["cached_bytes"] == 0
+    assert np.shares_memory(borrowed, pool.acquire((200_000,)))
@@ -0,0 +1,106 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.server.utils.columns import HistoryColumnsCache
+from src.server.utils.rollups import add_record, empty_rollup
+
+START = datetime(2026, 3, 10, 12, 0)
+
+
+def _records() -> list:
+    rng = np.random.default_rng(0)
+    records = []
+    for index in range(200):
+        scale = (2, 4)[index % 2]
+        records.append({
+            "timestamp": (START + timedelta(minutes=index)).isoformat(),
+            "status": "error" if index % 10 == 0 else "success",
+            "duration_seconds": float(rng.uniform(0.1, 5.0)),
+            "upscaler": {"model_name": "edsr", "scale": scale},
+            "image": {"size": 1000 + index},
+            "scheduler": {"tenant": f"ip:{index % 3}", "priority": "batch", "queue_wait_seconds": index / 100},
+        })
+    # A record without a timestamp and a duration, and a cancelled one without a model
+    records.append({"status": "success", "upscaler": {"model_name": "edsr", "scale": 2}})
+    records.append({"timestamp": START.isoformat(), "status": "cancelled", "cancel_reason": "deadline exceeded"})
+    return records
+
+
+@pytest.fixture
+def columns(tmp_path):
+    history_file = tmp_path / "request_history.json"
+    history_file.write_text(json.dumps(_records()))
+    return HistoryColumnsCache().get(history_file)
+
+
+def test_query_percentiles_match_numpy(columns):
+    rows = columns.query(
+        group_by=["model"], metric="duration", aggregations=["count", "mean", "min", "max", "p50", "p95"],
+    )
+
+    records = _records()
+    by_model = {row["model"]: row for row in rows}
+    assert sorted(by_model) == ["edsr_x2", "edsr_x4", "unknown"]
+    # The cancelled record has no model and no duration
+    assert by_model["unknown"]["count"] == 1 and by_model["unknown"]["mean"] is None
+
+    for scale in (2, 4):
+        row = by_model[f"edsr_x{scale}"]
+        durations = [
+            record["duration_seconds"] for record in records
+            if record.get("upscaler", {}).get("scale") == scale and "duration_seconds" in record
+        ]
+        assert row["count"] == sum(1 for record in records if record.get("upscaler", {}).get("scale") == scale)
+        assert row["mean"] == pytest.approx(np.mean(durations))
+        assert row["min"] == pytest.approx(min(durations))
+        assert row["max"] == pytest.approx(max(durations))
+        assert row["p50"] == pytest.approx(np.percentile(durations, 50))
+        assert row["p95"] == pytest.approx(np.percentile(durations, 95))
+
+
+def test_query_groups_by_several_fields_and_time(columns):
+    rows = columns.query(
+        group_by=["tenant", "time"], metric="queue_wait", aggregations=["count", "sum"], bucket="hour",
+    )
+
+    assert {row["tenant"] for row in rows} == {"ip:0", "ip:1", "ip:2", "unknown"}
+    assert {row["time"] for row in rows} >= {START.isoformat(), (START + timedelta(hours=3)).isoformat()}
+    # Records without a timestamp can't be grouped by time
+    assert sum(row["count"] for row in rows) == 201
+    assert sum(row["sum"] or 0 for row in rows) == pytest.approx(sum(index / 100 for index in range(200)))
+
+
+def test_query_time_window(columns):
+    since, until = START + timedelta(minutes=60), START + timedelta(minutes=120)
+    rows = columns.query(metric="size", aggregations=["count", "min", "max"], since=since, until=until)
+
+    assert rows == [{"count": 60, "min": 1060.0, "max": 1119.0}]
+
+
+def test_query_rejects_unknown_parameters(columns):
+    with pytest.raises(ValueError):
+        columns.query(group_by=["color"])
+    with pytest.raises(ValueError):
+        columns.query(metric="weight")
+    with pytest.raises(ValueError):
+        columns.query(aggregations=["p101"])
+
+
+def test_rollup_matches_record_by_record_rollup(columns):
+    expected = empty_rollup()
+    for record in _records():
+        add_record(expected, record)
+
+    rollup = columns.rollup(columns.mask())
+    assert rollup["count"] == expected["count"]
+    assert rollup["statuses"] == expected["statuses"]
+    assert rollup["scales"] == expected["scales"]
+    assert rollup["cancel_reasons"] == expected["cancel_reasons"]
+    assert rollup["duration_histogram"] == expected["duration_histogram"]
+    assert rollup["models"].keys() == expected["models"].keys()
+    for name, model in expected["models"].items():
+        assert rollup["models"][name]["duration_sum"] == pytest.approx(model["duration_sum"])
+        assert rollup["models"][name]["size_count"] == model["size_count"]
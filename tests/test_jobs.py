@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.server.config import Settings
+from src.server.utils.jobs import JobManager, JobLimitExceeded
+
+
+def _manager(tmp_path, **overrides) -> JobManager:
+    return JobManager(Settings().model_copy(update={"APP_FILES_PATH": tmp_path, **overrides}))
+
+
+def test_create_limits_unfinished_jobs_per_tenant(tmp_path):
+    manager = _manager(tmp_path, JOBS_MAX_PER_TENANT=2)
+    first = manager.create("video", tenant="ip:1")
+    manager.create("video", tenant="ip:1")
+
+    with pytest.raises(JobLimitExceeded):
+        manager.create("video", tenant="ip:1")
+
+    # Other tenants have their own limit, finished jobs don't count
+    manager.create("video", tenant="ip:2")
+    first.status = "done"
+    manager.create("video", tenant="ip:1")
+
+
+def test_cancel_stops_running_job(tmp_path):
+    manager = _manager(tmp_path)
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.cancel_token.raise_if_cancelled()
+
+    async def scenario():
+        job = manager.submit(manager.create("video", tenant="ip:1"), work)
+        await asyncio.get_event_loop().run_in_executor(None, started.wait)
+        manager.cancel(job)
+        await asyncio.gather(*manager._tasks)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "cancelled"
+    assert job.finished
+    assert job.error == "cancelled by the client"
@@ -0,0 +1,63 @@
+import os
+
+from src.server.utils.manifest import UpscaleManifest
+
+PARAMS = {"precision": "fp32", "tile_size": 0}
+
+
+def _done(manifest, key, source, output, params=PARAMS):
+    fingerprint = manifest.is_up_to_date(key, source, "EDSR_x2", "png", params)
+    assert fingerprint is not None
+    output.write_bytes(b"result")
+    manifest.mark_done(key, fingerprint, "EDSR_x2", "png", params, output)
+
+
+def test_processed_file_is_skipped_after_reload(tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"image")
+    manifest = UpscaleManifest(tmp_path / "manifest.json")
+    _done(manifest, "a.jpg", source, tmp_path / "a.jpg.png")
+    manifest.save()
+
+    reloaded = UpscaleManifest(tmp_path / "manifest.json")
+    assert reloaded.is_up_to_date("a.jpg", source, "EDSR_x2", "png", PARAMS) is None
+
+
+def test_changed_content_or_settings_are_reprocessed(tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"image")
+    manifest = UpscaleManifest(tmp_path / "manifest.json")
+    _done(manifest, "a.jpg", source, tmp_path / "a.jpg.png")
+
+    assert manifest.is_up_to_date("a.jpg", source, "EDSR_x4", "png", PARAMS) is not None
+    assert manifest.is_up_to_date("a.jpg", source, "EDSR_x2", "jpg", PARAMS) is not None
+    assert manifest.is_up_to_date("a.jpg", source, "EDSR_x2", "png", {**PARAMS, "precision": "int8"}) is not None
+
+    source.write_bytes(b"other image")
+    assert manifest.is_up_to_date("a.jpg", source, "EDSR_x2", "png", PARAMS) is not None
+
+
+def test_touched_file_with_same_content_is_skipped(tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"image")
+    manifest = UpscaleManifest(tmp_path / "manifest.json")
+    _done(manifest, "a.jpg", source, tmp_path / "a.jpg.png")
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.is_up_to_date("a.jpg", source, "EDSR_x2", "png", PARAMS) is None
+
+
+def test_missing_output_is_reprocessed(tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"image")
+    manifest = UpscaleManifest(tmp_path / "manifest.json")
+    _done(manifest, "a.jpg", source, tmp_path / "a.jpg.png")
+
+    (tmp_path / "a.jpg.png").unlink()
+    assert manifest.is_up_to_date("a.jpg", source, "EDSR_x2", "png", PARAMS) is not None
+
+
+def test_corrupted_manifest_starts_from_scratch(tmp_path):
+    (tmp_path / "manifest.json").write_text("{not json")
+    assert UpscaleManifest(tmp_path / "manifest.json").entries == {}
@@ -0,0 +1,46 @@
+import pytest
+
+from src.server.enums.models import ModelEnum
+from src.server.upscaler.planning import ResizePlan, plan_output_size, resolve_target_size
+
+MODELS = [ModelEnum.EDSR_x2, ModelEnum.EDSR_x3, ModelEnum.EDSR_x4]
+
+
+def test_resolve_target_size_keeps_aspect_ratio():
+    assert resolve_target_size((400, 300), 800, None) == (800, 600)
+    assert resolve_target_size((400, 300), None, 150) == (200, 150)
+    assert resolve_target_size((400, 300), 500, 500) == (500, 500)
+    # A side never rounds down to zero
+    assert resolve_target_size((1000, 1), 10, None) == (10, 1)
+
+
+def test_resolve_target_size_requires_a_side():
+    with pytest.raises(ValueError):
+        resolve_target_size((400, 300), None, None)
+
+
+def test_plan_without_upscaling_uses_interpolation():
+    assert plan_output_size((400, 300), (400, 300), MODELS) == ResizePlan(None, None, (400, 300))
+    assert plan_output_size((400, 300), (200, 150), MODELS) == ResizePlan(None, None, (200, 150))
+
+
+def test_plan_picks_smallest_sufficient_scale():
+    assert plan_output_size((100, 100), (200, 200), MODELS) == ResizePlan(ModelEnum.EDSR_x2, None, (200, 200))
+    assert plan_output_size((100, 100), (300, 250), MODELS).model == ModelEnum.EDSR_x3
+    # Models are sorted by scale regardless of the order they are given in
+    assert plan_output_size((100, 100), (150, 150), reversed(MODELS)).model == ModelEnum.EDSR_x2
+
+
+def test_plan_shrinks_input_before_network():
+    plan = plan_output_size((100, 100), (150, 150), MODELS)
+
+    # x2 is enough; the network only computes the pixels that survive the final resize
+    assert plan == ResizePlan(ModelEnum.EDSR_x2, (75, 75), (150, 150))
+    assert plan.to_dict() == {"model": "EDSR_x2", "pre_size": [75, 75], "output_size": [150, 150]}
+
+
+def test_plan_falls_back_to_largest_scale():
+    plan = plan_output_size((100, 100), (800, 600), MODELS)
+    assert plan == ResizePlan(ModelEnum.EDSR_x4, None, (800, 600))
+
+    assert plan_output_size((100, 100), (800, 600), []) == ResizePlan(None, None, (800, 600))
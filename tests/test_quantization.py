@@ -0,0 +1,48 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.server.config import Settings
+from src.server.enums.models import ModelEnum
+from src.server.upscaler.opencv import model_path
+from src.server.upscaler.quantization import QuantizedSuperRes, calibration_patches, save_calibration
+
+MODEL_PATH = model_path(ModelEnum.EDSR_x2, Settings())
+
+requires_model = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason=f"{MODEL_PATH} is not available")
+
+
+def test_calibration_patches_are_reproducible():
+    images = [np.random.default_rng(index).integers(0, 256, (80, 100, 3), dtype=np.uint8) for index in range(2)]
+
+    patches = calibration_patches(images, patch_size=32, patches_per_image=3)
+    assert patches.shape == (6, 32, 32, 3)
+    assert np.array_equal(patches, calibration_patches(images, patch_size=32, patches_per_image=3))
+
+    # Images smaller than a patch are upscaled first
+    assert calibration_patches([images[0][:16, :16]], patch_size=32, patches_per_image=1).shape == (1, 32, 32, 3)
+
+
+@requires_model
+def test_int8_matches_fp32(tmp_path):
+    rng = np.random.default_rng(0)
+    # Smooth images, like photos, rather than noise
+    images = [cv2.GaussianBlur(rng.integers(0, 256, (96, 96, 3), dtype=np.uint8), (0, 0), 3) for _ in range(4)]
+    calibration_file = str(tmp_path / "EDSR_x2.int8.npz")
+    save_calibration(calibration_file, calibration_patches(images, patch_size=48))
+
+    sr = cv2.dnn_superres.DnnSuperResImpl_create()
+    sr.readModel(MODEL_PATH)
+    sr.setModel("edsr", 2)
+    net = QuantizedSuperRes.load_net(MODEL_PATH)
+    quantized = QuantizedSuperRes(MODEL_PATH, calibration_file)
+
+    image = images[0][:40, :56]
+    reference = sr.upsample(image)
+    # The direct FP32 run normalizes the input like DnnSuperResImpl
+    assert cv2.PSNR(reference, QuantizedSuperRes.run(net, image)) > 50
+    result = quantized.upsample(image)
+    assert result.shape == reference.shape
+    assert cv2.PSNR(reference, result) > 30
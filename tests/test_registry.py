@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from src.server.upscaler.registry import ModelRegistry
+
+
+def test_preload_loads_requested_copies():
+    registry = ModelRegistry()
+    created = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    models = registry.preload("EDSR_x2", factory, copies=3)
+
+    assert registry.loaded("EDSR_x2") == 3
+    assert len(created) == 3
+    assert sorted(map(id, models)) == sorted(map(id, created))
+
+
+def test_preload_tops_up_existing_copies():
+    registry = ModelRegistry()
+    registry.preload("EDSR_x2", object, copies=1)
+
+    models = registry.preload("EDSR_x2", object, copies=3)
+    assert registry.loaded("EDSR_x2") == 3
+    assert len(models) == 3
+
+    # Already loaded copies are not loaded again
+    assert len(registry.preload("EDSR_x2", object, copies=2)) == 3
+    assert registry.loaded("EDSR_x2") == 3
+
+
+def test_acquire_reuses_preloaded_copies():
+    registry = ModelRegistry()
+    models = registry.preload("EDSR_x2", object, copies=3)
+
+    acquired = [registry.acquire("EDSR_x2", object) for _ in range(3)]
+    assert sorted(map(id, acquired)) == sorted(map(id, models))
+    assert registry.loaded("EDSR_x2") == 3
+
+    # A fourth concurrent request loads a new instance
+    registry.acquire("EDSR_x2", object)
+    assert registry.loaded("EDSR_x2") == 4
+
+
+def test_preload_does_not_hang():
+    registry = ModelRegistry()
+    thread = threading.Thread(target=registry.preload, args=("EDSR_x2", object, 3), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_concurrent_preloads_do_not_overshoot():
+    registry = ModelRegistry()
+    loading = threading.Event()
+    proceed = threading.Event()
+    created = []
+
+    def slow_factory():
+        loading.set()
+        proceed.wait(timeout=5)
+        created.append(object())
+        return created[-1]
+
+    first = threading.Thread(target=registry.preload, args=("EDSR_x2", slow_factory, 2))
+    first.start()
+    assert loading.wait(timeout=5)
+
+    # Loading happens outside the lock: the pool stays usable and the pending copies are reserved
+    assert registry.acquire("EDSR_x2", object) is not None
+    registry.preload("EDSR_x2", slow_factory, copies=2)
+
+    proceed.set()
+    first.join(timeout=5)
+    assert len(created) == 2
+    assert registry.loaded("EDSR_x2") == 3
+
+
+def test_preload_releases_reservation_on_failure():
+    registry = ModelRegistry()
+
+    def failing_factory():
+        raise RuntimeError("model file is broken")
+
+    with pytest.raises(RuntimeError):
+        registry.preload("EDSR_x2", failing_factory, copies=2)
+    assert registry.loaded("EDSR_x2") == 0
+
+
+def test_trim_unloads_idle_copies_only():
+    registry = ModelRegistry()
+    registry.preload("EDSR_x2", object, copies=4)
+    busy = registry.acquire("EDSR_x2", object)
+
+    assert registry.trim("EDSR_x2", 1) == 3
+    assert registry.loaded("EDSR_x2") == 1
+    # Nothing left to unload: the remaining copy is in use
+    assert registry.trim("EDSR_x2", 0) == 0
+
+    registry.release("EDSR_x2", busy)
+    assert registry.acquire("EDSR_x2", object) is busy
+    assert registry.trim("EDSR_x2", 5) == 0
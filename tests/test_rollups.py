@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+
+from src.server.config import Settings
+from src.server.utils.rollups import (
+    DURATION_BUCKETS,
+    HistoryRollups,
+    HistoryRotator,
+    add_record,
+    duration_bucket,
+    empty_rollup,
+    merge_rollups,
+)
+
+NOW = datetime(2026, 3, 10, 12, 30)
+
+
+def _record(moment: datetime, status: str = "success", duration: float = 1.5, **extra) -> dict:
+    return {
+        "timestamp": moment.isoformat(),
+        "status": status,
+        "duration_seconds": duration,
+        "upscaler": {"model_name": "edsr", "scale": 2},
+        "image": {"size": 1000},
+        **extra,
+    }
+
+
+def _settings(tmp_path) -> Settings:
+    return Settings().model_copy(update={
+        "APP_FILES_PATH": tmp_path,
+        "HISTORY_RETENTION_DAYS": 7.0,
+        "HISTORY_HOURLY_RETENTION_DAYS": 30.0,
+    })
+
+
+def test_duration_bucket_bounds():
+    assert duration_bucket(0.05) == 0
+    assert duration_bucket(0.1) == 0
+    assert duration_bucket(1.5) == DURATION_BUCKETS.index(2.5)
+    assert duration_bucket(1000) == len(DURATION_BUCKETS)
+
+
+def test_add_record_counts_success_cache_hits_and_cancellations():
+    rollup = empty_rollup()
+    add_record(rollup, _record(NOW, tiles={"skipped_ratio": 0.5}))
+    add_record(rollup, _record(NOW, duration=0.01, cache_hit=True))
+    add_record(rollup, _record(NOW, status="cancelled", duration=3.0, cancel_reason="client disconnected"))
+
+    assert rollup["count"] == 3
+    assert rollup["statuses"] == {"success": 2, "cancelled": 1}
+    assert rollup["cache_hits"] == 1
+    # Cache hits don't count towards processing time
+    assert sum(rollup["duration_histogram"]) == 1
+    assert rollup["models"]["edsr_x2"]["duration_count"] == 1
+    assert rollup["models"]["edsr_x2"]["size_count"] == 2
+    assert rollup["scales"] == {"2": 2}
+    assert rollup["cancel_reasons"] == {"client disconnected": 1}
+    assert rollup["cancelled_seconds"] == 3.0
+    assert rollup["tile_skip_ratio_sum"] == 0.5
+
+
+def test_merge_rollups_equals_adding_all_records():
+    records = [_record(NOW, duration=value) for value in (0.2, 4.0)] + [_record(NOW, status="error")]
+    first, second, combined = empty_rollup(), empty_rollup(), empty_rollup()
+    add_record(first, records[0])
+    for record in records[1:]:
+        add_record(second, record)
+    for record in records:
+        add_record(combined, record)
+
+    merge_rollups(first, second)
+    assert first == combined
+
+
+def test_rotate_moves_expired_records_into_rollups(tmp_path):
+    settings = _settings(tmp_path)
+    history_file = tmp_path / "request_history.json"
+    recent = _record(NOW - timedelta(days=1))
+    hourly = [_record(NOW - timedelta(days=10, minutes=minutes)) for minutes in (0, 10)]
+    daily = _record(NOW - timedelta(days=40))
+    history_file.write_text(json.dumps([daily, *hourly, recent]))
+
+    stats = HistoryRotator(settings=settings).rotate(now=NOW)
+
+    assert stats == {"rotated": 3, "compacted": 1}
+    assert json.loads(history_file.read_text()) == [recent]
+
+    rollups = HistoryRollups(settings=settings).load()
+    assert [rollup["count"] for rollup in rollups.hourly.values()] == [2]
+    assert list(rollups.daily) == [(NOW - timedelta(days=40)).replace(hour=0, minute=0).isoformat()]
+
+    # Every record is counted on exactly one level
+    window = rollups.window(None, None)
+    assert sum(rollup["count"] for rollup in window) == 3
+    assert [rollup["period"] for rollup in window] == ["day", "hour"]
+
+    # Nothing left to rotate
+    assert HistoryRotator(settings=settings).rotate(now=NOW) == {"rotated": 0, "compacted": 0}
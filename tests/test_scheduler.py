@@ -0,0 +1,186 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from src.server.config import Settings
+from src.server.upscaler.executor import configure_inference_executor
+from src.server.upscaler.scheduler import FairScheduler, peek_image_size
+from src.server.utils.cancellation import CancelToken, UpscaleCancelled
+
+
+@pytest.fixture
+def scheduler():
+    """Scheduler factory; the number of slots is the inference pool size"""
+
+    def make(slots: int = 1, **overrides) -> FairScheduler:
+        configure_inference_executor(slots, 1)
+        return FairScheduler(Settings().model_copy(update=overrides))
+
+    return make
+
+
+async def _start_order(scheduler: FairScheduler, requests, delay: float = 0.0):
+    """Queue (name, tenant, priority, cost) requests behind a running job and return their start order"""
+    order = []
+    release = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("blocker", "interactive", 1.0):
+            await release.wait()
+
+    async def job(name, tenant, priority, cost):
+        async with scheduler.slot(tenant, priority, cost):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(blocker())]
+    await asyncio.sleep(0)
+    for request in requests:
+        tasks.append(asyncio.create_task(job(*request)))
+        await asyncio.sleep(delay)
+    await asyncio.sleep(0.01)
+
+    release.set()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_class_runs_first(scheduler):
+    order = asyncio.run(_start_order(scheduler(), [
+        ("background", "a", "background", 1.0),
+        ("batch", "b", "batch", 1.0),
+        ("interactive", "c", "interactive", 1.0),
+    ]))
+    assert order == ["interactive", "batch", "background"]
+
+
+def test_cheaper_jobs_of_a_tenant_run_first(scheduler):
+    order = asyncio.run(_start_order(scheduler(), [
+        ("large", "a", "batch", 5.0),
+        ("small", "a", "batch", 1.0),
+        ("medium", "a", "batch", 3.0),
+    ]))
+    assert order == ["small", "medium", "large"]
+
+
+def test_waiting_lowers_effective_cost(scheduler):
+    requests = [("large", "a", "batch", 1.5), ("small", "a", "batch", 1.0)]
+
+    assert asyncio.run(_start_order(scheduler(), requests, delay=0.1)) == ["small", "large"]
+    # With fast aging the large job, queued 0.1 s earlier, is now cheaper than the new small one
+    aged = scheduler(SCHEDULER_AGING_SECONDS=0.001)
+    assert asyncio.run(_start_order(aged, requests, delay=0.1)) == ["large", "small"]
+
+
+def test_tenants_share_slots_by_weight(scheduler):
+    weighted = scheduler(SCHEDULER_TENANT_WEIGHTS={"a": 3.0})
+    requests = [(f"{tenant}{index}", tenant, "batch", 1.0) for index in range(4) for tenant in ("a", "b")]
+
+    order = asyncio.run(_start_order(weighted, requests))
+    assert [name[0] for name in order[:5]].count("a") == 4
+    assert [name[0] for name in order[:2]] == ["a", "a"]
+
+
+def test_tenant_concurrency_limit(scheduler):
+    limited = scheduler(slots=2, SCHEDULER_TENANT_MAX_CONCURRENCY=1)
+
+    async def scenario():
+        release = asyncio.Event()
+        started = []
+
+        async def job(name, tenant):
+            async with limited.slot(tenant, "batch", 1.0):
+                started.append(name)
+                await release.wait()
+
+        tasks = [asyncio.create_task(job(*request)) for request in (("a1", "a"), ("a2", "a"), ("b1", "b"))]
+        await asyncio.sleep(0.01)
+        stats = limited.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return started, stats
+
+    started, stats = asyncio.run(scenario())
+    # The second slot goes to tenant b although a queued first
+    assert started == ["a1", "b1", "a2"]
+    assert stats["running"] == {"a": 1, "b": 1}
+    assert stats["queued"]["batch"] == {"a": 1}
+
+
+def test_cancelled_job_leaves_queue(scheduler):
+    fair = scheduler()
+
+    async def scenario():
+        release = asyncio.Event()
+        token = CancelToken()
+
+        async def blocker():
+            async with fair.slot("a", "batch", 1.0):
+                await release.wait()
+
+        async def waiting():
+            async with fair.slot("b", "batch", 1.0, token):
+                pass
+
+        running = asyncio.create_task(blocker())
+        queued = asyncio.create_task(waiting())
+        await asyncio.sleep(0.01)
+        token.cancel("client disconnected")
+        with pytest.raises(UpscaleCancelled):
+            await queued
+        stats = fair.stats()
+        release.set()
+        await running
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["queued"]["batch"] == {}
+    assert fair.stats()["running"] == {}
+
+
+def test_slot_from_thread(scheduler):
+    fair = scheduler()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        release = asyncio.Event()
+        events = []
+
+        async def blocker():
+            async with fair.slot("a", "interactive", 1.0):
+                events.append("blocker")
+                await release.wait()
+
+        def work():
+            with fair.slot_from_thread(loop, "b", "batch", 1.0) as ticket:
+                events.append("thread")
+                return ticket.tenant, fair.stats()["running"]
+
+        running = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        thread = loop.run_in_executor(None, work)
+        await asyncio.sleep(0.05)
+        # The thread waits for the slot held by the blocker
+        assert events == ["blocker"]
+        release.set()
+        await running
+        return await thread
+
+    tenant, running = asyncio.run(scenario())
+    assert (tenant, running) == ("b", {"b": 1})
+    assert fair.stats()["running"] == {}
+
+
+def test_peek_image_size():
+    image = np.zeros((30, 40, 3), dtype=np.uint8)
+    for extension in (".png", ".jpg", ".bmp"):
+        _, encoded = cv2.imencode(extension, image)
+        assert peek_image_size(encoded.tobytes()) == (40, 30)
+
+    _, progressive = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_PROGRESSIVE, 1])
+    assert peek_image_size(progressive.tobytes()) == (40, 30)
+
+    assert peek_image_size(b"GIF89a" + b"\x00" * 32) is None
+    assert peek_image_size(b"\xff\xd8\xff") is None
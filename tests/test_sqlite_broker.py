@@ -0,0 +1,13 @@
+import pytest
+
+from broker_contract import JobBrokerContract
+from src.server.broker.sqlite import SQLiteBroker
+
+
+class TestSQLiteBroker(JobBrokerContract):
+    @pytest.fixture
+    def make_broker(self, tmp_path):
+        def make(max_attempts: int = 3) -> SQLiteBroker:
+            return SQLiteBroker(str(tmp_path / "broker.db"), max_attempts=max_attempts)
+
+        return make
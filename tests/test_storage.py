@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI
+
+from src.server.api.v1.routers.upscaler import router as upscaler_router
+from src.server.config import Settings
+from src.server.utils.storage import ResultStorage
+
+
+def _storage(tmp_path) -> ResultStorage:
+    return ResultStorage(Settings().model_copy(update={"APP_FILES_PATH": tmp_path}))
+
+
+def _age(path, seconds: float):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_put_lookup_and_open(tmp_path):
+    storage = _storage(tmp_path)
+    digest = storage.put("key", b"result")
+
+    assert storage.lookup("key") == digest
+    assert storage.lookup("other") is None
+    with storage.open(digest) as file:
+        assert file.read() == b"result"
+    assert storage.open("not-a-digest") is None
+
+
+def test_open_file_survives_removal(tmp_path):
+    storage = _storage(tmp_path)
+    digest = storage.put("key", b"result")
+
+    file = storage.open(digest)
+    storage.path(digest).unlink()
+    with file:
+        assert file.read() == b"result"
+    assert storage.open(digest) is None
+    assert storage.lookup("key") is None
+
+
+def test_cleanup_removes_expired_results_and_index(tmp_path):
+    storage = _storage(tmp_path)
+    old = storage.put("old", b"old result")
+    new = storage.put("new", b"new result")
+    _age(storage.path(old), 3600)
+
+    stats = storage.cleanup(max_age_seconds=60, max_bytes=0)
+
+    assert stats["removed"] == 1
+    assert stats["stale_index"] == 1
+    assert storage.get(old) is None
+    assert storage.lookup("new") == new
+
+
+def test_cleanup_evicts_least_recently_used_over_size_limit(tmp_path):
+    storage = _storage(tmp_path)
+    digests = [storage.put(f"key{index}", bytes([index]) * 100) for index in range(3)]
+    for age, digest in zip((30, 20, 10), digests):
+        _age(storage.path(digest), age)
+    # A lookup counts as an access: the oldest result becomes the most recently used
+    storage.lookup("key0")
+
+    stats = storage.cleanup(max_age_seconds=0, max_bytes=200)
+
+    assert stats["removed"] == 1
+    assert stats["total_bytes"] == 200
+    assert storage.get(digests[1]) is None
+    assert storage.get(digests[0]) is not None and storage.get(digests[2]) is not None
+
+
+def _get(app: FastAPI, path: str, headers: dict = None):
+    """Minimal ASGI GET request, so the tests don't need an HTTP client"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 1234),
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}, body
+
+
+def test_get_result_supports_if_none_match():
+    app = FastAPI()
+    app.include_router(upscaler_router)
+    digest = ResultStorage(Settings()).put("etag-key", b"png bytes")
+
+    status, headers, body = _get(app, f"/upscaler/results/{digest}")
+    assert status == 200
+    assert body == b"png bytes"
+    assert headers["etag"] == f'"{digest}"'
+    assert headers["cache-control"].startswith("private")
+
+    status, _, body = _get(app, f"/upscaler/results/{digest}", {"If-None-Match": f'W/"{digest}", "other"'})
+    assert status == 304
+    assert body == b""
+
+    status, _, _ = _get(app, f"/upscaler/results/{digest}", {"If-None-Match": '"other"'})
+    assert status == 200
+
+    status, _, _ = _get(app, f"/upscaler/results/{'0' * 64}", {"If-None-Match": "*"})
+    assert status == 404
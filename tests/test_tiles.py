@@ -0,0 +1,49 @@
+import numpy as np
+
+from src.server.upscaler.tiles import Tile, split_tiles, is_flat_tile
+
+
+def test_split_tiles_covers_image_without_overlap():
+    tiles = split_tiles(300, 200, 128)
+
+    assert len(tiles) == 6
+    assert tiles[0] == Tile(0, 0, 128, 128)
+    # Edge tiles are cut to the image size
+    assert tiles[-1] == Tile(256, 128, 44, 72)
+
+    covered = np.zeros((200, 300), dtype=np.uint8)
+    for tile in tiles:
+        covered[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width] += 1
+    assert (covered == 1).all()
+
+
+def test_split_tiles_without_tile_size_returns_whole_image():
+    assert split_tiles(300, 200, 0) == [Tile(0, 0, 300, 200)]
+
+
+def test_tile_padded_and_scaled():
+    tile = Tile(0, 128, 128, 72)
+
+    assert tile.padded(8, 300, 200) == (0, 120, 136, 200)
+    assert tile.scaled(2) == (0, 256, 256, 400)
+
+
+def test_is_flat_tile_by_variance():
+    image = np.full((64, 128, 3), 200, dtype=np.uint8)
+    noise = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    image[:, 64:] = noise
+
+    flat, textured = Tile(0, 0, 64, 64), Tile(64, 0, 64, 64)
+    assert is_flat_tile(image, flat, 4.0)
+    assert not is_flat_tile(image, textured, 4.0)
+    # A threshold of 0 never skips
+    assert not is_flat_tile(image, flat, 0.0)
+
+
+def test_is_flat_tile_by_edges():
+    image = np.zeros((64, 128, 3), dtype=np.uint8)
+    # Vertical stripes: a Canny edge at every stripe border of the right half
+    image[:, 64::4] = 255
+
+    assert is_flat_tile(image, Tile(0, 0, 64, 64), 1.0, "edges")
+    assert not is_flat_tile(image, Tile(64, 0, 64, 64), 1.0, "edges")